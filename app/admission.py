@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import ADMISSION_REJECTIONS, LLM_QUEUE_SECONDS, REGISTRY, CallbackMetric
+from resilience import DeadlineExceeded, record_llm_failure, remaining
+
+DEFAULT_MAX_IN_FLIGHT = 8
+# Lower is served first: local search makes one LLM call, global search a map-reduce of many
+PRIORITIES = {"local": 0, "global": 1}
+DEFAULT_MAX_QUEUED = {"local": 16, "global": 32}
+# Seed for the per-call service time estimate behind Retry-After, until real calls are timed
+INITIAL_CALL_SECONDS = 5.0
+
+
+class Overloaded(Exception):
+    def __init__(self, search_type: str, queued: int, retry_after: int):
+        super().__init__(f"{queued} LLM calls are queued ahead of this {search_type} search, retry in {retry_after}s")
+        self.search_type = search_type
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    search_type: str
+    priority: int
+    wait: float = 0.0
+    max_wait: float = 0.0
+    llm_calls: int = 0
+
+    def record_wait(self, seconds: float):
+        self.wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        self.llm_calls += 1
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "search_type": self.search_type,
+            "wait": self.wait,
+            "max_wait": self.max_wait,
+            "llm_calls": self.llm_calls,
+        }
+
+
+_current_ticket: ContextVar[Optional[AdmissionTicket]] = ContextVar("admission_ticket", default=None)
+
+
+class AdmissionController:
+    """
+    A budget of `max_in_flight` concurrent LLM calls, handed out by search priority.
+
+    A search runs inside `admit(search_type)`; every LLM call it makes (including from tasks it
+    spawns, which inherit the ticket) then waits in `slot()` for a free call. Waiting calls are
+    served lowest priority value first and FIFO within a priority, so local searches overtake
+    queued global map calls. `check()` refuses a new search with `Overloaded` when the LLM calls
+    already queued at or ahead of its priority reach its `max_queued` limit, with a Retry-After
+    estimate from the recent per-call service time. Calls made outside any search come last.
+    A call that is still queued when its request deadline passes gives up with DeadlineExceeded.
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_queued: Optional[Dict[str, int]] = None):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = dict(DEFAULT_MAX_QUEUED if max_queued is None else max_queued)
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._waiting: Dict[int, int] = {}
+        self.call_seconds = INITIAL_CALL_SECONDS
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.queue_seconds: Dict[str, float] = {}
+
+    def _priority(self, search_type: Optional[str]) -> int:
+        return PRIORITIES.get(search_type, len(PRIORITIES))
+
+    def queued_ahead(self, priority: int) -> int:
+        return sum(count for p, count in self._waiting.items() if p <= priority)
+
+    def retry_after(self, queued: int) -> int:
+        # Time for the calls ahead to drain through the budget, rounded up to whole seconds
+        return max(1, math.ceil(queued / self.max_in_flight * self.call_seconds))
+
+    def check(self, search_type: str):
+        limit = self.max_queued.get(search_type)
+        if not limit:
+            return
+        queued = self.queued_ahead(self._priority(search_type))
+        if queued >= limit:
+            self.rejected[search_type] = self.rejected.get(search_type, 0) + 1
+            ADMISSION_REJECTIONS.inc(search_type=search_type)
+            raise Overloaded(search_type, queued, self.retry_after(queued))
+
+    @contextmanager
+    def admit(self, search_type: str):
+        ticket = AdmissionTicket(search_type=search_type, priority=self._priority(search_type))
+        self.admitted[search_type] = self.admitted.get(search_type, 0) + 1
+        token = _current_ticket.set(ticket)
+        try:
+            yield ticket
+        finally:
+            _current_ticket.reset(token)
+
+    async def _acquire(self, priority: int):
+        if self.in_flight < self.max_in_flight and not any(self._waiting.values()):
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Handed a slot just as we were cancelled: pass it on instead of leaking it
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._waiting[priority] -= 1
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            # Cancelled waiters are left in the heap and skipped here
+            if not future.done():
+                # The slot moves straight to the waiter, so in_flight is unchanged
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        ticket = _current_ticket.get()
+        priority = ticket.priority if ticket else self._priority(None)
+        search_type = ticket.search_type if ticket else "other"
+        start = time.time()
+        try:
+            await asyncio.wait_for(self._acquire(priority), remaining())
+        except asyncio.TimeoutError:
+            error = DeadlineExceeded()
+            # Raised before ChatOllama's own error handling, so record it for the API here
+            record_llm_failure(error)
+            raise error
+        wait = time.time() - start
+        LLM_QUEUE_SECONDS.observe(wait, search_type=search_type)
+        self.queue_seconds[search_type] = self.queue_seconds.get(search_type, 0.0) + wait
+        if ticket:
+            ticket.record_wait(wait)
+        start = time.time()
+        try:
+            yield
+        finally:
+            # Smoothed so Retry-After follows the backend's current speed without jumping on one slow call
+            self.call_seconds = 0.8 * self.call_seconds + 0.2 * (time.time() - start)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": {
+                search_type: self._waiting.get(priority, 0)
+                for search_type, priority in {**PRIORITIES, "other": len(PRIORITIES)}.items()
+            },
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_seconds": self.queue_seconds,
+            "call_seconds": self.call_seconds,
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller(max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_queued: Optional[Dict[str, int]] = None) -> AdmissionController:
+    # One budget per process, shared by every ChatOllama instance and the API endpoints
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(max_in_flight=max_in_flight, max_queued=max_queued)
+    return _controller
+
+
+REGISTRY.register(CallbackMetric(
+    "graphrag_admission_in_flight", "LLM calls holding an admission slot.", [],
+    lambda: [((), _controller.in_flight)] if _controller else [],
+))
+REGISTRY.register(CallbackMetric(
+    "graphrag_admission_waiting", "LLM calls queued for an admission slot, per search type.", ["search_type"],
+    lambda: [((search_type,), count) for search_type, count in _controller.stats()["waiting"].items()] if _controller else [],
+))
@@ -0,0 +1,162 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from embedding_cache import normalize_query
+from resilience import LLMUnavailable
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 3600.0
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+
+@dataclass
+class CachedAnswer:
+    search_type: str
+    community_level: int
+    query: str
+    vector: Optional[np.ndarray]
+    response: Dict[str, Any]
+    created_at: float
+
+
+class AnswerCache:
+    """
+    Response cache for the search endpoints.
+
+    Entries are scoped by search type, community level and the version of the index being
+    served, as returned by `index_version()`; within a scope a query matches either exactly
+    (after normalization) or by cosine similarity of its embedding above `similarity_threshold`.
+    Entries expire after `ttl` seconds and the least recently used ones are evicted beyond
+    `max_entries`. The whole cache is dropped as soon as a new index version is served, and an
+    answer computed on an older version than the one now served is not stored.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        index_version: Callable[[], str],
+        community_level: int,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    ):
+        self.embedder = embedder
+        self.index_version = index_version
+        self.community_level = community_level
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+
+    def _entry_key(self, search_type: str, query: str) -> str:
+        return f"{search_type}:{self.community_level}:{normalize_query(query)}"
+
+    def _check_version(self) -> str:
+        version = self.index_version()
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.version = version
+            self._entries.clear()
+        return version
+
+    def _expire(self):
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+            del self._entries[key]
+
+    async def _embed(self, query: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embedder.aembed(query), dtype=np.float32)
+        except LLMUnavailable as e:
+            # Only semantic matching needs the vector; the search itself may not (global doesn't)
+            logging.warning(f"Answer cache could not embed the query: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    async def lookup(self, search_type: str, query: str) -> Optional[Dict[str, Any]]:
+        self._check_version()
+        self._expire()
+
+        key = self._entry_key(search_type, query)
+        entry = self._entries.get(key)
+        match, similarity = "exact", 1.0
+        if entry is None:
+            entry, similarity = await self._semantic_match(search_type, query)
+            match = "semantic"
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(self._entry_key(entry.search_type, entry.query))
+        self.hits += 1
+        response = dict(entry.response)
+        response["cache"] = {
+            "hit": True,
+            "match": match,
+            "similarity": similarity,
+            "cached_query": entry.query,
+            "age": time.time() - entry.created_at,
+            "index_version": self.version,
+        }
+        return response
+
+    async def _semantic_match(self, search_type: str, query: str):
+        candidates = [
+            entry for entry in self._entries.values()
+            if entry.search_type == search_type and entry.vector is not None
+        ]
+        if not candidates:
+            return None, 0.0
+        vector = await self._embed(query)
+        if vector is None:
+            return None, 0.0
+        similarities = np.stack([entry.vector for entry in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None, 0.0
+        return candidates[best], float(similarities[best])
+
+    async def store(self, search_type: str, query: str, response: Dict[str, Any], version: str):
+        """Store an answer computed on index `version`, unless a newer index is already served."""
+        # Don't pin a failed generation for the whole TTL
+        if not response.get("response"):
+            return
+        if version != self._check_version():
+            return
+        key = self._entry_key(search_type, query)
+        self._entries[key] = CachedAnswer(
+            search_type=search_type,
+            community_level=self.community_level,
+            query=query,
+            vector=await self._embed(query),
+            response=response,
+            created_at=time.time(),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "index_version": self.version,
+        }
@@ -1,12 +1,39 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import json
 import logging
+import secrets
+import time
+from contextlib import nullcontext
+from typing import Optional
 from dotenv import load_dotenv
 from utils import process_context_data, serialize_search_result
 from settings import load_settings_from_yaml
-from global_search import setup_global_search
-from local_search import setup_local_search
+from search_setup import setup_admission, setup_text_embedder, setup_token_encoder
+from global_search import setup_map_cache
+from ollama_wrapper import backend_stats, close_pools
+from answer_cache import AnswerCache
+from search_index import SearchIndexManager
+from artifact_store import ArtifactStore
+from metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    SEARCH_CANCELLED,
+    SEARCH_ERRORS,
+    SEARCH_LLM_CALLS,
+    SEARCH_PROMPT_TOKENS,
+    SEARCH_SECONDS,
+    SEARCHES_IN_FLIGHT,
+    cache_metrics,
+    track_llm_usage,
+)
+from single_flight import SingleFlight
+from embedding_cache import normalize_query
+from admission import Overloaded
+from resilience import LLMUnavailable, deadline, surface_llm_failures
+from entity_names import NameMatchedVectorStore, report_entity_lookup
 
 _ = load_dotenv()
 settings = load_settings_from_yaml("settings.yml")
@@ -21,61 +48,366 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-global_search_engine = setup_global_search()
-local_search_engine = setup_local_search()
+text_embedder = setup_text_embedder()
+# Built on startup rather than at import, so the parent of a multi-worker server never loads the index
+search_index: SearchIndexManager = None
+answer_cache = AnswerCache(
+    embedder=text_embedder,
+    # The loaded index, not the files on disk: those change before the watcher reloads them
+    index_version=lambda: search_index.current.version,
+    community_level=settings.COMMUNITY_LEVEL,
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+) if settings.ANSWER_CACHE_ENABLED else None
+single_flight = SingleFlight()
+DISCONNECT_POLL_INTERVAL = 0.5
+admission = setup_admission()
 
-@app.get("/search/global")
-async def global_search(query: str = Query(..., description="Search query for global context")):
+cache_metrics(lambda: {
+    "embedding": (text_embedder.memory_hits + text_embedder.disk_hits, text_embedder.misses),
+    "answer": (answer_cache.hits, answer_cache.misses) if answer_cache else None,
+    "map": (search_index.map_cache.hits, search_index.map_cache.misses) if search_index and search_index.map_cache else None,
+    "token_count": (search_index.token_encoder.hits, search_index.token_encoder.misses) if search_index else None,
+    "coalescing": (single_flight.coalesced, single_flight.started),
+})
+
+def shared_artifacts_dir():
+    return settings.SHARED_ARTIFACTS_DIR if settings.API_WORKERS > 1 else None
+
+@app.on_event("startup")
+async def startup():
+    global search_index
+    search_index = SearchIndexManager(
+        input_dir=settings.INPUT_DIR,
+        community_level=settings.COMMUNITY_LEVEL,
+        claim_extraction_enabled=settings.GRAPHRAG_CLAIM_EXTRACTION_ENABLED,
+        text_embedder=text_embedder,
+        token_encoder=setup_token_encoder(),
+        map_cache=setup_map_cache(),
+        shared_dir=shared_artifacts_dir(),
+        entity_db_uri=None if settings.ENTITY_VECTOR_STORE == "numpy" else f"{settings.INPUT_DIR}/lancedb",
+    )
+    search_index.start_watching(settings.INDEX_WATCH_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await search_index.stop_watching()
+    await close_pools()
+
+async def run_global_search(query: str):
+    with surface_llm_failures():
+        async with search_index.acquire() as index:
+            result = await index.global_search.asearch(query)
+    logging.debug("Raw global search result: %s", result)
+    SEARCH_PROMPT_TOKENS.inc(result.prompt_tokens, search_type="global")
+    SEARCH_LLM_CALLS.inc(result.llm_calls, search_type="global")
+    if isinstance(result.response, dict):
+        response_content = result.response.get('choices', [{}])[0].get('message', {}).get('content', '')
+    else:
+        response_content = str(result.response)
+    response_dict = {
+        "response": response_content,
+        "context_data": process_context_data(result.context_data),
+        "context_text": result.context_text,
+        "completion_time": result.completion_time,
+        "llm_calls": result.llm_calls,
+        "prompt_tokens": result.prompt_tokens,
+        "reduce_context_data": process_context_data(result.reduce_context_data),
+        "reduce_context_text": result.reduce_context_text,
+        "map_responses": [serialize_search_result(r) for r in result.map_responses],
+        "map_batches": result.map_batches,
+        "map_stopped_early": result.stopped_early,
+        "map_partial": result.partial,
+    }
+    # A partial answer is only as good as the time it was given, don't serve it to later queries
+    if answer_cache and not result.partial:
+        await answer_cache.store("global", query, response_dict, index.version)
+    return response_dict
+
+async def run_local_search(query: str):
+    with surface_llm_failures(), report_entity_lookup() as entity_lookup:
+        async with search_index.acquire() as index:
+            result = await index.local_search.asearch(query)
+    SEARCH_PROMPT_TOKENS.inc(result.prompt_tokens, search_type="local")
+    SEARCH_LLM_CALLS.inc(result.llm_calls, search_type="local")
+    if isinstance(result.response, dict):
+        response_content = result.response.get('choices', [{}])[0].get('message', {}).get('content', '')
+    else:
+        response_content = str(result.response)
+    # response_content = translate_to_hebrew(response_content)
+    response_dict = {
+        "response": response_content,
+        "context_data": process_context_data(result.context_data),
+        "context_text": result.context_text,
+        "completion_time": result.completion_time,
+        "llm_calls": result.llm_calls,
+        "prompt_tokens": result.prompt_tokens,
+        "entity_lookup": entity_lookup,
+    }
+    if answer_cache:
+        await answer_cache.store("local", query, response_dict, index.version)
+    return response_dict
+
+async def coalesced_search(search_type: str, query: str, run_search):
+    # Identical concurrent queries against the same index version share one search
+    key = f"{search_type}:{search_index.current.version}:{normalize_query(query)}"
+    result, coalesced = await single_flight.do(key, lambda: run_search(query))
+    response_dict = dict(result)
+    response_dict["cache"] = {"hit": False, "coalesced": coalesced}
+    return response_dict
+
+def check_admission(search_type: str):
+    if admission is None:
+        return
     try:
-        result = await global_search_engine.asearch(query)
-        logging.info(f"Raw global search result: {result}")
-        if isinstance(result.response, dict):
-            response_content = result.response.get('choices', [{}])[0].get('message', {}).get('content', '')
-        else:
-            response_content = str(result.response)
-        response_dict = {
-            "response": response_content,
-            "context_data": process_context_data(result.context_data),
-            "context_text": result.context_text,
-            "completion_time": result.completion_time,
-            "llm_calls": result.llm_calls,
-            "prompt_tokens": result.prompt_tokens,
-            "reduce_context_data": process_context_data(result.reduce_context_data),
-            "reduce_context_text": result.reduce_context_text,
-            "map_responses": [serialize_search_result(r) for r in result.map_responses],
-        }
-        return JSONResponse(content=response_dict)
-    except Exception as e:
-        logging.error(f"Error in global search: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        admission.check(search_type)
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def unavailable(e: LLMUnavailable) -> HTTPException:
+    headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+    return HTTPException(status_code=503, detail=str(e), headers=headers)
+
+def search_timeout(search_type: str, requested: Optional[float]) -> Optional[float]:
+    # The client can ask for less time than the endpoint allows, not more; 0 means no limit
+    configured = settings.GLOBAL_SEARCH_TIMEOUT if search_type == "global" else settings.LOCAL_SEARCH_TIMEOUT
+    limits = [t for t in (configured, requested) if t and t > 0]
+    return min(limits) if limits else None
+
+async def cancel_on_disconnect(request: Request, search_type: str, coro):
+    """
+    Run `coro` until it finishes or the client goes away. Uvicorn doesn't cancel a request
+    handler when its connection closes, so without this an abandoned search keeps its LLM
+    calls running to the end. Returns None if the client disconnected.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while not task.done():
+            await asyncio.wait([task], timeout=DISCONNECT_POLL_INTERVAL)
+            if not task.done() and await request.is_disconnected():
+                task.cancel()
+                SEARCH_CANCELLED.inc(search_type=search_type)
+                logging.info(f"Client disconnected, cancelled {search_type} search")
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return None
+        return task.result()
+    finally:
+        # Cancelled ourselves, e.g. on shutdown: take the search down too
+        task.cancel()
+
+def admitted(search_type: str):
+    # The ticket records how long this search's LLM calls queued, for the response metadata
+    return admission.admit(search_type) if admission else nullcontext()
+
+async def admitted_search(search_type: str, query: str, run_search, timeout: Optional[float] = None):
+    check_admission(search_type)
+    # Tasks the search starts inherit the deadline; a coalesced search keeps its first caller's
+    with admitted(search_type) as ticket, deadline(timeout):
+        response_dict = await coalesced_search(search_type, query, run_search)
+    response_dict["queue"] = ticket.metadata() if ticket else None
+    return response_dict
+
+@app.get("/search/global")
+async def global_search(
+    request: Request,
+    query: str = Query(..., description="Search query for global context"),
+    timeout: Optional[float] = Query(None, description="Seconds this search may take, at most GLOBAL_SEARCH_TIMEOUT"),
+    x_request_timeout: Optional[float] = Header(None, description="Same as the timeout parameter"),
+):
+    with SEARCHES_IN_FLIGHT.track_inprogress(search_type="global"), SEARCH_SECONDS.time(search_type="global", mode="json"):
+        try:
+            if answer_cache:
+                cached = await answer_cache.lookup("global", query)
+                if cached is not None:
+                    return JSONResponse(content=cached)
+            response_dict = await cancel_on_disconnect(request, "global", admitted_search(
+                "global", query, run_global_search, search_timeout("global", timeout or x_request_timeout),
+            ))
+            if response_dict is None:
+                # Nobody is left to read it; the status is for the access log
+                return Response(status_code=499)
+            return JSONResponse(content=response_dict)
+        except HTTPException:
+            raise
+        except LLMUnavailable as e:
+            SEARCH_ERRORS.inc(search_type="global")
+            logging.warning(f"Global search failed, LLM unavailable: {e}")
+            raise unavailable(e)
+        except Exception as e:
+            SEARCH_ERRORS.inc(search_type="global")
+            logging.error(f"Error in global search: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/search/local")
-async def local_search(query: str = Query(..., description="Search query for local context")):
+async def local_search(
+    request: Request,
+    query: str = Query(..., description="Search query for local context"),
+    timeout: Optional[float] = Query(None, description="Seconds this search may take, at most LOCAL_SEARCH_TIMEOUT"),
+    x_request_timeout: Optional[float] = Header(None, description="Same as the timeout parameter"),
+):
+    with SEARCHES_IN_FLIGHT.track_inprogress(search_type="local"), SEARCH_SECONDS.time(search_type="local", mode="json"):
+        try:
+            if answer_cache:
+                cached = await answer_cache.lookup("local", query)
+                if cached is not None:
+                    return JSONResponse(content=cached)
+            response_dict = await cancel_on_disconnect(request, "local", admitted_search(
+                "local", query, run_local_search, search_timeout("local", timeout or x_request_timeout),
+            ))
+            if response_dict is None:
+                # Nobody is left to read it; the status is for the access log
+                return Response(status_code=499)
+            return JSONResponse(content=response_dict)
+        except HTTPException:
+            raise
+        except LLMUnavailable as e:
+            SEARCH_ERRORS.inc(search_type="local")
+            logging.warning(f"Local search failed, LLM unavailable: {e}")
+            raise unavailable(e)
+        except Exception as e:
+            SEARCH_ERRORS.inc(search_type="local")
+            logging.error(f"Error in local search: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def stream_search(search_type: str, query: str, timeout: Optional[float] = None):
+    """
+    Server-sent events for a search: `token` events as the answer is generated, then a
+    `context` event with the context records and timing, then `done` with the LLM calls and
+    prompt tokens the search used. Errors after the stream has started are reported as an
+    `error` event since the status is already sent.
+    """
+    start = time.time()
+    yield sse_event("start", {"search_type": search_type})
     try:
-        result = await local_search_engine.asearch(query)
-        if isinstance(result.response, dict):
-            response_content = result.response.get('choices', [{}])[0].get('message', {}).get('content', '')
-        else:
-            response_content = str(result.response)
-        # response_content = translate_to_hebrew(response_content)
-        response_dict = {
-            "response": response_content,
-            "context_data": process_context_data(result.context_data),
-            "context_text": result.context_text,
-            "completion_time": result.completion_time,
-            "llm_calls": result.llm_calls,
-            "prompt_tokens": result.prompt_tokens,
-        }
-        return JSONResponse(content=response_dict)
+        if answer_cache:
+            cached = await answer_cache.lookup(search_type, query)
+            if cached is not None:
+                yield sse_event("token", cached["response"])
+                yield sse_event("context", {
+                    "context_data": cached["context_data"],
+                    "completion_time": time.time() - start,
+                    "cache": cached["cache"],
+                })
+                yield sse_event("done", {"llm_calls": cached["llm_calls"], "prompt_tokens": cached["prompt_tokens"]})
+                return
+        with admitted(search_type) as ticket, deadline(timeout), surface_llm_failures(), track_llm_usage() as usage:
+            async with search_index.acquire() as index:
+                engine = index.global_search if search_type == "global" else index.local_search
+                context_records = None
+                async for chunk in engine.astream_search(query):
+                    # Both engines yield their context records first, then answer tokens
+                    if context_records is None:
+                        context_records = chunk
+                        continue
+                    yield sse_event("token", chunk)
+        # Streamed answers lack the context text and map details the JSON endpoints return, so they are not written to the answer cache
+        yield sse_event("context", {
+            "context_data": process_context_data(context_records),
+            "completion_time": time.time() - start,
+            "cache": {"hit": False},
+            "queue": ticket.metadata() if ticket else None,
+        })
+        yield sse_event("done", usage)
+    except asyncio.CancelledError:
+        # Starlette cancels the response when the client disconnects, which stops the LLM calls
+        SEARCH_CANCELLED.inc(search_type=search_type)
+        raise
+    except LLMUnavailable as e:
+        SEARCH_ERRORS.inc(search_type=search_type)
+        logging.warning(f"Streaming {search_type} search failed, LLM unavailable: {e}")
+        yield sse_event("error", {"detail": str(e), "status": 503, "retry_after": e.retry_after})
     except Exception as e:
-        logging.error(f"Error in local search: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        SEARCH_ERRORS.inc(search_type=search_type)
+        logging.error(f"Error in streaming {search_type} search: {str(e)}", exc_info=True)
+        yield sse_event("error", {"detail": str(e)})
+
+async def timed_stream_search(search_type: str, query: str, timeout: Optional[float] = None):
+    with SEARCHES_IN_FLIGHT.track_inprogress(search_type=search_type), SEARCH_SECONDS.time(search_type=search_type, mode="stream"):
+        async for event in stream_search(search_type, query, timeout):
+            yield event
+
+def sse_response(search_type: str, query: str, timeout: Optional[float] = None) -> StreamingResponse:
+    # Refused before the stream starts, while a 429 status can still be sent
+    check_admission(search_type)
+    return StreamingResponse(
+        timed_stream_search(search_type, query, timeout),
+        media_type="text/event-stream",
+        # Keep reverse proxies from buffering the token stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/search/global/stream")
+async def global_search_stream(
+    query: str = Query(..., description="Search query for global context"),
+    timeout: Optional[float] = Query(None, description="Seconds this search may take, at most GLOBAL_SEARCH_TIMEOUT"),
+    x_request_timeout: Optional[float] = Header(None, description="Same as the timeout parameter"),
+):
+    return sse_response("global", query, search_timeout("global", timeout or x_request_timeout))
+
+@app.get("/search/local/stream")
+async def local_search_stream(
+    query: str = Query(..., description="Search query for local context"),
+    timeout: Optional[float] = Query(None, description="Seconds this search may take, at most LOCAL_SEARCH_TIMEOUT"),
+    x_request_timeout: Optional[float] = Header(None, description="Same as the timeout parameter"),
+):
+    return sse_response("local", query, search_timeout("local", timeout or x_request_timeout))
+
+def entity_name_stats():
+    store = search_index.current.local_search.context_builder.entity_text_embeddings
+    return store.stats() if isinstance(store, NameMatchedVectorStore) else None
 
 @app.get("/status")
 async def status():
-    return JSONResponse(content={"status": "Server is up and running"})
+    return JSONResponse(content={
+        "status": "Server is up and running",
+        "index": search_index.status(),
+        "embedding_cache": text_embedder.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "coalescing": single_flight.stats(),
+        "token_counts": search_index.token_encoder.stats(),
+        "global_map": search_index.current.global_search.map_stats(),
+        "entity_names": entity_name_stats(),
+        "map_cache": search_index.map_cache.stats() if search_index.map_cache else None,
+        "admission": admission.stats() if admission else None,
+        "llm_backends": backend_stats(),
+        "artifacts": search_index.current.store.stats(),
+    })
+
+@app.get("/metrics")
+async def metrics():
+    # Per process: with API_WORKERS above 1 each scrape is answered by whichever worker takes it
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.post("/admin/reload")
+async def reload_index(force: bool = False, x_admin_token: str = Header(None)):
+    # Without a configured token the endpoint doesn't exist, rather than being open to anyone
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        return JSONResponse(content=await search_index.reload(force=force))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {e}")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if settings.API_WORKERS > 1:
+        # Convert the artifacts once up front; every worker then maps these files instead of parsing the parquet itself
+        ArtifactStore(
+            settings.INPUT_DIR,
+            settings.COMMUNITY_LEVEL,
+            settings.GRAPHRAG_CLAIM_EXTRACTION_ENABLED,
+            shared_dir=shared_artifacts_dir(),
+        ).export_shared()
+        uvicorn.run("api_ollama:app", host="0.0.0.0", port=8000, workers=settings.API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
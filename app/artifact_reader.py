@@ -0,0 +1,83 @@
+import os
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+def _dataset(path: str) -> ds.Dataset:
+    return ds.dataset(path, format="parquet")
+
+
+def _scan_args(dataset: ds.Dataset, columns: Optional[List[str]], community_level: Optional[int]):
+    names = dataset.schema.names
+    if columns is not None:
+        columns = [column for column in columns if column in names]
+    # Push `level <= community_level` into the scan so filtered rows are never materialized
+    level_filter = None
+    if community_level is not None and "level" in names:
+        level_filter = pc.field("level") <= community_level
+    return columns, level_filter
+
+
+def read_table(path: str, columns: Optional[List[str]] = None, community_level: Optional[int] = None) -> pa.Table:
+    """
+    Read a parquet artifact as an Arrow table with only `columns` (those the file has; None
+    reads all) and, when the file has a `level` column and `community_level` is given, only
+    rows with `level <= community_level`.
+    """
+    dataset = _dataset(path)
+    columns, level_filter = _scan_args(dataset, columns, community_level)
+    return dataset.to_table(columns=columns, filter=level_filter)
+
+
+def iter_batches(
+    path: str,
+    columns: Optional[List[str]] = None,
+    community_level: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[pa.RecordBatch]:
+    """Same projection and filter as `read_table`, streamed as record batches of at most `batch_size` rows."""
+    dataset = _dataset(path)
+    columns, level_filter = _scan_args(dataset, columns, community_level)
+    yield from dataset.to_batches(columns=columns, filter=level_filter, batch_size=batch_size)
+
+
+def embedding_matrix(column) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn a list-of-floats column into `(matrix, valid)`: a contiguous float32 matrix with one
+    row per non-null value and a boolean mask of which input rows those are. Built from the
+    flat Arrow values buffer, so no per-row Python lists are created.
+    """
+    array = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    valid = array.is_valid().to_numpy(zero_copy_only=False)
+    present = array.filter(array.is_valid())
+    if len(present) == 0:
+        return np.empty((0, 0), dtype=np.float32), valid
+    lengths = pc.list_value_length(present)
+    dim = pc.min(lengths).as_py()
+    if dim != pc.max(lengths).as_py():
+        raise ValueError("Embedding column has vectors of different lengths")
+    values = pc.list_flatten(present).to_numpy(zero_copy_only=False)
+    return np.ascontiguousarray(values.reshape(len(present), dim), dtype=np.float32), valid
+
+
+def write_ipc(table: pa.Table, path: str):
+    """Write `table` as an uncompressed Arrow IPC file (via a temp file and rename), so it can be memory-mapped."""
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_ipc(path: str) -> pa.Table:
+    """
+    Memory-map an Arrow IPC file written by `write_ipc`. The table's buffers point into the
+    mapping, so processes reading the same file share its pages instead of each holding a copy.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
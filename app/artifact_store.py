@@ -0,0 +1,234 @@
+import dataclasses
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from graphrag.model import CommunityReport, Covariate, Entity, Relationship, TextUnit
+from graphrag.query.indexer_adapters import (
+    read_indexer_entities,
+    read_indexer_relationships,
+    read_indexer_covariates,
+    read_indexer_reports,
+    read_indexer_text_units,
+)
+from constants import (
+    COMMUNITY_REPORT_TABLE,
+    ENTITY_TABLE,
+    ENTITY_EMBEDDING_TABLE,
+    RELATIONSHIP_TABLE,
+    COVARIATE_TABLE,
+    TEXT_UNIT_TABLE,
+)
+from artifact_reader import embedding_matrix, read_ipc, read_table, write_ipc
+
+# Columns the indexer adapters actually read from each table; None reads the whole file
+TABLE_COLUMNS: Dict[str, Optional[List[str]]] = {
+    ENTITY_TABLE: ["id", "title", "level", "degree", "community"],
+    ENTITY_EMBEDDING_TABLE: [
+        "id", "name", "type", "description", "human_readable_id", "description_embedding", "text_unit_ids",
+    ],
+    COMMUNITY_REPORT_TABLE: ["id", "community", "level", "title", "summary", "full_content", "rank"],
+    RELATIONSHIP_TABLE: [
+        "id", "human_readable_id", "source", "target", "description", "weight", "rank", "text_unit_ids",
+    ],
+    TEXT_UNIT_TABLE: ["id", "text", "n_tokens", "document_ids", "entity_ids", "relationship_ids"],
+    COVARIATE_TABLE: None,
+}
+
+# Tables the indexer adapters filter to `level <= community_level`; the filter is applied in the scan instead
+LEVEL_FILTERED_TABLES = {ENTITY_TABLE, COMMUNITY_REPORT_TABLE}
+
+# Embedding columns kept out of the DataFrame and loaded as one float32 matrix
+EMBEDDING_COLUMNS = {ENTITY_EMBEDDING_TABLE: "description_embedding"}
+
+
+def artifact_fingerprint(input_dir: str) -> str:
+    """
+    Fingerprint the index artifacts from the name, size and mtime of every parquet file
+    in `input_dir`, so a re-index changes it without reading the files.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(input_dir, "*.parquet"))):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Loads each GraphRAG parquet artifact once and builds the knowledge-model objects both
+    search engines are constructed from.
+
+    Only the columns the adapters use are read, and the node and report tables are filtered to
+    the community level during the parquet scan. Entity description embeddings are read into
+    one contiguous float32 matrix and each entity gets a row view of it rather than a list of
+    Python floats.
+
+    With `shared_dir`, tables are read from the memory-mapped copies `export_shared` writes
+    there instead of from the parquet files, so several worker processes share one copy of the
+    Arrow buffers and embedding matrices. Only those are shared: `table()` still converts each
+    table to a pandas frame, and the graphrag objects built from it (entity, relationship,
+    text unit and report text) are private to each worker. Until an export matching the
+    current artifacts exists, the parquet files are read as usual.
+
+    The entity, relationship, text unit and claim lists are shared between engines and must be
+    treated as read-only. Community reports are the exception: the graphrag context builders
+    write into `report.attributes`, so each engine gets its own shallow copy through
+    `community_reports()`.
+    """
+
+    def __init__(
+        self,
+        input_dir: str,
+        community_level: int,
+        claim_extraction_enabled: bool = False,
+        shared_dir: Optional[str] = None,
+    ):
+        self.input_dir = input_dir
+        self.community_level = community_level
+        self.claim_extraction_enabled = claim_extraction_enabled
+        self.shared_dir = shared_dir
+        self.fingerprint = artifact_fingerprint(input_dir)
+        self.load_stats: Dict[str, Dict[str, Any]] = {}
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._embeddings: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def table_path(self, name: str) -> str:
+        return f"{self.input_dir}/{name}.parquet"
+
+    def _shared_path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.shared_dir, f"{name}{suffix}")
+
+    def _read_parquet(self, name: str) -> Tuple[pa.Table, Optional[np.ndarray], Optional[np.ndarray]]:
+        community_level = self.community_level if name in LEVEL_FILTERED_TABLES else None
+        table = read_table(self.table_path(name), columns=TABLE_COLUMNS.get(name), community_level=community_level)
+        embedding_column = EMBEDDING_COLUMNS.get(name)
+        if embedding_column not in table.column_names:
+            return table, None, None
+        matrix, valid = embedding_matrix(table.column(embedding_column))
+        table = table.select([column for column in table.column_names if column != embedding_column])
+        return table, matrix, valid
+
+    def _read_shared(self, name: str) -> Tuple[pa.Table, Optional[np.ndarray], Optional[np.ndarray]]:
+        table = read_ipc(self._shared_path(name, ".arrow"))
+        matrix_path = self._shared_path(name, ".embedding.npy")
+        if not os.path.exists(matrix_path):
+            return table, None, None
+        return table, np.load(matrix_path, mmap_mode="r"), np.load(self._shared_path(name, ".valid.npy"))
+
+    def _shared_manifest(self) -> Dict[str, Any]:
+        return {"fingerprint": self.fingerprint, "community_level": self.community_level}
+
+    def shared_is_current(self) -> bool:
+        try:
+            with open(self._shared_path("manifest", ".json"), "r", encoding="utf-8") as file:
+                return json.load(file) == self._shared_manifest()
+        except (OSError, ValueError):
+            return False
+
+    def export_shared(self) -> bool:
+        """
+        Convert the artifacts into `shared_dir` for other processes to memory-map: each table, already
+        projected and level-filtered, as an uncompressed Arrow IPC file, and each embedding column as a
+        float32 `.npy` matrix. Does nothing if the export already matches the current artifacts.
+        """
+        if self.shared_is_current():
+            return False
+        start = time.time()
+        os.makedirs(self.shared_dir, exist_ok=True)
+        for name in TABLE_COLUMNS:
+            if not os.path.exists(self.table_path(name)):
+                continue
+            table, matrix, valid = self._read_parquet(name)
+            write_ipc(table, self._shared_path(name, ".arrow"))
+            if matrix is not None:
+                np.save(self._shared_path(name, ".embedding.npy"), matrix)
+                np.save(self._shared_path(name, ".valid.npy"), valid)
+        # The manifest goes last, so an interrupted export is never taken for a current one
+        manifest_path = self._shared_path("manifest", ".json")
+        with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self._shared_manifest(), file)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        logging.info(f"Exported shared artifacts to {self.shared_dir} in {time.time() - start:.2f}s")
+        return True
+
+    def table(self, name: str) -> pd.DataFrame:
+        if name not in self._tables:
+            start = time.time()
+            shared = self.shared_dir is not None and self.shared_is_current()
+            table, matrix, valid = self._read_shared(name) if shared else self._read_parquet(name)
+            embedding_bytes = 0
+            if matrix is not None:
+                ids = table.column("id").to_numpy(zero_copy_only=False)[valid]
+                self._embeddings[name] = {doc_id: matrix[row] for row, doc_id in enumerate(ids)}
+                # Memory-mapped rows live in the page cache, shared with every other worker
+                embedding_bytes = 0 if shared else matrix.nbytes
+            df = table.to_pandas()
+            self._tables[name] = df
+            self.load_stats[name] = {
+                "rows": len(df),
+                "columns": len(df.columns),
+                "file_bytes": os.path.getsize(self.table_path(name)),
+                "memory_bytes": int(df.memory_usage(deep=True).sum()) + embedding_bytes,
+                "load_seconds": time.time() - start,
+                "shared": shared,
+            }
+            logging.info(f"Loaded {name}: {self.load_stats[name]}")
+        return self._tables[name]
+
+    def release_tables(self):
+        # The engines only hold the model objects; frames are reloaded on demand if needed again
+        self._tables.clear()
+        self._embeddings.clear()
+
+    @cached_property
+    def entities(self) -> List[Entity]:
+        entities = read_indexer_entities(self.table(ENTITY_TABLE), self.table(ENTITY_EMBEDDING_TABLE), self.community_level)
+        embeddings = self._embeddings.get(ENTITY_EMBEDDING_TABLE, {})
+        for entity in entities:
+            entity.description_embedding = embeddings.get(entity.id)
+        return entities
+
+    @cached_property
+    def reports(self) -> List[CommunityReport]:
+        return read_indexer_reports(self.table(COMMUNITY_REPORT_TABLE), self.table(ENTITY_TABLE), self.community_level)
+
+    @cached_property
+    def relationships(self) -> List[Relationship]:
+        return read_indexer_relationships(self.table(RELATIONSHIP_TABLE))
+
+    @cached_property
+    def text_units(self) -> List[TextUnit]:
+        return read_indexer_text_units(self.table(TEXT_UNIT_TABLE))
+
+    @cached_property
+    def claims(self) -> List[Covariate]:
+        if not self.claim_extraction_enabled:
+            return []
+        return read_indexer_covariates(self.table(COVARIATE_TABLE))
+
+    def community_reports(self) -> List[CommunityReport]:
+        # Text fields stay shared, only the mutable attributes dict is copied
+        return [
+            dataclasses.replace(report, attributes=dict(report.attributes) if report.attributes else None)
+            for report in self.reports
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "input_dir": self.input_dir,
+            "fingerprint": self.fingerprint,
+            "community_level": self.community_level,
+            "shared_dir": self.shared_dir,
+            "tables": self.load_stats,
+            "total_load_seconds": sum(s["load_seconds"] for s in self.load_stats.values()),
+            "total_memory_bytes": sum(s["memory_bytes"] for s in self.load_stats.values()),
+        }
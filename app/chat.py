@@ -7,6 +7,9 @@ import logging
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
+# Seconds to wait for an answer; sent along so the server stops working on it at the same time
+SEARCH_TIMEOUT = 600
+
 # Set page config
 st.set_page_config(page_title="Hogwarts Knowledge Seeker", page_icon="🧙‍♂️", layout="wide")
 
@@ -44,32 +47,83 @@ search_type = st.radio("Select Search Type:", ("Global", "Local"))
 # User input
 user_query = st.text_input("Ask your question about the wizarding world:", "")
 
+class SearchFailed(Exception):
+    """The API refused or failed the search; the message is the server's own detail."""
+
+    def __init__(self, detail, retry_after=None):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+def raise_for_api_error(response):
+    if response.status_code < 400:
+        return
+    try:
+        detail = response.json().get("detail", response.reason)
+    except ValueError:
+        detail = response.text or response.reason
+    # 429 (too busy) and 503 (model unavailable) say when to come back
+    raise SearchFailed(detail, response.headers.get("Retry-After"))
+
+def read_events(response):
+    """Yield (event, data) pairs from a server-sent events response."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if event is not None:
+                yield event, json.loads("\n".join(data)) if data else None
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
 if st.button("Seek Knowledge"):
     if user_query:
         # Determine which API endpoint to use based on search type
         if search_type == "Global":
-            url = "http://localhost:8000/search/global"
+            url = "http://localhost:8000/search/global/stream"
         else:
-            url = "http://localhost:8000/search/local"
+            url = "http://localhost:8000/search/local/stream"
         
         # Make API request
         try:
-            response = requests.get(url, params={"query": user_query})
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract and display the answer
-            answer = result['response']
-            
             st.markdown("### 📜 The Ancient Texts Reveal:")
-            st.write(answer)
+            answer_placeholder = st.empty()
+            answer_placeholder.write("🔮 Consulting the crystal ball...")
+            answer = ""
+            result = {}
+            usage = {}
+            with requests.get(url, params={"query": user_query, "timeout": SEARCH_TIMEOUT}, stream=True, timeout=SEARCH_TIMEOUT) as response:
+                raise_for_api_error(response)
+                # The server sends UTF-8 but no charset, don't let requests fall back to latin-1
+                response.encoding = "utf-8"
+                for event, data in read_events(response):
+                    if event == "token":
+                        answer += data
+                        answer_placeholder.write(answer)
+                    elif event == "context":
+                        result = data
+                    elif event == "done":
+                        usage = data or {}
+                    elif event == "error":
+                        raise SearchFailed(data["detail"], data.get("retry_after"))
             
             # Display additional information
             with st.expander("View Magical Details"):
                 st.write(f"🕰️ Divination Time: {result['completion_time']:.2f} seconds")
-                st.write(f"🔮 Crystal Ball Gazes: {result['llm_calls']}")
-                st.write(f"📚 Scrolls Consulted: {result['prompt_tokens']}")
+                st.write(f"🔮 Crystal Ball Gazes: {usage.get('llm_calls', 0)}")
+                st.write(f"📚 Scrolls Consulted: {usage.get('prompt_tokens', 0)}")
+                if result.get("cache", {}).get("hit"):
+                    st.write(f"🦉 Answered from memory of: {result['cache']['cached_query']}")
         
+        except SearchFailed as e:
+            if not answer:
+                answer_placeholder.empty()
+            retry = f" (try again in {float(e.retry_after):.0f} seconds)" if e.retry_after else ""
+            st.error(f"The Ministry could not answer: {e}{retry}")
+            logging.error(f"Search failed: {e}")
         except requests.RequestException as e:
             st.error(f"Alas! The owls couldn't deliver your message. Error: {e}")
             logging.error(f"Request error: {str(e)}")
@@ -3,4 +3,5 @@ ENTITY_TABLE = "create_final_nodes"
 ENTITY_EMBEDDING_TABLE = "create_final_entities"
 RELATIONSHIP_TABLE = "create_final_relationships"
 COVARIATE_TABLE = "create_final_covariates"
-TEXT_UNIT_TABLE = "create_final_text_units"
\ No newline at end of file
+TEXT_UNIT_TABLE = "create_final_text_units"
+ENTITY_DESCRIPTION_COLLECTION = "entity_description_embeddings"
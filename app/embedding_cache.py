@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def normalize_query(text: str) -> str:
+    # NFC so the same Hebrew string typed with different combining-mark order hashes the same
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split()).casefold()
+
+
+class CachedEmbedding:
+    """
+    Caching text embedder in front of an OllamaEmbedding.
+
+    Vectors are keyed on the normalized text plus the embedding model name. Lookups go to an
+    in-memory LRU first and then, if `db_path` is set, to a SQLite table that survives restarts.
+    Failed embeddings (empty vectors) are never cached.
+    """
+
+    def __init__(self, embedder, max_entries: int = DEFAULT_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.embedder = embedder
+        self.model = embedder.model
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+            self._db.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def _put(self, key: str, vector: List[float]):
+        if not vector:
+            return
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    (key, self.model, np.asarray(vector, dtype=np.float32).tobytes()),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def embed(self, text: str) -> List[float]:
+        key = self.key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embedder.embed(text)
+            self._put(key, vector)
+        return vector
+
+    async def aembed(self, text: str) -> List[float]:
+        key = self.key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = await self.embedder.aembed(text)
+            self._put(key, vector)
+        return vector
+
+    async def aembed_many(self, texts: List[str]) -> np.ndarray:
+        # Bulk jobs (re-embedding) are not query traffic, pass them straight through
+        return await self.embedder.aembed_many(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+import lancedb
+import numpy as np
+from graphrag.model import Entity
+from graphrag.query.input.loaders.dfs import store_entity_semantic_embeddings
+from graphrag.vector_stores import VectorStoreDocument
+from graphrag.vector_stores.lancedb import LanceDBVectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+ANN_INDEX_TYPES = ("IVF_PQ", "IVF_HNSW_PQ", "IVF_HNSW_SQ")
+DEFAULT_ANN_MIN_ROWS = 10_000
+# Above this share of changed rows a full overwrite is cheaper than delete + add
+INCREMENTAL_MAX_CHANGED_FRACTION = 0.5
+
+
+def entity_row_hash(entity: Entity) -> str:
+    # Covers everything store_entity_semantic_embeddings writes for the entity
+    digest = hashlib.sha256()
+    digest.update(f"{entity.id}\x00{entity.title}\x00{entity.description}\x00".encode("utf-8"))
+    if entity.description_embedding is not None:
+        digest.update(np.asarray(entity.description_embedding, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def entity_set_fingerprint(row_hashes: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for entity_id in sorted(row_hashes):
+        digest.update(f"{entity_id}:{row_hashes[entity_id]};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _entity_document(entity: Entity) -> VectorStoreDocument:
+    return VectorStoreDocument(
+        id=entity.id,
+        text=entity.description,
+        vector=entity.description_embedding,
+        attributes=(
+            {"title": entity.title, **entity.attributes}
+            if entity.attributes
+            else {"title": entity.title}
+        ),
+    )
+
+
+def _manifest_path(db_uri: str, collection_name: str) -> str:
+    return os.path.join(db_uri, f"{collection_name}.manifest.json")
+
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]):
+    # Write-then-rename so a crash mid-write never leaves a manifest that claims a stale collection is current
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, path)
+
+
+def _create_ann_index(table, index_type: str):
+    if index_type not in ANN_INDEX_TYPES:
+        logging.warning(f"Unknown ANN index type {index_type!r}, expected one of {ANN_INDEX_TYPES}")
+        return
+    rows = table.count_rows()
+    dim = getattr(table.schema.field("vector").type, "list_size", None)
+    if not dim:
+        logging.warning("Vector column is not fixed-size, skipping ANN index")
+        return
+    num_sub_vectors = next(n for n in (dim // 16, dim // 8, dim // 4, 1) if n and dim % n == 0)
+    # L2 to match the default metric LanceDBVectorStore queries with
+    table.create_index(
+        metric="L2",
+        num_partitions=max(1, int(np.sqrt(rows))),
+        num_sub_vectors=num_sub_vectors,
+        index_type=index_type,
+        replace=True,
+    )
+
+
+def sync_entity_semantic_embeddings(
+    entities: List[Entity],
+    vectorstore: LanceDBVectorStore,
+    db_uri: str,
+    ann_index_type: str = "",
+    ann_min_rows: int = DEFAULT_ANN_MIN_ROWS,
+    previous_collection: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Bring the entity description collection in line with `entities`, writing only what changed.
+
+    A manifest next to the collection records a content hash per entity. If the collection's
+    fingerprint matches, the existing table is reused untouched. Otherwise, if a minority of
+    entities changed since `previous_collection`, that collection is copied and only the
+    changed rows are deleted and re-added; failing that the collection is rebuilt with
+    `store_entity_semantic_embeddings`. `previous_collection` itself is only ever read, so
+    an index still serving from it is not disturbed. With `ann_index_type` set and at least
+    `ann_min_rows` rows, an ANN index is (re)built whenever the collection was written to.
+    """
+    start = time.time()
+    db = vectorstore.db_connection
+    collection_name = vectorstore.collection_name
+    manifest_path = _manifest_path(db_uri, collection_name)
+    manifest = _read_manifest(manifest_path)
+
+    row_hashes = {entity.id: entity_row_hash(entity) for entity in entities}
+    fingerprint = entity_set_fingerprint(row_hashes)
+    table_names = db.table_names()
+
+    if collection_name in table_names and manifest.get("fingerprint") == fingerprint:
+        vectorstore.document_collection = db.open_table(collection_name)
+        mode, changed = "unchanged", 0
+    else:
+        old_hashes = {}
+        if previous_collection and previous_collection != collection_name and previous_collection in table_names:
+            old_hashes = _read_manifest(_manifest_path(db_uri, previous_collection)).get("rows", {})
+        changed_ids = [entity_id for entity_id, row_hash in row_hashes.items() if old_hashes.get(entity_id) != row_hash]
+        removed_ids = [entity_id for entity_id in old_hashes if entity_id not in row_hashes]
+        changed = len(changed_ids) + len(removed_ids)
+        if old_hashes and changed <= INCREMENTAL_MAX_CHANGED_FRACTION * max(len(row_hashes), 1):
+            table = db.create_table(collection_name, data=db.open_table(previous_collection).to_arrow(), mode="overwrite")
+            stale_ids = changed_ids + removed_ids
+            for start_idx in range(0, len(stale_ids), 1000):
+                id_list = ", ".join(f"'{entity_id}'" for entity_id in stale_ids[start_idx:start_idx + 1000])
+                table.delete(f"id IN ({id_list})")
+            changed_set = set(changed_ids)
+            vectorstore.load_documents(
+                [_entity_document(entity) for entity in entities if entity.id in changed_set],
+                overwrite=False,
+            )
+            mode = "incremental"
+        else:
+            store_entity_semantic_embeddings(entities=entities, vectorstore=vectorstore)
+            mode = "rebuilt"
+
+        table = vectorstore.document_collection
+        if ann_index_type and table.count_rows() >= ann_min_rows:
+            _create_ann_index(table, ann_index_type)
+        _write_manifest(manifest_path, {"fingerprint": fingerprint, "rows": row_hashes})
+
+    stats = {"mode": mode, "entities": len(entities), "changed": changed, "seconds": time.time() - start}
+    logging.info(f"Entity description embeddings {collection_name}: {stats}")
+    return stats
+
+
+def lease_collection(db_uri: str, collection_name: str) -> Optional[IO]:
+    """
+    Take a shared lock on `collection_name` for as long as this process serves from it;
+    `prune_collections` in any worker leaves leased collections alone. Close the returned
+    file to give the lease up. A no-op without fcntl.
+    """
+    if fcntl is None:
+        return None
+    os.makedirs(db_uri, exist_ok=True)
+    lease = open(os.path.join(db_uri, f"{collection_name}.lock"), "w")
+    fcntl.flock(lease, fcntl.LOCK_SH)
+    return lease
+
+
+def prune_collections(db_uri: str, base_name: str, keep: Iterable[str]) -> List[str]:
+    """
+    Drop the collections named `base_name` or `base_name_<version>` that are not in `keep`
+    and that no process holds a lease on, along with their manifests. Returns the dropped names.
+    """
+    keep = set(keep)
+    db = lancedb.connect(db_uri)
+    dropped = []
+    for name in db.table_names():
+        if name in keep or (name != base_name and not name.startswith(f"{base_name}_")):
+            continue
+        lock_path = os.path.join(db_uri, f"{name}.lock")
+        with open(lock_path, "w") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            db.drop_table(name)
+            for path in (_manifest_path(db_uri, name), lock_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        dropped.append(name)
+    if dropped:
+        logging.info(f"Dropped unused entity collections {dropped}")
+    return dropped
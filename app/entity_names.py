@@ -0,0 +1,191 @@
+import re
+import time
+import unicodedata
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from graphrag.model import Entity
+from graphrag.vector_stores import BaseVectorStore, VectorStoreDocument, VectorStoreSearchResult
+
+from metrics import ENTITY_LOOKUPS
+
+# Final letter forms fold into the regular ones; geresh and gershayim are dropped, along with the
+# ASCII and typographic quotes usually typed in their place (ג'יני, ג׳יני and גיני are one key)
+NAME_TRANSLATION = str.maketrans(
+    {"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ", **{mark: None for mark in "׳״'\"`‘’“”"}}
+)
+# One-letter prefixes (and, the, in, as, to, from, that) written onto the next word: ולהארי, מהוגוורטס
+PREFIX_LETTERS = frozenset("ובכלמשה")
+MAX_PREFIX_LETTERS = 3
+# Shorter titles would match inside too many unrelated words
+MIN_NAME_LETTERS = 2
+# Titles matched after prefix letters need more: כאב (pain) is כ + אב (father) otherwise
+MIN_PREFIXED_NAME_LETTERS = 3
+MATCH_MODES = ("bypass", "merge")
+
+
+def normalize_name(text: str) -> str:
+    """Hebrew-insensitive key: no niqqud or cantillation, no geresh, folded final letters, single spaces."""
+    # NFKD also splits presentation forms such as שׁ (U+FB2A) into the letter and its points
+    text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", text.translate(NAME_TRANSLATION).casefold()))
+
+
+class EntityNameIndex:
+    """
+    Finds the entities a query names outright, by their title (the `title` column of
+    create_final_nodes), with an Aho-Corasick automaton over the normalized titles. One pass
+    over the normalized query finds every title in it, multi-word names included. A match
+    has to end at a word boundary and start at one or after Hebrew prefix letters (ורון,
+    להארי), the latter only for titles of at least MIN_PREFIXED_NAME_LETTERS letters; where
+    matches overlap the longest wins, so "הארי פוטר" beats "הארי".
+    """
+
+    def __init__(self, entities: List[Entity]):
+        start = time.time()
+        self.ids: Dict[str, List[str]] = {}
+        for entity in entities:
+            key = normalize_name(entity.title or "")
+            if len(key.replace(" ", "")) >= MIN_NAME_LETTERS:
+                self.ids.setdefault(key, []).append(entity.id)
+        # The trie lives in one (state, char) -> state dict, much smaller than a dict per state
+        self._goto: Dict[Tuple[int, str], int] = {}
+        self._fail: List[int] = [0]
+        self._out: Dict[int, Tuple[int, ...]] = {}
+        self._build()
+        self.build_seconds = time.time() - start
+        self.lookups = 0
+        self.matched = 0
+        self.lookup_seconds = 0.0
+
+    def _build(self):
+        children: List[List[int]] = [[]]
+        for key in self.ids:
+            state = 0
+            for ch in key:
+                next_state = self._goto.get((state, ch))
+                if next_state is None:
+                    next_state = len(self._fail)
+                    self._goto[(state, ch)] = next_state
+                    self._fail.append(0)
+                    children.append([])
+                    children[state].append(next_state)
+                state = next_state
+            self._out[state] = (len(key),)
+        chars = {state: ch for (_, ch), state in self._goto.items()}
+        queue = deque(children[0])
+        while queue:
+            state = queue.popleft()
+            for child in children[state]:
+                fallback = self._fail[state]
+                while fallback and (fallback, chars[child]) not in self._goto:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto.get((fallback, chars[child]), 0)
+                # A state also reports the keys that end at its longest proper suffix
+                inherited = self._out.get(self._fail[child])
+                if inherited:
+                    self._out[child] = self._out.get(child, ()) + inherited
+                queue.append(child)
+
+    def _at_word_start(self, text: str, start: int, end: int) -> bool:
+        prefix = text[text.rfind(" ", 0, start) + 1:start]
+        if not prefix:
+            return True
+        return (
+            len(prefix) <= MAX_PREFIX_LETTERS
+            and all(ch in PREFIX_LETTERS for ch in prefix)
+            and end - start - text.count(" ", start, end) >= MIN_PREFIXED_NAME_LETTERS
+        )
+
+    def match(self, query: str) -> List[str]:
+        """Ids of the entities named in `query`, in the order they appear."""
+        start_time = time.perf_counter()
+        text = normalize_name(query)
+        spans = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and (state, ch) not in self._goto:
+                state = self._fail[state]
+            state = self._goto.get((state, ch), 0)
+            for length in self._out.get(state, ()):
+                start = end - length
+                if (end == len(text) or text[end] == " ") and self._at_word_start(text, start, end):
+                    spans.append((start, end))
+        chosen: List[Tuple[int, int]] = []
+        for start, end in sorted(spans, key=lambda span: span[0] - span[1]):
+            if all(end <= other_start or start >= other_end for other_start, other_end in chosen):
+                chosen.append((start, end))
+        ids = [entity_id for start, end in sorted(chosen) for entity_id in self.ids[text[start:end]]]
+        self.lookups += 1
+        self.matched += bool(ids)
+        self.lookup_seconds += time.perf_counter() - start_time
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "names": len(self.ids),
+            "states": len(self._fail),
+            "build_seconds": self.build_seconds,
+            "lookups": self.lookups,
+            "matched": self.matched,
+            "avg_lookup_us": self.lookup_seconds / self.lookups * 1e6 if self.lookups else 0.0,
+        }
+
+
+_lookup: ContextVar[Optional[Dict[str, Any]]] = ContextVar("entity_lookup", default=None)
+
+
+@contextmanager
+def report_entity_lookup():
+    """Yield a dict that the local search run inside this block fills with how it found its entities."""
+    report: Dict[str, Any] = {}
+    token = _lookup.set(report)
+    try:
+        yield report
+    finally:
+        _lookup.reset(token)
+
+
+class NameMatchedVectorStore:
+    """
+    Wraps the entity description store that LocalSearchMixedContext searches with the query.
+    Entities the query names are looked up in an EntityNameIndex first. With mode "merge"
+    (the default) they go ahead of the embedding matches, so a title that happens to be a
+    common word only pushes the closest embedding match down; with "bypass" they are the
+    answer whenever there are any, and the query is not embedded at all. Queries that name nobody take the
+    embedding path as before. Each lookup reports its path: names, merged or embedding.
+    """
+
+    def __init__(self, store: BaseVectorStore, index: EntityNameIndex, mode: str = "merge"):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown entity name match mode {mode!r}, expected one of {MATCH_MODES}")
+        self.store = store
+        self.index = index
+        self.mode = mode
+        self.paths: Dict[str, int] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+
+    def similarity_search_by_text(self, text: str, text_embedder, k: int = 10, **kwargs: Any) -> List[VectorStoreSearchResult]:
+        start = time.perf_counter()
+        named = self.index.match(text)[:k]
+        results = [VectorStoreSearchResult(document=VectorStoreDocument(id=entity_id, text=None, vector=None), score=1.0) for entity_id in named]
+        if named and self.mode == "bypass":
+            path = "names"
+        else:
+            path = "merged" if named else "embedding"
+            seen = set(named)
+            results += [r for r in self.store.similarity_search_by_text(text, text_embedder, k=k, **kwargs) if r.document.id not in seen]
+            results = results[:k]
+        self.paths[path] = self.paths.get(path, 0) + 1
+        ENTITY_LOOKUPS.inc(path=path)
+        report = _lookup.get()
+        if report is not None:
+            report.update(path=path, named_entities=len(named), seconds=time.perf_counter() - start)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "paths": self.paths, **self.index.stats()}
@@ -1,42 +1,80 @@
-import pandas as pd
-import tiktoken
-from graphrag.query.structured_search.global_search.search import GlobalSearch
 from graphrag.query.structured_search.global_search.community_context import GlobalCommunityContext
-from graphrag.query.indexer_adapters import read_indexer_entities, read_indexer_reports
 from ollama_wrapper import ChatOllama
+from map_scheduler import ScheduledGlobalSearch
+from map_cache import MapResponseCache
+from metrics import TimedContextBuilder
 from settings import load_settings_from_yaml
-from constants import COMMUNITY_REPORT_TABLE, ENTITY_TABLE, ENTITY_EMBEDDING_TABLE
+from artifact_store import ArtifactStore
+from constants import COMMUNITY_REPORT_TABLE
+from search_setup import setup_admission, setup_token_encoder
+from token_counts import CachedTokenEncoder, collect_counted_texts
 
 settings = load_settings_from_yaml("settings.yml")
 
-def setup_global_search():
+def setup_map_cache():
+    if not settings.MAP_CACHE_ENABLED:
+        return None
+    return MapResponseCache(
+        db_path=settings.MAP_CACHE_PATH,
+        reports_path=f"{settings.INPUT_DIR}/{COMMUNITY_REPORT_TABLE}.parquet",
+        max_entries=settings.MAP_CACHE_SIZE,
+    )
+
+def setup_global_search(store: ArtifactStore = None, token_encoder: CachedTokenEncoder = None, map_cache: MapResponseCache = None) -> ScheduledGlobalSearch:
     llm_model = settings.GRAPHRAG_LLM_MODEL
-    llm_api_base = settings.LLM_MODEL_API_BASE
-    INPUT_DIR = settings.INPUT_DIR
-    COMMUNITY_LEVEL = settings.COMMUNITY_LEVEL
+    llm_api_base = settings.LLM_MODEL_API_BASES or settings.LLM_MODEL_API_BASE
+    if store is None:
+        store = ArtifactStore(settings.INPUT_DIR, settings.COMMUNITY_LEVEL)
 
     llm = ChatOllama(
         api_base=llm_api_base,
         model=llm_model,
         max_retries=20,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_REQUEST_TIMEOUT,
+        admission=setup_admission(),
     )
 
-    token_encoder = tiktoken.get_encoding("cl100k_base")
+    if token_encoder is None:
+        token_encoder = setup_token_encoder()
 
-    entity_df = pd.read_parquet(f"{INPUT_DIR}/{ENTITY_TABLE}.parquet")
-    entity_embedding_df = pd.read_parquet(f"{INPUT_DIR}/{ENTITY_EMBEDDING_TABLE}.parquet")
-    report_df = pd.read_parquet(f"{INPUT_DIR}/{COMMUNITY_REPORT_TABLE}.parquet")
+    context_builder_params = {
+        "use_community_summary": True,
+        # Keep the rank order set below, so each map batch holds reports of similar rank
+        "shuffle_data": False,
+        "include_community_rank": True,
+        "min_community_rank": 0,
+        "community_rank_name": "rank",
+        "include_community_weight": True,
+        "community_weight_name": "occurrence weight",
+        "normalize_community_weight": True,
+        "max_tokens": 12_000,
+        "context_name": "Reports",
+    }
 
-    entities = read_indexer_entities(entity_df, entity_embedding_df, COMMUNITY_LEVEL)
-    reports = read_indexer_reports(report_df, entity_df, COMMUNITY_LEVEL)
+    # Highest ranked communities first, so the scheduler's first batches are the most important ones
+    def community_reports():
+        return sorted(store.community_reports(), key=lambda report: report.rank or 0, reverse=True)
 
-    context_builder = GlobalCommunityContext(
-        community_reports=reports,
-        entities=entities,
-        token_encoder=token_encoder,
+    # The report rows don't depend on the query, so every row the builder will count is known now
+    token_encoder.precompute(collect_counted_texts(
+        lambda encoder: GlobalCommunityContext(
+            community_reports=community_reports(),
+            entities=store.entities,
+            token_encoder=encoder,
+        ).build_context(**context_builder_params)
+    ))
+
+    context_builder = TimedContextBuilder(
+        GlobalCommunityContext(
+            community_reports=community_reports(),
+            entities=store.entities,
+            token_encoder=token_encoder,
+        ),
+        search_type="global",
     )
 
-    search_engine = GlobalSearch(
+    search_engine = ScheduledGlobalSearch(
         llm=llm,
         context_builder=context_builder,
         token_encoder=token_encoder,
@@ -51,20 +89,15 @@ def setup_global_search():
         },
         allow_general_knowledge=True,
         json_mode=False,
-        context_builder_params={
-            "use_community_summary": True,
-            "shuffle_data": True,
-            "include_community_rank": True,
-            "min_community_rank": 0,
-            "community_rank_name": "rank",
-            "include_community_weight": True,
-            "community_weight_name": "occurrence weight",
-            "normalize_community_weight": True,
-            "max_tokens": 12_000,
-            "context_name": "Reports",
-        },
+        context_builder_params=context_builder_params,
         concurrent_coroutines=32,
         response_type="single paragraph",
+        map_concurrency=settings.GLOBAL_MAP_CONCURRENCY,
+        min_point_score=settings.GLOBAL_MAP_MIN_SCORE,
+        target_points=settings.GLOBAL_MAP_TARGET_POINTS,
+        map_cache=map_cache,
+        partial_results=settings.GLOBAL_PARTIAL_RESULTS,
+        reduce_reserve=settings.GLOBAL_REDUCE_RESERVE,
     )
 
     return search_engine
\ No newline at end of file
@@ -1,80 +1,97 @@
-import pandas as pd
-import tiktoken
 from graphrag.query.structured_search.local_search.search import LocalSearch
 from graphrag.query.structured_search.local_search.mixed_context import LocalSearchMixedContext
 from graphrag.query.context_builder.entity_extraction import EntityVectorStoreKey
+from graphrag.query.context_builder.local_context import build_entity_context
 from graphrag.vector_stores.lancedb import LanceDBVectorStore
-from graphrag.query.indexer_adapters import (
-    read_indexer_entities,
-    read_indexer_relationships,
-    read_indexer_covariates,
-    read_indexer_reports,
-    read_indexer_text_units,
-)
-from graphrag.query.input.loaders.dfs import store_entity_semantic_embeddings
-from ollama_wrapper import ChatOllama, OllamaEmbedding
+from ollama_wrapper import ChatOllama
+from embedding_cache import CachedEmbedding
+from search_setup import setup_admission, setup_text_embedder, setup_token_encoder
 from settings import load_settings_from_yaml
-from constants import (
-    COMMUNITY_REPORT_TABLE,
-    ENTITY_TABLE,
-    ENTITY_EMBEDDING_TABLE,
-    RELATIONSHIP_TABLE,
-    COVARIATE_TABLE,
-    TEXT_UNIT_TABLE,
-)
+from artifact_store import ArtifactStore
+from constants import ENTITY_DESCRIPTION_COLLECTION
+from entity_embeddings import sync_entity_semantic_embeddings
+from numpy_vector_store import NumpyVectorStore
+from entity_names import EntityNameIndex, NameMatchedVectorStore
+from token_counts import CachedTokenEncoder, collect_counted_texts
+from metrics import TimedContextBuilder
 
 settings = load_settings_from_yaml("settings.yml")
 
-def setup_local_search():
+def setup_local_search(
+    store: ArtifactStore = None,
+    text_embedder: CachedEmbedding = None,
+    token_encoder: CachedTokenEncoder = None,
+    entity_collection: str = ENTITY_DESCRIPTION_COLLECTION,
+    previous_entity_collection: str = None,
+):
     llm_model = settings.GRAPHRAG_LLM_MODEL
-    llm_api_base = settings.LLM_MODEL_API_BASE
-    embedding_model = settings.GRAPHRAG_EMBEDDING_MODEL
-    embedding_api_base = settings.EMBEDDING_MODEL_API_BASE
+    llm_api_base = settings.LLM_MODEL_API_BASES or settings.LLM_MODEL_API_BASE
     claim_extraction_enabled = settings.GRAPHRAG_CLAIM_EXTRACTION_ENABLED
     INPUT_DIR = settings.INPUT_DIR
-    COMMUNITY_LEVEL = settings.COMMUNITY_LEVEL
+    if store is None:
+        store = ArtifactStore(INPUT_DIR, settings.COMMUNITY_LEVEL, claim_extraction_enabled)
+
+    if text_embedder is None:
+        text_embedder = setup_text_embedder()
 
     llm = ChatOllama(
         api_base=llm_api_base,
         model=llm_model,
         max_retries=20,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_REQUEST_TIMEOUT,
+        admission=setup_admission(),
     )
 
-    token_encoder = tiktoken.get_encoding("cl100k_base")
+    if token_encoder is None:
+        token_encoder = setup_token_encoder()
 
-    entity_df = pd.read_parquet(f"{INPUT_DIR}/{ENTITY_TABLE}.parquet")
-    entity_embedding_df = pd.read_parquet(f"{INPUT_DIR}/{ENTITY_EMBEDDING_TABLE}.parquet")
-    report_df = pd.read_parquet(f"{INPUT_DIR}/{COMMUNITY_REPORT_TABLE}.parquet")
-    relationship_df = pd.read_parquet(f"{INPUT_DIR}/{RELATIONSHIP_TABLE}.parquet")
-    covariate_df = pd.read_parquet(f"{INPUT_DIR}/{COVARIATE_TABLE}.parquet") if claim_extraction_enabled else pd.DataFrame()
-    text_unit_df = pd.read_parquet(f"{INPUT_DIR}/{TEXT_UNIT_TABLE}.parquet")
+    entities = store.entities
+    claims = store.claims
 
-    entities = read_indexer_entities(entity_df, entity_embedding_df, COMMUNITY_LEVEL)
-    relationships = read_indexer_relationships(relationship_df)
-    claims = read_indexer_covariates(covariate_df) if claim_extraction_enabled else []
-    reports = read_indexer_reports(report_df, entity_df, COMMUNITY_LEVEL)
-    text_units = read_indexer_text_units(text_unit_df)
+    # Entity rows are the same whichever query selects them; the other local tables carry per-query values
+    token_encoder.precompute(collect_counted_texts(
+        lambda encoder: build_entity_context(selected_entities=entities, token_encoder=encoder, include_entity_rank=True)
+    ))
 
-    description_embedding_store = LanceDBVectorStore(
-        collection_name="entity_description_embeddings",
-    )
-    description_embedding_store.connect(db_uri=f"{INPUT_DIR}/lancedb")
-    store_entity_semantic_embeddings(entities=entities, vectorstore=description_embedding_store)
+    if settings.ENTITY_VECTOR_STORE == "numpy":
+        # The sidecar files are versioned by the store itself
+        description_embedding_store = NumpyVectorStore(
+            collection_name=ENTITY_DESCRIPTION_COLLECTION,
+        )
+        description_embedding_store.connect(db_uri=f"{INPUT_DIR}/vectors", mmap=settings.ENTITY_VECTOR_MMAP)
+        description_embedding_store.load_entities(entities)
+    else:
+        description_embedding_store = LanceDBVectorStore(
+            collection_name=entity_collection,
+        )
+        description_embedding_store.connect(db_uri=f"{INPUT_DIR}/lancedb")
+        sync_entity_semantic_embeddings(
+            entities=entities,
+            vectorstore=description_embedding_store,
+            db_uri=f"{INPUT_DIR}/lancedb",
+            ann_index_type=settings.ENTITY_ANN_INDEX,
+            ann_min_rows=settings.ENTITY_ANN_MIN_ROWS,
+            previous_collection=previous_entity_collection,
+        )
+    if settings.ENTITY_NAME_MATCH:
+        description_embedding_store = NameMatchedVectorStore(
+            description_embedding_store, EntityNameIndex(entities), mode=settings.ENTITY_NAME_MATCH,
+        )
 
-    context_builder = LocalSearchMixedContext(
-        community_reports=reports,
-        text_units=text_units,
-        entities=entities,
-        relationships=relationships,
-        covariates={"claims": claims} if claim_extraction_enabled else None,
-        entity_text_embeddings=description_embedding_store,
-        embedding_vectorstore_key=EntityVectorStoreKey.ID,
-        text_embedder=OllamaEmbedding(
-            api_base=embedding_api_base,
-            model=embedding_model,
-            max_retries=20,
+    context_builder = TimedContextBuilder(
+        LocalSearchMixedContext(
+            community_reports=store.community_reports(),
+            text_units=store.text_units,
+            entities=entities,
+            relationships=store.relationships,
+            covariates={"claims": claims} if claim_extraction_enabled else None,
+            entity_text_embeddings=description_embedding_store,
+            embedding_vectorstore_key=EntityVectorStoreKey.ID,
+            text_embedder=text_embedder,
+            token_encoder=token_encoder,
         ),
-        token_encoder=token_encoder,
+        search_type="local",
     )
 
     search_engine = LocalSearch(
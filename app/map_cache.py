@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from embedding_cache import normalize_query
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def file_fingerprint(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class MapResponseCache:
+    """
+    SQLite cache of global search map responses.
+
+    An entry is keyed on the report batch text, the normalized query, the model and the map
+    prompt and LLM parameters, so a map call is only ever replayed for an identical prompt.
+    Entries are tagged with the fingerprint of `reports_path`: when the community reports
+    parquet is rewritten, every entry is dropped on the next lookup (or at startup). Beyond
+    `max_entries` the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, reports_path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.reports_path = reports_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS map_responses "
+            "(key TEXT PRIMARY KEY, fingerprint TEXT, response TEXT, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS map_responses_last_used ON map_responses (last_used)")
+        self._db.commit()
+        self.fingerprint = None
+        self._check_fingerprint()
+
+    def _check_fingerprint(self):
+        fingerprint = file_fingerprint(self.reports_path)
+        if fingerprint == self.fingerprint:
+            return
+        with self._lock:
+            # Rows written against an older reports file (including before a restart) are dropped
+            deleted = self._db.execute("DELETE FROM map_responses WHERE fingerprint != ?", (fingerprint,)).rowcount
+            self._db.commit()
+            if self.fingerprint is not None or deleted:
+                self.invalidations += 1
+            self.fingerprint = fingerprint
+
+    @staticmethod
+    def key(context_data: str, query: str, model: str, map_prompt: str, llm_params: Dict[str, Any]) -> str:
+        digest = hashlib.sha256()
+        for part in (
+            context_data,
+            normalize_query(query),
+            model,
+            map_prompt,
+            json.dumps(llm_params, sort_keys=True, default=str),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        self._check_fingerprint()
+        with self._lock:
+            row = self._db.execute("SELECT response FROM map_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE map_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, response: List[Dict[str, Any]]):
+        self._check_fingerprint()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO map_responses (key, fingerprint, response, last_used) VALUES (?, ?, ?, ?)",
+                (key, self.fingerprint, json.dumps(response, ensure_ascii=False), time.time()),
+            )
+            excess = self._db.execute("SELECT COUNT(*) FROM map_responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM map_responses WHERE key IN "
+                    "(SELECT key FROM map_responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM map_responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
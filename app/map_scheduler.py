@@ -0,0 +1,285 @@
+import asyncio
+import io
+import logging
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from graphrag.query.context_builder.conversation_history import ConversationHistory
+from graphrag.query.llm.text_utils import num_tokens
+from graphrag.query.structured_search.base import SearchResult
+from graphrag.query.structured_search.global_search.search import GlobalSearch, GlobalSearchResult
+
+from map_cache import MapResponseCache
+from metrics import MAP_BATCH_SECONDS, SEARCH_STAGE_SECONDS
+from resilience import DeadlineExceeded, llm_failure, remaining
+
+DEFAULT_MAP_CONCURRENCY = 4
+DEFAULT_MIN_POINT_SCORE = 60
+DEFAULT_TARGET_POINTS = 30
+# Share of the time left at the start of the map phase kept for the reduce call
+DEFAULT_REDUCE_RESERVE = 0.25
+
+
+@dataclass
+class MapBatchStats:
+    index: int
+    rank: Optional[float]
+    status: str = "skipped"  # done, cancelled or skipped
+    latency: Optional[float] = None
+    rating: Optional[int] = None
+    key_points: int = 0
+    cached: bool = False
+
+
+@dataclass
+class ScheduledGlobalSearchResult(GlobalSearchResult):
+    map_batches: List[Dict[str, Any]] = field(default_factory=list)
+    stopped_early: bool = False
+    partial: bool = False
+
+
+class ScheduledGlobalSearch(GlobalSearch):
+    """
+    GlobalSearch with a scheduled map phase.
+
+    Report batches are dispatched highest community rank first, at most `map_concurrency` at a
+    time. Once the finished batches have produced `target_points` key points scoring at least
+    `min_point_score` (or enough of them to fill the reduce step's `max_data_tokens`), the
+    remaining batches are skipped and the in-flight ones cancelled. Per-batch latency and
+    rating (the best key point score) come back on the result.
+
+    With a `map_cache`, a batch whose exact map prompt was answered before is served from it
+    instead of the LLM.
+
+    Under a request deadline (resilience.deadline) with `partial_results`, the map phase gets
+    the time left minus a `reduce_reserve` share. Batches still running then are cancelled and
+    the reduce step works with the ones that finished; the result is flagged `partial`.
+    """
+
+    def __init__(
+        self,
+        *args,
+        map_concurrency: int = DEFAULT_MAP_CONCURRENCY,
+        min_point_score: int = DEFAULT_MIN_POINT_SCORE,
+        target_points: int = DEFAULT_TARGET_POINTS,
+        map_cache: Optional[MapResponseCache] = None,
+        partial_results: bool = True,
+        reduce_reserve: float = DEFAULT_REDUCE_RESERVE,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.map_concurrency = max(1, map_concurrency)
+        self.min_point_score = min_point_score
+        self.target_points = target_points
+        self.map_cache = map_cache
+        self.partial_results = partial_results
+        self.reduce_reserve = reduce_reserve
+        # Batches don't depend on the query, so their ranks are parsed once per batch text
+        self._batch_ranks: Dict[str, Optional[float]] = {}
+        self.searches = 0
+        self.early_stops = 0
+        self.batches_run = 0
+        self.batches_skipped = 0
+        self.partial_searches = 0
+        self.map_seconds = 0.0
+
+    def _batch_rank(self, context_data: str) -> Optional[float]:
+        if context_data not in self._batch_ranks:
+            rank_name = self.context_builder_params.get("community_rank_name", "rank")
+            delimiter = self.context_builder_params.get("column_delimiter", "|")
+            try:
+                ranks = pd.read_csv(io.StringIO(context_data), sep=delimiter)[rank_name]
+                self._batch_ranks[context_data] = float(pd.to_numeric(ranks, errors="coerce").max())
+            except Exception:
+                # Conversation history in front of the table, or no rank column: keep the builder's order
+                self._batch_ranks[context_data] = None
+        return self._batch_ranks[context_data]
+
+    async def _map_response_single_batch(self, context_data: str, query: str, **llm_kwargs) -> SearchResult:
+        if self.map_cache is None:
+            return await super()._map_response_single_batch(context_data=context_data, query=query, **llm_kwargs)
+        start_time = time.time()
+        key = self.map_cache.key(context_data, query, self.llm.model, self.map_system_prompt, llm_kwargs)
+        cached = self.map_cache.get(key)
+        if cached is not None:
+            return SearchResult(
+                response=cached,
+                context_data=context_data,
+                context_text=context_data,
+                completion_time=time.time() - start_time,
+                llm_calls=0,
+                prompt_tokens=0,
+            )
+        result = await super()._map_response_single_batch(context_data=context_data, query=query, **llm_kwargs)
+        # The base class returns these when the call failed or its JSON couldn't be parsed
+        if result.response not in ([], [{"answer": "", "score": 0}]):
+            self.map_cache.put(key, result.response)
+        return result
+
+    def parse_search_response(self, search_response: Any) -> List[Dict[str, Any]]:
+        # ChatOllama.agenerate answers in the OpenAI chat shape; the base parser expects the message text
+        if isinstance(search_response, dict):
+            choices = search_response.get("choices") or [{}]
+            search_response = choices[0].get("message", {}).get("content", "")
+        return super().parse_search_response(search_response)
+
+    def _high_rated_points(self, map_responses: List[SearchResult]) -> List[str]:
+        return [
+            point["answer"]
+            for response in map_responses
+            if isinstance(response.response, list)
+            for point in response.response
+            if isinstance(point, dict) and point.get("score", 0) >= self.min_point_score
+        ]
+
+    def _enough_points(self, map_responses: List[SearchResult]) -> bool:
+        points = self._high_rated_points(map_responses)
+        if self.target_points and len(points) >= self.target_points:
+            return True
+        return sum(num_tokens(point, self.token_encoder) for point in points) >= self.max_data_tokens
+
+    async def _scheduled_map(self, query: str, context_chunks: List[str]):
+        start = time.time()
+        ranks = [self._batch_rank(chunk) for chunk in context_chunks]
+        stats = [MapBatchStats(index=i, rank=rank) for i, rank in enumerate(ranks)]
+        pending = deque(sorted(range(len(context_chunks)), key=lambda i: (ranks[i] is None, -(ranks[i] or 0), i)))
+        map_responses: List[SearchResult] = []
+        enough = asyncio.Event()
+
+        async def worker():
+            while pending and not enough.is_set():
+                i = pending.popleft()
+                stats[i].status = "cancelled"
+                batch_start = time.time()
+                response = await self._map_response_single_batch(
+                    context_data=context_chunks[i], query=query, **self.map_llm_params
+                )
+                scores = [p.get("score", 0) for p in response.response if isinstance(p, dict)] if isinstance(response.response, list) else []
+                stats[i].status = "done"
+                stats[i].latency = time.time() - batch_start
+                stats[i].rating = max(scores, default=0)
+                stats[i].key_points = sum(1 for score in scores if score > 0)
+                stats[i].cached = response.llm_calls == 0
+                MAP_BATCH_SECONDS.observe(stats[i].latency, source="cache" if stats[i].cached else "llm")
+                map_responses.append(response)
+                # The base class turned an LLM failure into an empty batch; stop instead of mapping the rest
+                failure = llm_failure()
+                if failure is not None:
+                    raise failure
+                if self._enough_points(map_responses):
+                    enough.set()
+
+        map_timeout = None
+        left = remaining()
+        if left is not None and self.partial_results:
+            map_timeout = max(0.0, left * (1 - self.reduce_reserve))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.map_concurrency, len(pending)))]
+        all_done = asyncio.gather(*workers, return_exceptions=True)
+        enough_waiter = asyncio.create_task(enough.wait())
+        try:
+            done, _ = await asyncio.wait([enough_waiter, all_done], timeout=map_timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            enough_waiter.cancel()
+            for task in workers:
+                task.cancel()
+            await all_done
+        for task in workers:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+        partial = not done and any(s.status != "done" for s in stats)
+        if partial and not map_responses:
+            raise DeadlineExceeded()
+        stopped_early = enough.is_set() and any(s.status != "done" for s in stats)
+        self.searches += 1
+        self.early_stops += stopped_early
+        self.partial_searches += partial
+        self.batches_run += sum(1 for s in stats if s.status == "done")
+        self.batches_skipped += sum(1 for s in stats if s.status != "done")
+        self.map_seconds += time.time() - start
+        SEARCH_STAGE_SECONDS.observe(time.time() - start, search_type="global", stage="map")
+        if stopped_early or partial:
+            logging.info(
+                f"Global map {'hit the deadline' if partial else 'stopped early'} after "
+                f"{len(map_responses)}/{len(context_chunks)} batches in {time.time() - start:.2f}s"
+            )
+        return map_responses, stats, stopped_early, partial
+
+    async def astream_search(
+        self,
+        query: str,
+        conversation_history: Optional[ConversationHistory] = None,
+    ):
+        context_chunks, context_records = self.context_builder.build_context(
+            conversation_history=conversation_history, **self.context_builder_params
+        )
+        if self.callbacks:
+            for callback in self.callbacks:
+                callback.on_map_response_start(context_chunks)
+        map_responses, _, _, _ = await self._scheduled_map(query, context_chunks)
+        if self.callbacks:
+            for callback in self.callbacks:
+                callback.on_map_response_end(map_responses)
+
+        yield context_records
+        with SEARCH_STAGE_SECONDS.time(search_type="global", stage="reduce"):
+            async for response in self._stream_reduce_response(
+                map_responses=map_responses,
+                query=query,
+                **self.reduce_llm_params,
+            ):
+                yield response
+
+    async def asearch(
+        self,
+        query: str,
+        conversation_history: Optional[ConversationHistory] = None,
+        **kwargs: Any,
+    ) -> ScheduledGlobalSearchResult:
+        start_time = time.time()
+        context_chunks, context_records = self.context_builder.build_context(
+            conversation_history=conversation_history, **self.context_builder_params
+        )
+        if self.callbacks:
+            for callback in self.callbacks:
+                callback.on_map_response_start(context_chunks)
+        map_responses, batch_stats, stopped_early, partial = await self._scheduled_map(query, context_chunks)
+        if self.callbacks:
+            for callback in self.callbacks:
+                callback.on_map_response_end(map_responses)
+
+        with SEARCH_STAGE_SECONDS.time(search_type="global", stage="reduce"):
+            reduce_response = await self._reduce_response(
+                map_responses=map_responses,
+                query=query,
+                **self.reduce_llm_params,
+            )
+
+        return ScheduledGlobalSearchResult(
+            response=reduce_response.response,
+            context_data=context_records,
+            context_text=context_chunks,
+            map_responses=map_responses,
+            reduce_context_data=reduce_response.context_data,
+            reduce_context_text=reduce_response.context_text,
+            completion_time=time.time() - start_time,
+            llm_calls=sum(r.llm_calls for r in map_responses) + reduce_response.llm_calls,
+            prompt_tokens=sum(r.prompt_tokens for r in map_responses) + reduce_response.prompt_tokens,
+            map_batches=[asdict(s) for s in batch_stats],
+            stopped_early=stopped_early,
+            partial=partial,
+        )
+
+    def map_stats(self) -> Dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "early_stops": self.early_stops,
+            "batches_run": self.batches_run,
+            "batches_skipped": self.batches_skipped,
+            "partial_searches": self.partial_searches,
+            "avg_map_seconds": self.map_seconds / self.searches if self.searches else 0.0,
+        }
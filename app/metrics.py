@@ -0,0 +1,289 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans a cached lookup up to a slow global search against a local model
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        return []
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), cumulative
+
+
+class CallbackMetric(Metric):
+    """A gauge or counter whose samples are read from `collect()` at scrape time, for state other objects already track."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A broken collector must not take the whole scrape down
+                continue
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SEARCH_SECONDS = REGISTRY.register(Histogram(
+    "graphrag_search_seconds", "End-to-end search latency.", ["search_type", "mode"],
+))
+SEARCH_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "graphrag_search_stage_seconds", "Time spent in each search stage (context, map, reduce).", ["search_type", "stage"],
+))
+ENTITY_LOOKUPS = REGISTRY.register(Counter(
+    "graphrag_entity_lookups_total", "Local search entity lookups, by whether names or embeddings found them.", ["path"],
+))
+MAP_BATCH_SECONDS = REGISTRY.register(Histogram(
+    "graphrag_map_batch_seconds", "Latency of a single global search map batch.", ["source"],
+))
+SEARCHES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "graphrag_searches_in_flight", "Searches currently being served.", ["search_type"],
+))
+SEARCH_ERRORS = REGISTRY.register(Counter(
+    "graphrag_search_errors_total", "Searches that failed.", ["search_type"],
+))
+SEARCH_CANCELLED = REGISTRY.register(Counter(
+    "graphrag_search_cancelled_total", "Searches abandoned because the client disconnected.", ["search_type"],
+))
+SEARCH_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "graphrag_search_prompt_tokens_total", "Prompt tokens reported on search results.", ["search_type"],
+))
+SEARCH_LLM_CALLS = REGISTRY.register(Counter(
+    "graphrag_search_llm_calls_total", "LLM calls reported on search results.", ["search_type"],
+))
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ollama_chat_seconds", "Ollama chat request latency.", ["model", "mode"],
+))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    "ollama_chat_first_token_seconds", "Time to the first streamed Ollama chat token.", ["model"],
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "ollama_chat_tokens_total", "Tokens Ollama reports evaluating for chat requests.", ["model", "kind"],
+))
+EMBEDDING_SECONDS = REGISTRY.register(Histogram(
+    "ollama_embed_seconds", "Ollama embedding request latency.", ["model"],
+))
+EMBEDDING_TEXTS = REGISTRY.register(Counter(
+    "ollama_embed_texts_total", "Texts sent to Ollama for embedding.", ["model"],
+))
+OLLAMA_ERRORS = REGISTRY.register(Counter(
+    "ollama_request_errors_total", "Ollama requests that failed after retries.", ["model", "endpoint"],
+))
+LLM_BACKEND_SECONDS = REGISTRY.register(Histogram(
+    "ollama_backend_seconds", "Latency of successful requests per routed Ollama backend.", ["host"],
+))
+LLM_BACKEND_ERRORS = REGISTRY.register(Counter(
+    "ollama_backend_errors_total", "Requests that failed on a routed Ollama backend and ejected it.", ["host"],
+))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "graphrag_llm_queue_seconds", "Time an LLM call waited for an admission slot.", ["search_type"],
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "graphrag_admission_rejections_total", "Searches refused with 429 because the LLM queue was full.", ["search_type"],
+))
+
+
+_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def track_llm_usage():
+    """
+    Yield a dict counting the LLM calls made inside this block (and in tasks it starts) and
+    the prompt tokens Ollama reported for them. Streamed searches use it, since graphrag only
+    counts calls and tokens on its non-streaming path.
+    """
+    usage = {"llm_calls": 0, "prompt_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def record_llm_usage(model: str, response: Dict[str, Any]):
+    # Ollama reports these on non-streamed responses and on the final part of a stream
+    if response.get("prompt_eval_count"):
+        LLM_TOKENS.inc(response["prompt_eval_count"], model=model, kind="prompt")
+    if response.get("eval_count"):
+        LLM_TOKENS.inc(response["eval_count"], model=model, kind="completion")
+    usage = _usage.get()
+    if usage is not None:
+        usage["llm_calls"] += 1
+        usage["prompt_tokens"] += response.get("prompt_eval_count") or 0
+
+
+class TimedContextBuilder:
+    """Wraps a graphrag context builder so each `build_context` call is recorded as the search's context stage."""
+
+    def __init__(self, builder, search_type: str):
+        self.builder = builder
+        self.search_type = search_type
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.builder, name)
+
+    def build_context(self, *args, **kwargs):
+        with SEARCH_STAGE_SECONDS.time(search_type=self.search_type, stage="context"):
+            return self.builder.build_context(*args, **kwargs)
+
+
+def cache_metrics(caches: Callable[[], Dict[str, Optional[Tuple[float, float]]]]):
+    """
+    Register hit and miss counters for the caches `caches()` returns as `{name: (hits, misses)}`
+    (None for a disabled cache), read from the caches' own stats at scrape time.
+    """
+    def collect(index: int):
+        return [((name,), counts[index]) for name, counts in caches().items() if counts is not None]
+
+    REGISTRY.register(CallbackMetric(
+        "graphrag_cache_hits_total", "Cache hits.", ["cache"], lambda: collect(0), type="counter",
+    ))
+    REGISTRY.register(CallbackMetric(
+        "graphrag_cache_misses_total", "Cache misses.", ["cache"], lambda: collect(1), type="counter",
+    ))
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from graphrag.model import Entity
+from graphrag.model.types import TextEmbedder
+from graphrag.vector_stores import BaseVectorStore, VectorStoreDocument, VectorStoreSearchResult
+
+from entity_embeddings import entity_row_hash, entity_set_fingerprint
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    In-process vector store over a contiguous, L2-normalized float32 matrix.
+
+    A query is one matrix-vector product followed by `argpartition`, so there is no
+    per-query I/O and no index to maintain. Scores are cosine similarities. With a sidecar
+    directory, the matrix is saved as `{collection_name}.{version}.npy` and memory-mapped
+    read-only on later loads, which lets several processes share the same pages. The version
+    comes from the entity set fingerprint, so a file is never rewritten once written: an index
+    still draining after a reload keeps reading the matrix it mapped, and the superseded files
+    are only unlinked.
+    """
+
+    def __init__(self, collection_name: str, **kwargs: Any):
+        super().__init__(collection_name=collection_name, **kwargs)
+        self.sidecar_dir: Optional[str] = None
+        self.mmap = True
+        self.ids: List[str] = []
+        self.texts: List[Optional[str]] = []
+        self.attributes: List[Dict[str, Any]] = []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self._id_to_row: Dict[str, int] = {}
+        self._filter_mask: Optional[np.ndarray] = None
+
+    def connect(self, **kwargs: Any) -> None:
+        self.sidecar_dir = kwargs.get("db_uri")
+        self.mmap = kwargs.get("mmap", True)
+        if self.sidecar_dir:
+            os.makedirs(self.sidecar_dir, exist_ok=True)
+
+    def _sidecar_paths(self, fingerprint: str):
+        base = os.path.join(self.sidecar_dir, f"{self.collection_name}.{fingerprint[:16]}")
+        return f"{base}.npy", f"{base}.json"
+
+    def _write_sidecar(self, path: str, write):
+        # Write-then-rename, so no reader ever maps a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.sidecar_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                write(file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _remove_old_sidecars(self, keep: str):
+        pattern = re.compile(rf"{re.escape(self.collection_name)}\.[0-9a-f]{{16}}\.(npy|json)")
+        for name in os.listdir(self.sidecar_dir):
+            path = os.path.join(self.sidecar_dir, name)
+            if pattern.fullmatch(name) and not path.startswith(keep):
+                # Unlinking leaves existing mappings of the file intact
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def _set_rows(self, ids, texts, attributes, matrix: np.ndarray):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.attributes = list(attributes)
+        self.matrix = matrix
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._filter_mask = None
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def load_documents(self, documents: List[VectorStoreDocument], overwrite: bool = True) -> None:
+        documents = [document for document in documents if document.vector is not None]
+        if not overwrite and self.ids:
+            existing = [
+                VectorStoreDocument(id=doc_id, text=text, vector=self.matrix[row], attributes=attrs)
+                for row, (doc_id, text, attrs) in enumerate(zip(self.ids, self.texts, self.attributes))
+            ]
+            documents = existing + documents
+        matrix = self._normalize([document.vector for document in documents]) if documents else np.empty((0, 0), dtype=np.float32)
+        self._set_rows(
+            [str(document.id) for document in documents],
+            [document.text for document in documents],
+            [document.attributes for document in documents],
+            matrix,
+        )
+
+    def load_entities(self, entities: List[Entity]) -> str:
+        """
+        Load entity description embeddings, reusing the `.npy` sidecar when it was written for
+        the same entity set. Returns "sidecar" or "built".
+        """
+        entities = [entity for entity in entities if entity.description_embedding is not None]
+        attributes = [
+            {"title": entity.title, **entity.attributes} if entity.attributes else {"title": entity.title}
+            for entity in entities
+        ]
+        fingerprint = entity_set_fingerprint({entity.id: entity_row_hash(entity) for entity in entities})
+        ids = [entity.id for entity in entities]
+        texts = [entity.description for entity in entities]
+
+        if self.sidecar_dir:
+            matrix_path, meta_path = self._sidecar_paths(fingerprint)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as file:
+                    meta = json.load(file)
+                if meta.get("fingerprint") == fingerprint and meta.get("ids") == ids:
+                    matrix = np.load(matrix_path, mmap_mode="r" if self.mmap else None)
+                    self._set_rows(ids, texts, attributes, matrix)
+                    return "sidecar"
+            except (OSError, ValueError):
+                # Missing, or removed by another worker's newer build: build it again
+                pass
+
+        matrix = self._normalize([entity.description_embedding for entity in entities]) if entities else np.empty((0, 0), dtype=np.float32)
+        if self.sidecar_dir:
+            matrix_path, meta_path = self._sidecar_paths(fingerprint)
+            # The matrix goes first, so a meta file is never seen without its matrix
+            self._write_sidecar(matrix_path, lambda file: np.save(file, matrix))
+            meta = json.dumps({"fingerprint": fingerprint, "ids": ids}).encode("utf-8")
+            self._write_sidecar(meta_path, lambda file: file.write(meta))
+            self._remove_old_sidecars(keep=matrix_path[:-len(".npy")])
+            if self.mmap:
+                matrix = np.load(matrix_path, mmap_mode="r")
+        self._set_rows(ids, texts, attributes, matrix)
+        logging.info(f"Built {self.collection_name} vector matrix {matrix.shape}")
+        return "built"
+
+    def filter_by_id(self, include_ids: List[str] | List[int]) -> Any:
+        if len(include_ids) == 0:
+            self._filter_mask = None
+            self.query_filter = None
+        else:
+            mask = np.zeros(len(self.ids), dtype=bool)
+            rows = [self._id_to_row[str(doc_id)] for doc_id in include_ids if str(doc_id) in self._id_to_row]
+            mask[rows] = True
+            self._filter_mask = mask
+            self.query_filter = include_ids
+        return self.query_filter
+
+    def similarity_search_by_vector(self, query_embedding: List[float], k: int = 10, **kwargs: Any) -> List[VectorStoreSearchResult]:
+        if len(self.ids) == 0 or not len(query_embedding):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = self.matrix @ (query / norm)
+        if self._filter_mask is not None:
+            scores = np.where(self._filter_mask, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            VectorStoreSearchResult(
+                document=VectorStoreDocument(
+                    id=self.ids[row],
+                    text=self.texts[row],
+                    vector=self.matrix[row].tolist(),
+                    attributes=self.attributes[row],
+                ),
+                score=float(scores[row]),
+            )
+            for row in top
+            if np.isfinite(scores[row])
+        ]
+
+    def similarity_search_by_text(self, text: str, text_embedder: TextEmbedder, k: int = 10, **kwargs: Any) -> List[VectorStoreSearchResult]:
+        query_embedding = text_embedder(text)
+        if query_embedding:
+            return self.similarity_search_by_vector(query_embedding, k)
+        return []
@@ -1,52 +1,456 @@
-import ollama
+import httpx
 import asyncio
-from typing import List, Dict, Any
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, AsyncGenerator, Set, Union
 import re
+import numpy as np
+
+from admission import AdmissionController
+from resilience import (
+    BackendError,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    LLMUnavailable,
+    record_llm_failure,
+    request_timeout,
+    sleep_before_retry,
+)
+from metrics import (
+    EMBEDDING_SECONDS,
+    EMBEDDING_TEXTS,
+    LLM_BACKEND_ERRORS,
+    LLM_BACKEND_SECONDS,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_REQUEST_SECONDS,
+    OLLAMA_ERRORS,
+    REGISTRY,
+    CallbackMetric,
+    record_llm_usage,
+)
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_EMBED_BATCH_SIZE = 64
+HEALTH_CHECK_INTERVAL = 10.0
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# One pooled client per Ollama host, shared by every wrapper instance that talks to it
+_pools: Dict[str, "OllamaPool"] = {}
+_routers: Dict[tuple, "LLMRouter"] = {}
+
+
+def ollama_host(api_base: Optional[str]) -> str:
+    # Settings point at the OpenAI-compatible route (".../v1"), the native API lives at the host root.
+    # Without one, fall back to the ollama client's default host
+    host = (api_base or os.environ.get("OLLAMA_HOST") or "http://localhost:11434").rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    if host.endswith("/v1"):
+        host = host[:-3]
+    return host
+
+
+class OllamaPool:
+    """
+    A keep-alive HTTP connection pool to a single Ollama host, with a semaphore bounding
+    the number of requests in flight against it and a circuit breaker that fails requests
+    fast while the host keeps failing.
+
+    Connection errors, timeouts and 5xx responses are retried with jittered exponential
+    backoff within the current deadline (see resilience.deadline) and then raised as a
+    BackendError; 4xx responses are raised as they are, since retrying won't fix them.
+    """
+
+    def __init__(self, host: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.client = httpx.AsyncClient(
+            base_url=host,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self.in_flight = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def check_breaker(self) -> bool:
+        """Raise CircuitOpen if the breaker refuses the call, else return whether it is the half-open probe."""
+        if not self.breaker.allow():
+            raise CircuitOpen(self.host, self.breaker.retry_after())
+        return self.breaker.probing
+
+    def _failure(self, error: Exception, timeout: float) -> LLMUnavailable:
+        """Record a failed attempt and return the error to raise or retry on."""
+        if isinstance(error, httpx.TimeoutException) and timeout < self.timeout:
+            # Cut short by the caller's deadline, not the host's fault
+            return DeadlineExceeded()
+        self.breaker.record_failure()
+        return BackendError(self.host, error)
+
+    async def post(self, path: str, payload: Dict[str, Any], max_retries: int = 0) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            timeout = request_timeout(self.timeout)
+            probe = self.check_breaker()
+            try:
+                async with self.slot():
+                    response = await self.client.post(path, json=payload, timeout=timeout)
+                response.raise_for_status()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                # Client errors (bad model name, malformed request) won't go away by retrying
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                    self.breaker.record_success()
+                    raise
+                error = self._failure(e, timeout)
+                if isinstance(error, DeadlineExceeded) or attempt >= max_retries:
+                    raise error from e
+                attempt += 1
+                await sleep_before_retry(attempt)
+                continue
+            finally:
+                if probe:
+                    # A probe that was cancelled or hit the deadline must not hold the breaker half open
+                    self.breaker.probing = False
+            self.breaker.record_success()
+            return response.json()
+
+    async def stream(self, path: str, payload: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        # No retries here: once tokens have been handed to the caller the request can't be replayed
+        timeout = request_timeout(self.timeout)
+        probe = self.check_breaker()
+        try:
+            async with self.slot():
+                async with self.client.stream("POST", path, json=payload, timeout=timeout) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        part = json.loads(line)
+                        if part.get("error"):
+                            raise RuntimeError(part["error"])
+                        yield part
+                        if part.get("done"):
+                            break
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                self.breaker.record_success()
+                raise
+            raise self._failure(e, timeout) from e
+        finally:
+            if probe:
+                self.breaker.probing = False
+        self.breaker.record_success()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def get_pool(api_base: Optional[str], max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT) -> OllamaPool:
+    host = ollama_host(api_base)
+    if host not in _pools:
+        _pools[host] = OllamaPool(host, max_concurrency=max_concurrency, timeout=timeout)
+    return _pools[host]
+
+
+REGISTRY.register(CallbackMetric(
+    "ollama_pool_in_flight", "Requests holding a connection slot, per Ollama host.", ["host"],
+    lambda: [((host,), pool.in_flight) for host, pool in _pools.items()],
+))
+REGISTRY.register(CallbackMetric(
+    "ollama_pool_waiting", "Requests queued for a connection slot, per Ollama host.", ["host"],
+    lambda: [((host,), pool.waiting) for host, pool in _pools.items()],
+))
+
+
+@dataclass
+class Backend:
+    pool: OllamaPool
+    outstanding: int = 0
+    requests: int = 0
+    completed: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    latency: float = 0.0  # smoothed seconds per successful request
+    last_error: str = ""
+
+    @property
+    def host(self) -> str:
+        return self.pool.host
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.pool.breaker.state == "closed",
+            "breaker": self.pool.breaker.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            "latency": self.latency,
+            "last_error": self.last_error,
+        }
+
+
+class LLMRouter:
+    """
+    Spreads requests over several Ollama hosts, each with its own OllamaPool.
+
+    Every request goes to the backend with the fewest outstanding requests (queued or in
+    flight) among those whose circuit breaker lets calls through, ties broken by the lower
+    smoothed latency. A request that fails on one backend is retried on another; once every
+    backend has been tried, retries back off like OllamaPool.post does. A backend that keeps
+    failing has its breaker opened and gets no traffic until a probe succeeds. A background
+    task checks every backend each HEALTH_CHECK_INTERVAL seconds, opening the breaker of one
+    that doesn't answer and closing it again once it does. With every breaker open, requests
+    fail fast with CircuitOpen. With a single host this is its pool plus stats.
+    """
+
+    def __init__(self, pools: List[OllamaPool]):
+        self.backends = [Backend(pool=pool) for pool in pools]
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _pick(self, exclude: Set[str]) -> Backend:
+        available = [b for b in self.backends if b.pool.breaker.available()]
+        if not available:
+            raise CircuitOpen(
+                ", ".join(b.host for b in self.backends),
+                min(b.pool.breaker.retry_after() for b in self.backends),
+            )
+        candidates = [b for b in available if b.host not in exclude] or available
+        return min(candidates, key=lambda b: (b.outstanding, b.latency))
+
+    def _succeeded(self, backend: Backend, seconds: float):
+        backend.completed += 1
+        backend.total_seconds += seconds
+        backend.latency = seconds if not backend.latency else 0.8 * backend.latency + 0.2 * seconds
+        LLM_BACKEND_SECONDS.observe(seconds, host=backend.host)
+
+    def _failed(self, backend: Backend, error: Exception):
+        backend.errors += 1
+        backend.last_error = str(error)
+        LLM_BACKEND_ERRORS.inc(host=backend.host)
+        logging.warning(f"Ollama backend request failed: {backend.last_error}")
+
+    def _start_health_checks(self):
+        if self._health_task is None and HEALTH_CHECK_INTERVAL > 0:
+            self._health_task = asyncio.create_task(self._health_checks())
+
+    async def _health_checks(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            for backend in self.backends:
+                breaker = backend.pool.breaker
+                try:
+                    # Ollama answers its root path without loading a model
+                    response = await backend.pool.client.get("/", timeout=HEALTH_CHECK_TIMEOUT)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    if breaker.state == "closed":
+                        logging.warning(f"Ollama backend {backend.host} failed its health check: {e}")
+                    breaker.trip()
+                    continue
+                if breaker.state != "closed":
+                    logging.info(f"Ollama backend {backend.host} is healthy again")
+                    breaker.record_success()
+
+    async def post(self, path: str, payload: Dict[str, Any], max_retries: int = 0) -> Dict[str, Any]:
+        self._start_health_checks()
+        attempt = 0
+        tried: Set[str] = set()
+        while True:
+            backend = self._pick(tried)
+            backend.outstanding += 1
+            backend.requests += 1
+            start = time.time()
+            try:
+                # Retries go through the router so they can move to another backend
+                response = await backend.pool.post(path, payload)
+            except (BackendError, CircuitOpen) as e:
+                self._failed(backend, e)
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                tried.add(backend.host)
+                if len(tried) >= len(self.backends):
+                    tried.clear()
+                    await sleep_before_retry(attempt)
+                continue
+            finally:
+                backend.outstanding -= 1
+            self._succeeded(backend, time.time() - start)
+            return response
+
+    async def stream(self, path: str, payload: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        self._start_health_checks()
+        tried: Set[str] = set()
+        while True:
+            backend = self._pick(tried)
+            backend.outstanding += 1
+            backend.requests += 1
+            start = time.time()
+            started = False
+            try:
+                async for part in backend.pool.stream(path, payload):
+                    started = True
+                    yield part
+            except (BackendError, CircuitOpen) as e:
+                self._failed(backend, e)
+                tried.add(backend.host)
+                # Only a stream that hasn't produced anything yet can move to another backend
+                if started or len(tried) >= len(self.backends):
+                    raise
+                continue
+            finally:
+                backend.outstanding -= 1
+            self._succeeded(backend, time.time() - start)
+            return
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {backend.host: backend.stats() for backend in self.backends}
+
+    async def aclose(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+
+def get_router(api_bases: Union[str, List[str]], max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT) -> LLMRouter:
+    if isinstance(api_bases, str):
+        api_bases = [api_bases]
+    key = tuple(ollama_host(api_base) for api_base in api_bases)
+    if key not in _routers:
+        _routers[key] = LLMRouter([get_pool(host, max_concurrency=max_concurrency, timeout=timeout) for host in key])
+    return _routers[key]
+
+
+def backend_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for router in _routers.values():
+        stats.update(router.stats())
+    return stats
+
+
+REGISTRY.register(CallbackMetric(
+    "ollama_backend_healthy", "Whether a routed Ollama backend is currently taking requests.", ["host"],
+    lambda: [((host,), int(s["healthy"])) for host, s in backend_stats().items()],
+))
+
+
+async def close_pools():
+    for router in list(_routers.values()):
+        await router.aclose()
+    _routers.clear()
+    for pool in list(_pools.values()):
+        await pool.aclose()
+    _pools.clear()
 
 
 class ChatOllama:
-    def __init__(self, api_base, model, max_retries=20):
+    def __init__(self, api_base, model, max_retries=20, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT, admission: Optional[AdmissionController] = None):
         self.api_base = api_base
         self.model = model
         self.max_retries = max_retries
-    
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.admission = admission
+
+    @property
+    def pool(self) -> LLMRouter:
+        return get_router(self.api_base, max_concurrency=self.max_concurrency, timeout=self.timeout)
+
+    def _with_instructions(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Add instruction to respond in Hebrew
+        hebrew_instruction = {"role": "system", "content": "Please respond in Hebrew."}
+        return [hebrew_instruction] + messages
+
+    def _admission_slot(self):
+        return self.admission.slot() if self.admission else nullcontext()
+
+    async def _chat(self, messages: List[Dict[str, Any]]) -> str:
+        async with self._admission_slot():
+            start = time.time()
+            try:
+                response = await self.pool.post(
+                    "/api/chat",
+                    {"model": self.model, "messages": self._with_instructions(messages), "stream": False},
+                    max_retries=self.max_retries,
+                )
+            except Exception as e:
+                OLLAMA_ERRORS.inc(model=self.model, endpoint="chat")
+                # graphrag swallows exceptions from the LLM, so also leave it where the API will find it
+                record_llm_failure(e)
+                raise
+        LLM_REQUEST_SECONDS.observe(time.time() - start, model=self.model, mode="complete")
+        record_llm_usage(self.model, response)
+        return response['message']['content']
+
     async def achat(self, messages, **kwargs):
-        try:
-            # Add instruction to respond in Hebrew
-            hebrew_instruction = {"role": "system", "content": "Please respond in Hebrew."}
-            messages = [hebrew_instruction] + messages
-            
-            response = ollama.chat(model=self.model, messages=messages)
-            content = response['message']['content']
-            
-            return content
-        except Exception as e:
-            print(f"Error in Ollama chat: {e}")
-            return ""
-    
+        return await self._chat(messages)
+
     async def agenerate(self, messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
-        try:
-            # Add instruction to respond in Hebrew
-            hebrew_instruction = {"role": "system", "content": "Please respond in Hebrew."}
-            messages = [hebrew_instruction] + messages
-            
-            response = ollama.chat(model=self.model, messages=messages)
-            content = response['message']['content']
-            
-            return {
-                    "choices": [
-                            {
-                                    "message": {
-                                            "content": content,
-                                            "role"   : "assistant"
-                                    }
-                            }
-                    ]
-            }
-        except Exception as e:
-            print(f"Error in Ollama generate: {e}")
-            return {"choices": [{"message": {"content": "", "role": "assistant"}}]}
-    
+        content = await self._chat(messages)
+
+        return {
+                "choices": [
+                        {
+                                "message": {
+                                        "content": content,
+                                        "role"   : "assistant"
+                                }
+                        }
+                ]
+        }
+
+    async def astream_generate(self, messages: List[Dict[str, Any]], callbacks=None, **kwargs) -> AsyncGenerator[str, None]:
+        async with self._admission_slot():
+            start = time.time()
+            first_token = True
+            try:
+                async for part in self.pool.stream(
+                    "/api/chat",
+                    {"model": self.model, "messages": self._with_instructions(messages), "stream": True},
+                ):
+                    if part.get("done"):
+                        record_llm_usage(self.model, part)
+                    token = part.get('message', {}).get('content', '')
+                    if not token:
+                        continue
+                    if first_token:
+                        LLM_FIRST_TOKEN_SECONDS.observe(time.time() - start, model=self.model)
+                        first_token = False
+                    for callback in callbacks or []:
+                        callback.on_llm_new_token(token)
+                    yield token
+            except Exception as e:
+                OLLAMA_ERRORS.inc(model=self.model, endpoint="chat_stream")
+                record_llm_failure(e)
+                raise
+        LLM_REQUEST_SECONDS.observe(time.time() - start, model=self.model, mode="stream")
+
     def is_hebrew(self, text):
         # Simple check for Hebrew characters
         hebrew_pattern = re.compile(r'[\u0590-\u05FF\uFB1D-\uFB4F]')
@@ -56,21 +460,77 @@ class ChatOllama:
 # Remove the translate_to_hebrew method as it's no longer needed
 
 class OllamaEmbedding:
-    def __init__(self, api_base, model, max_retries=20):
+    def __init__(self, api_base, model, max_retries=20, batch_size=DEFAULT_EMBED_BATCH_SIZE, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
         self.api_base = api_base
         self.model = model
         self.max_retries = max_retries
-    
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._client = httpx.Client(base_url=ollama_host(api_base), timeout=timeout)
+
+    @property
+    def pool(self) -> OllamaPool:
+        return get_pool(self.api_base, max_concurrency=self.max_concurrency, timeout=self.timeout)
+
     def embed(self, text: str) -> List[float]:
+        """
+        Embed one text synchronously. graphrag's query-time entity lookup calls this from the
+        event loop, so it blocks every other request on the worker while it runs: it makes a
+        single attempt, cut short by the deadline and refused by an open circuit breaker, and
+        never sleeps to retry. Raises LLMUnavailable rather than returning an empty vector.
+        """
+        pool = self.pool
+        start = time.time()
+        timeout = request_timeout(self.timeout)
+        probe = pool.check_breaker()
         try:
-            response = ollama.embeddings(model=self.model, prompt=text)
-            return response['embedding']
-        except Exception as e:
-            print(f"Error in Ollama embedding: {e}")
-            return []
-    
+            # Same /api/embed endpoint as the batched path so single and batched vectors are comparable
+            response = self._client.post("/api/embed", json={"model": self.model, "input": text}, timeout=timeout)
+            response.raise_for_status()
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            OLLAMA_ERRORS.inc(model=self.model, endpoint="embed")
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                pool.breaker.record_success()
+                raise
+            raise pool._failure(e, timeout) from e
+        finally:
+            if probe:
+                pool.breaker.probing = False
+        pool.breaker.record_success()
+        EMBEDDING_SECONDS.observe(time.time() - start, model=self.model)
+        EMBEDDING_TEXTS.inc(model=self.model)
+        return list(response.json()['embeddings'][0])
+
     async def aembed(self, text: str) -> List[float]:
-        return await asyncio.to_thread(self.embed, text)
-    
-    async def aembed_many(self, texts: List[str]) -> List[List[float]]:
-        return [await self.aembed(text) for text in texts]
\ No newline at end of file
+        return (await self._aembed_batch([text]))[0].tolist()
+
+    async def _aembed_batch(self, texts: List[str]) -> np.ndarray:
+        start = time.time()
+        try:
+            response = await self.pool.post(
+                "/api/embed",
+                {"model": self.model, "input": texts},
+                max_retries=self.max_retries,
+            )
+        except Exception:
+            OLLAMA_ERRORS.inc(model=self.model, endpoint="embed")
+            raise
+        EMBEDDING_SECONDS.observe(time.time() - start, model=self.model)
+        EMBEDDING_TEXTS.inc(len(texts), model=self.model)
+        return np.asarray(response['embeddings'], dtype=np.float32)
+
+    async def aembed_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in chunks of `batch_size` through the multi-input embed endpoint.
+
+        Chunks run concurrently (bounded by the host pool's semaphore) and the result is a
+        contiguous float32 matrix with one row per input text, in input order. Unlike `embed`,
+        failures are raised rather than turned into empty vectors, since a missing row would
+        silently misalign the matrix.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*[self._aembed_batch(batch) for batch in batches])
+        return np.ascontiguousarray(np.vstack(results))
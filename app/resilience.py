@@ -0,0 +1,172 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 10.0
+BREAKER_FAILURES = 3
+BREAKER_RESET_SECONDS = 30.0
+
+
+class LLMUnavailable(Exception):
+    """The model backend couldn't answer; the API turns this into a 503."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackendError(LLMUnavailable):
+    def __init__(self, host: str, error: Exception):
+        response = getattr(error, "response", None)
+        detail = f"HTTP {response.status_code}" if response is not None else str(error) or type(error).__name__
+        super().__init__(f"{host} failed: {detail}")
+        self.host = host
+        self.error = error
+
+
+class CircuitOpen(LLMUnavailable):
+    def __init__(self, hosts: str, retry_after: float):
+        super().__init__(f"{hosts} is failing, not retrying for {retry_after:.0f}s", retry_after=retry_after)
+
+
+class DeadlineExceeded(LLMUnavailable):
+    def __init__(self):
+        super().__init__("Request deadline exceeded before the model answered")
+
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter: a random delay up to the exponential bound, so clients that failed together don't retry together
+    return random.uniform(0, min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempt - 1)))
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Give the LLM and embedding calls made inside this block (and in tasks it starts) at most
+    `seconds` from now, on top of any enclosing deadline. None or 0 adds no limit.
+    """
+    current = _deadline.get()
+    if seconds:
+        new = time.monotonic() + seconds
+        current = new if current is None else min(current, new)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def request_timeout(default: float) -> float:
+    """The timeout for one HTTP attempt: `default`, cut short by the deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+async def sleep_before_retry(attempt: int):
+    delay = backoff_delay(attempt)
+    left = remaining()
+    if left is not None and delay >= left:
+        raise DeadlineExceeded()
+    await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: opens after `failures` consecutive failures and fails calls fast for
+    `reset_seconds`. After that one probe call is let through (half open): its success
+    closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def available(self) -> bool:
+        """Whether a call would be let through now, without claiming the half-open probe."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def allow(self) -> bool:
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.probing = True
+        return True
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probing or self.consecutive_failures >= self.failures:
+            self.trip()
+
+    def trip(self):
+        if self.opened_at is None or self.probing:
+            self.trips += 1
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+
+_failures: ContextVar[Optional[List[Exception]]] = ContextVar("llm_failures", default=None)
+
+
+def record_llm_failure(error: Exception):
+    failures = _failures.get()
+    if failures is not None:
+        failures.append(error)
+
+
+def llm_failure() -> Optional[Exception]:
+    failures = _failures.get()
+    return failures[0] if failures else None
+
+
+@contextmanager
+def surface_llm_failures():
+    """
+    graphrag's search classes turn any exception from the LLM into an empty answer. Inside
+    this block the failures ChatOllama records are collected instead, and the first one is
+    raised when the block exits, so a search that lost its LLM fails rather than answering "".
+    """
+    token = _failures.set([])
+    try:
+        yield
+        failure = llm_failure()
+    finally:
+        _failures.reset(token)
+    if failure is not None:
+        raise failure
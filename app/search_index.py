@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Optional, Set
+
+from graphrag.query.structured_search.local_search.search import LocalSearch
+
+from artifact_store import ArtifactStore, artifact_fingerprint
+from constants import ENTITY_DESCRIPTION_COLLECTION
+from entity_embeddings import lease_collection, prune_collections
+from global_search import setup_global_search
+from local_search import setup_local_search
+from map_cache import MapResponseCache
+from map_scheduler import ScheduledGlobalSearch
+from token_counts import CachedTokenEncoder
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DRAIN_POLL_INTERVAL = 0.1
+
+
+@contextmanager
+def build_lock(lock_dir: Optional[str]):
+    """Hold an exclusive file lock in `lock_dir` across processes; a no-op without a directory or fcntl."""
+    if lock_dir is None or fcntl is None:
+        yield
+        return
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, ".build.lock"), "w") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+@dataclass(eq=False)
+class SearchIndex:
+    """One loaded version of the index artifacts and the engines built from it."""
+
+    version: str
+    store: ArtifactStore
+    global_search: ScheduledGlobalSearch
+    local_search: LocalSearch
+    loaded_at: float
+    in_flight: int = 0
+    entity_collection: Optional[str] = None
+    entity_lease: Optional[IO] = None
+
+
+class SearchIndexManager:
+    """
+    Owns the active SearchIndex and swaps in a freshly built one on reload.
+
+    Requests pin the index they started on through `acquire()`, so a swap never changes the
+    engines under a running query; the old index is only let go once its in-flight count
+    drops to zero (or `drain_timeout` passes).
+
+    With `entity_db_uri` (the LanceDB entity store), each version gets its own entity
+    collection, named after the artifact fingerprint, so a reload never writes to the
+    collection the old index is still searching. The index holds a lease on its collection
+    until it has drained; unleased collections of older versions are then dropped.
+
+    With `shared_dir` (multi-worker mode), tables come from memory-mapped copies in that
+    directory and builds are serialized across processes: the first worker to build a version
+    exports the copies, syncs the vector store and saves the token counts, and the others
+    find all of it ready.
+    """
+
+    def __init__(
+        self,
+        input_dir: str,
+        community_level: int,
+        claim_extraction_enabled: bool,
+        text_embedder,
+        token_encoder: CachedTokenEncoder,
+        map_cache: Optional[MapResponseCache] = None,
+        shared_dir: Optional[str] = None,
+        drain_timeout: float = 600.0,
+        entity_db_uri: Optional[str] = None,
+    ):
+        self.input_dir = input_dir
+        self.community_level = community_level
+        self.claim_extraction_enabled = claim_extraction_enabled
+        self.text_embedder = text_embedder
+        # Counts are keyed by text content, so one encoder (and its precomputed counts) serves every index version
+        self.token_encoder = token_encoder
+        self.token_counts_path = os.path.join(input_dir, "token_counts.npz")
+        # Keyed by the batch text, so it is shared across index versions too
+        self.map_cache = map_cache
+        self.shared_dir = shared_dir
+        self.drain_timeout = drain_timeout
+        self.entity_db_uri = entity_db_uri
+        self.reloads = 0
+        self.last_reload_error: Optional[str] = None
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._drain_tasks = set()
+        self._draining: Set[SearchIndex] = set()
+        self.current: Optional[SearchIndex] = None
+        self.current = self._build()
+
+    def _build(self) -> SearchIndex:
+        start = time.time()
+        with build_lock(self.shared_dir):
+            # Loaded under the lock, so a worker picks up counts another worker just saved
+            self.token_encoder.load(self.token_counts_path)
+            store = ArtifactStore(self.input_dir, self.community_level, self.claim_extraction_enabled, self.shared_dir)
+            if self.shared_dir:
+                store.export_shared()
+            previous_collection = self.current.entity_collection if self.current else None
+            entity_collection, entity_lease = ENTITY_DESCRIPTION_COLLECTION, None
+            if self.entity_db_uri:
+                entity_collection = f"{ENTITY_DESCRIPTION_COLLECTION}_{store.fingerprint[:16]}"
+                entity_lease = lease_collection(self.entity_db_uri, entity_collection)
+            try:
+                index = SearchIndex(
+                    version=store.fingerprint,
+                    store=store,
+                    global_search=setup_global_search(store, self.token_encoder, self.map_cache),
+                    local_search=setup_local_search(
+                        store, self.text_embedder, self.token_encoder, entity_collection, previous_collection,
+                    ),
+                    loaded_at=time.time(),
+                    entity_collection=entity_collection,
+                    entity_lease=entity_lease,
+                )
+            except BaseException:
+                if entity_lease is not None:
+                    entity_lease.close()
+                raise
+            store.release_tables()
+            self.token_encoder.save(self.token_counts_path)
+            if self.entity_db_uri:
+                # Collections left over from earlier runs; the one still being served is leased or kept
+                prune_collections(self.entity_db_uri, ENTITY_DESCRIPTION_COLLECTION, {entity_collection, previous_collection})
+        logging.info(f"Built search index {index.version[:12]} in {time.time() - start:.2f}s")
+        return index
+
+    def _release(self, index: SearchIndex):
+        """Give up a drained index's entity collection lease and drop the collections nothing serves any more."""
+        if index.entity_lease is not None:
+            index.entity_lease.close()
+            index.entity_lease = None
+        if not self.entity_db_uri:
+            return
+        keep = {self.current.entity_collection} | {other.entity_collection for other in self._draining}
+        with build_lock(self.shared_dir):
+            prune_collections(self.entity_db_uri, ENTITY_DESCRIPTION_COLLECTION, keep)
+
+    @asynccontextmanager
+    async def acquire(self):
+        index = self.current
+        index.in_flight += 1
+        try:
+            yield index
+        finally:
+            index.in_flight -= 1
+
+    async def reload(self, force: bool = False) -> Dict[str, Any]:
+        async with self._reload_lock:
+            if not force and artifact_fingerprint(self.input_dir) == self.current.version:
+                return {"reloaded": False, "version": self.current.version}
+            try:
+                # Parquet reads and LanceDB writes block, keep them off the event loop
+                new_index = await asyncio.to_thread(self._build)
+            except Exception as e:
+                logging.error(f"Index reload failed, keeping version {self.current.version[:12]}: {e}", exc_info=True)
+                self.last_reload_error = str(e)
+                raise
+            old_index, self.current = self.current, new_index
+            self.reloads += 1
+            self.last_reload_error = None
+            self._draining.add(old_index)
+            drain_task = asyncio.create_task(self._drain(old_index))
+            self._drain_tasks.add(drain_task)
+            drain_task.add_done_callback(self._drain_tasks.discard)
+            return {"reloaded": True, "version": new_index.version, "previous_version": old_index.version}
+
+    async def _drain(self, index: SearchIndex):
+        deadline = time.time() + self.drain_timeout
+        while index.in_flight > 0 and time.time() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        if index.in_flight > 0:
+            logging.warning(f"Index {index.version[:12]} still has {index.in_flight} queries after drain timeout")
+        else:
+            logging.info(f"Index {index.version[:12]} drained")
+        self._draining.discard(index)
+        # Under the reload lock, so no build is syncing a collection while unused ones are dropped
+        async with self._reload_lock:
+            try:
+                await asyncio.to_thread(self._release, index)
+            except Exception:
+                logging.warning(f"Releasing index {index.version[:12]} failed", exc_info=True)
+
+    def start_watching(self, interval: float):
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self, interval: float):
+        # A poll of the parquet stats is enough here and needs no extra dependency. Only reload once
+        # the fingerprint has been stable for a full interval, so a half-written re-index is skipped.
+        previous = self.current.version
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                fingerprint = artifact_fingerprint(self.input_dir)
+                if fingerprint != self.current.version and fingerprint == previous:
+                    await self.reload()
+                previous = fingerprint
+            except Exception:
+                # Keep serving the current version and try again on the next poll
+                logging.warning("Index watch poll failed", exc_info=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.current.version,
+            "loaded_at": self.current.loaded_at,
+            "in_flight": self.current.in_flight,
+            "pid": os.getpid(),
+            "reloads": self.reloads,
+            "last_reload_error": self.last_reload_error,
+        }
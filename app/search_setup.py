@@ -0,0 +1,38 @@
+import tiktoken
+from ollama_wrapper import OllamaEmbedding
+from admission import get_admission_controller
+from embedding_cache import CachedEmbedding
+from settings import load_settings_from_yaml
+from token_counts import CachedTokenEncoder
+
+# Components shared by the local and global search engines and the API, built from settings.yml
+settings = load_settings_from_yaml("settings.yml")
+
+def setup_text_embedder():
+    return CachedEmbedding(
+        OllamaEmbedding(
+            # Ollama's native /api/embed, not the OpenAI-compatible EMBEDDING_MODEL_API_BASE
+            api_base=settings.OLLAMA_EMBEDDING_API_BASE or None,
+            model=settings.GRAPHRAG_EMBEDDING_MODEL,
+            max_retries=20,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+        ),
+        max_entries=settings.EMBEDDING_CACHE_SIZE,
+        db_path=settings.EMBEDDING_CACHE_PATH or None,
+    )
+
+def setup_token_encoder():
+    return CachedTokenEncoder(
+        tiktoken.get_encoding("cl100k_base"),
+        max_entries=settings.TOKEN_COUNT_CACHE_SIZE,
+        num_threads=settings.TOKEN_COUNT_THREADS,
+    )
+
+def setup_admission():
+    if not settings.ADMISSION_ENABLED:
+        return None
+    return get_admission_controller(
+        # LLM_MAX_CONCURRENCY is per Ollama host
+        max_in_flight=settings.LLM_MAX_CONCURRENCY * max(1, len(settings.LLM_MODEL_API_BASES)),
+        max_queued={"local": settings.ADMISSION_MAX_QUEUE_LOCAL, "global": settings.ADMISSION_MAX_QUEUE_GLOBAL},
+    )
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic_settings import BaseSettings
 import yaml
 
@@ -9,7 +10,42 @@ class Settings(BaseSettings):
     COMMUNITY_LEVEL: int
     GRAPHRAG_API_KEY: str
     LLM_MODEL_API_BASE: str
+    LLM_MODEL_API_BASES: List[str] = []
     EMBEDDING_MODEL_API_BASE: str
+    OLLAMA_EMBEDDING_API_BASE: str = ""
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_REQUEST_TIMEOUT: float = 300.0
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_PATH: str = ""
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIZE: int = 256
+    ANSWER_CACHE_TTL: float = 3600.0
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    INDEX_WATCH_INTERVAL: float = 0.0
+    ENTITY_VECTOR_STORE: str = "lancedb"
+    ENTITY_VECTOR_MMAP: bool = True
+    ENTITY_ANN_INDEX: str = ""
+    ENTITY_ANN_MIN_ROWS: int = 10000
+    ENTITY_NAME_MATCH: str = "merge"
+    TOKEN_COUNT_CACHE_SIZE: int = 100000
+    TOKEN_COUNT_THREADS: int = 0
+    GLOBAL_MAP_CONCURRENCY: int = 4
+    GLOBAL_MAP_MIN_SCORE: int = 60
+    GLOBAL_MAP_TARGET_POINTS: int = 30
+    GLOBAL_PARTIAL_RESULTS: bool = True
+    GLOBAL_REDUCE_RESERVE: float = 0.25
+    GLOBAL_SEARCH_TIMEOUT: float = 300.0
+    LOCAL_SEARCH_TIMEOUT: float = 120.0
+    MAP_CACHE_ENABLED: bool = True
+    MAP_CACHE_SIZE: int = 10000
+    MAP_CACHE_PATH: str = "./cache/map_responses.sqlite"
+    API_WORKERS: int = 1
+    SHARED_ARTIFACTS_DIR: str = "./inputs/shared"
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE_LOCAL: int = 16
+    ADMISSION_MAX_QUEUE_GLOBAL: int = 32
+    ADMIN_TOKEN: str = ""
     
     class Config:
         env_file = ".env"
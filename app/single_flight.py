@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one computation.
+
+    The first caller for a key starts `fn()` as a task; callers arriving while it runs await
+    the same task and get its result (or its exception). The task is shielded, so a client
+    that disconnects doesn't cancel the work for everyone else waiting on it. Once every
+    caller waiting on it has been cancelled, nobody wants the result and the task is cancelled.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return `(result, coalesced)`, where `coalesced` is True if another caller's run was joined."""
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), coalesced
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.started + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / requests if requests else 0.0,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class TokenList(Sequence):
+    """
+    What `CachedTokenEncoder.encode` returns: `len()` comes from the cached count, and the
+    actual tokens are only encoded if something indexes or iterates over them.
+    """
+
+    __slots__ = ("_encoder", "_text", "_count", "_tokens")
+
+    def __init__(self, encoder, text: str, count: int):
+        self._encoder = encoder
+        self._text = text
+        self._count = count
+        self._tokens: Optional[List[int]] = None
+
+    def _materialize(self) -> List[int]:
+        if self._tokens is None:
+            self._tokens = self._encoder.encode(self._text)
+        return self._tokens
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+
+class CachedTokenEncoder:
+    """
+    Drop-in for a tiktoken Encoding in the graphrag context builders and search engines.
+
+    Those only ever call `len(token_encoder.encode(text))`, and they re-count the same report,
+    entity and text unit rows on every query. Counts are cached by a digest of the text: a
+    pinned set filled by `precompute` at index load (and persisted with `save`/`load`), plus an
+    LRU of `max_entries` counts seen while serving. Anything else is delegated to the wrapped
+    encoding.
+    """
+
+    def __init__(self, encoder, max_entries: int = DEFAULT_MAX_ENTRIES, num_threads: int = 0):
+        self.encoder = encoder
+        self.max_entries = max_entries
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.hits = 0
+        self.misses = 0
+        self._pinned: Dict[bytes, int] = {}
+        self._recent: "OrderedDict[bytes, int]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.encoder, name)
+
+    def count(self, text: str) -> int:
+        key = text_key(text)
+        with self._lock:
+            count = self._pinned.get(key)
+            if count is None:
+                count = self._recent.get(key)
+                if count is not None:
+                    self._recent.move_to_end(key)
+            if count is not None:
+                self.hits += 1
+                return count
+            self.misses += 1
+        count = len(self.encoder.encode(text))
+        with self._lock:
+            self._recent[key] = count
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+        return count
+
+    def encode(self, text: str, **kwargs):
+        if kwargs:
+            # Non-default special token handling can change the tokens, so don't serve it from the cache
+            return self.encoder.encode(text, **kwargs)
+        return TokenList(self.encoder, text, self.count(text))
+
+    def precompute(self, texts: Iterable[str]) -> int:
+        """Count and pin every text not counted yet, encoding them in parallel. Returns how many were new."""
+        start = time.time()
+        missing = {}
+        with self._lock:
+            for text in texts:
+                key = text_key(text)
+                if key not in self._pinned and key not in missing:
+                    missing[key] = text
+        if not missing:
+            return 0
+        tokens = self.encoder.encode_batch(list(missing.values()), num_threads=self.num_threads)
+        with self._lock:
+            for key, encoded in zip(missing, tokens):
+                self._pinned[key] = len(encoded)
+            self._dirty = True
+        logging.info(f"Precomputed token counts for {len(missing)} texts in {time.time() - start:.2f}s")
+        return len(missing)
+
+    def load(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path) as data:
+                if str(data["encoding"]) != self.encoder.name:
+                    return 0
+                keys, counts = data["keys"], data["counts"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable token count file {path}: {e}")
+            return 0
+        with self._lock:
+            for key, count in zip(keys, counts):
+                self._pinned.setdefault(key.tobytes(), int(count))
+        return len(keys)
+
+    def save(self, path: str):
+        with self._lock:
+            if not self._dirty:
+                return
+            keys = np.frombuffer(b"".join(self._pinned), dtype=np.uint8).reshape(-1, 16)
+            counts = np.fromiter(self._pinned.values(), dtype=np.int32, count=len(self._pinned))
+            self._dirty = False
+        # np.savez appends .npz to names without it, so write to a .npz temp name and rename
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, encoding=np.array(self.encoder.name), keys=keys, counts=counts)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "encoding": self.encoder.name,
+            "precomputed": len(self._pinned),
+            "recent": len(self._recent),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _CollectingEncoder:
+    """Counts every text as zero tokens and records it, so a context build lists every row it would count."""
+
+    def __init__(self):
+        self.texts: List[str] = []
+
+    def encode(self, text: str, **kwargs):
+        self.texts.append(text)
+        return ()
+
+
+def collect_counted_texts(build: Callable[[Any], Any]) -> List[str]:
+    """
+    Run `build(encoder)` against a recording encoder and return the texts it asked to count.
+
+    With every count at zero nothing hits a token limit, so a context build called this way
+    formats (and records) every row it could ever include.
+    """
+    collector = _CollectingEncoder()
+    build(collector)
+    return collector.texts
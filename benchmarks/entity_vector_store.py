@@ -0,0 +1,90 @@
+"""
+Compare top-k entity lookup latency of NumpyVectorStore against LanceDBVectorStore.
+
+Usage (from the repository root):
+    python benchmarks/entity_vector_store.py --sizes 10000,100000,1000000 --dim 768
+
+Vectors are random unit vectors, so recall is not measured here, only latency and load time.
+The 1M x 768 case needs roughly 3 GB of RAM for the matrix alone.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from graphrag.vector_stores import VectorStoreDocument  # noqa: E402
+from graphrag.vector_stores.lancedb import LanceDBVectorStore  # noqa: E402
+from numpy_vector_store import NumpyVectorStore  # noqa: E402
+
+
+def make_documents(n, dim, rng):
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        VectorStoreDocument(id=f"entity-{i}", text=f"description {i}", vector=vectors[i].tolist(), attributes={"title": f"entity {i}"})
+        for i in range(n)
+    ]
+
+
+def time_queries(store, queries, k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(query, k=k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20, help="top_k_mapped_entities * oversample_scaler")
+    parser.add_argument("--ann", default="", help="also benchmark LanceDB with this ANN index, e.g. IVF_PQ")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'store':<18}{'entities':>10}{'load s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for n in [int(size) for size in args.sizes.split(",")]:
+        documents = make_documents(n, args.dim, rng)
+        queries = [documents[i].vector for i in rng.integers(0, n, args.queries)]
+        workdir = tempfile.mkdtemp(prefix="vector-bench-")
+        try:
+            start = time.perf_counter()
+            numpy_store = NumpyVectorStore(collection_name="bench")
+            numpy_store.load_documents(documents)
+            load = time.perf_counter() - start
+            p50, p95 = time_queries(numpy_store, queries, args.k)
+            print(f"{'numpy':<18}{n:>10}{load:>10.2f}{p50:>10.3f}{p95:>10.3f}")
+            del numpy_store
+
+            start = time.perf_counter()
+            lance_store = LanceDBVectorStore(collection_name="bench")
+            lance_store.connect(db_uri=os.path.join(workdir, "lancedb"))
+            lance_store.load_documents(documents)
+            load = time.perf_counter() - start
+            p50, p95 = time_queries(lance_store, queries, args.k)
+            print(f"{'lancedb (flat)':<18}{n:>10}{load:>10.2f}{p50:>10.3f}{p95:>10.3f}")
+
+            if args.ann:
+                start = time.perf_counter()
+                lance_store.document_collection.create_index(
+                    metric="L2", num_partitions=max(1, int(np.sqrt(n))), num_sub_vectors=args.dim // 16, index_type=args.ann
+                )
+                load = time.perf_counter() - start
+                p50, p95 = time_queries(lance_store, queries, args.k)
+                print(f"{'lancedb (' + args.ann + ')':<18}{n:>10}{load:>10.2f}{p50:>10.3f}{p95:>10.3f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+A stand-in for the Ollama chat and embedding API, with a configurable latency model, for
+benchmarking the app without a GPU or network.
+
+Usage (from the repository root):
+    python benchmarks/fake_ollama.py --port 11500 --first-token-latency 0.2 --tokens-per-second 40
+
+Serves POST /api/chat (streamed or not) and POST /api/embed, the two routes the app's Ollama
+wrappers call. At most `--parallel` requests are served at once, like OLLAMA_NUM_PARALLEL; the
+rest queue. A chat request costs `--first-token-latency` plus its response tokens at
+`--tokens-per-second`. Global search map prompts (the ones asking for JSON "points") get
+a JSON answer with a few scored points so the reduce step has input; everything else gets
+`--response-tokens` words of filler. Embeddings are deterministic unit vectors derived from
+a hash of the text, so equal texts get equal vectors and different texts are dissimilar.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+WORDS = ["הארי", "קוסם", "טירה", "שרביט", "ספר", "לחש", "שיעור", "מכתב", "יער", "אבן"]
+
+
+def text_seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+def embed(text: str, dim: int) -> list:
+    vector = np.random.default_rng(text_seed(text)).standard_normal(dim)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(
+    first_token_latency: float = 0.2,
+    tokens_per_second: float = 40.0,
+    response_tokens: int = 60,
+    embed_latency: float = 0.01,
+    dim: int = 768,
+    parallel: int = 4,
+) -> FastAPI:
+    app = FastAPI()
+    slots = asyncio.Semaphore(parallel)
+    stats = {"chat": 0, "embed": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def answer(messages) -> list:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        rng = np.random.default_rng(text_seed(prompt))
+        if '"points"' in prompt:
+            points = [
+                {"description": " ".join(rng.choice(WORDS, 20)), "score": int(rng.integers(0, 101))}
+                for _ in range(3)
+            ]
+            # One token per word is close enough for pacing
+            return re.findall(r"\S+\s*", json.dumps({"points": points}, ensure_ascii=False))
+        return [f"{word} " for word in rng.choice(WORDS, response_tokens)]
+
+    def usage(messages, tokens) -> dict:
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        return {"prompt_eval_count": prompt_tokens, "eval_count": len(tokens)}
+
+    async def acquire():
+        await slots.acquire()
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+    def release():
+        stats["in_flight"] -= 1
+        slots.release()
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        tokens = answer(messages)
+        stats["chat"] += 1
+        if not body.get("stream", True):
+            await acquire()
+            try:
+                await asyncio.sleep(first_token_latency + len(tokens) / tokens_per_second)
+            finally:
+                release()
+            return JSONResponse({
+                "model": body.get("model"),
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "done": True,
+                **usage(messages, tokens),
+            })
+
+        async def stream():
+            await acquire()
+            try:
+                await asyncio.sleep(first_token_latency)
+                for token in tokens:
+                    yield json.dumps({"message": {"role": "assistant", "content": token}, "done": False}, ensure_ascii=False) + "\n"
+                    await asyncio.sleep(1 / tokens_per_second)
+                yield json.dumps({"message": {"role": "assistant", "content": ""}, "done": True, **usage(messages, tokens)}) + "\n"
+            finally:
+                release()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed_route(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        stats["embed"] += 1
+        await acquire()
+        try:
+            await asyncio.sleep(embed_latency)
+        finally:
+            release()
+        return JSONResponse({"model": body.get("model"), "embeddings": [embed(text, dim) for text in texts]})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+    app = create_app(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        embed_latency=args.embed_latency,
+        dim=args.dim,
+        parallel=args.parallel,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
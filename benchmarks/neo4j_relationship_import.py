@@ -0,0 +1,147 @@
+"""
+Compare the legacy relationship import (name lookups, MENTIONED_IN merged per relationship and
+chunk) against the dedup mode (id lookups, one deduplicated MENTIONED_IN stream) on a synthetic
+graph.
+
+Usage (from the repository root):
+    python benchmarks/neo4j_relationship_import.py --entities 5000 --relationships 50000
+    python benchmarks/neo4j_relationship_import.py --uri bolt://localhost:7687 --user neo4j \
+        --password secret --database bench --wipe
+
+Without --uri only the row and MERGE counts of both modes are printed. With --uri the given
+database is emptied first (so --wipe is required), the documents, chunks and entities are
+imported once, and then each relationship mode is timed from an empty set of RELATED and
+MENTIONED_IN edges. A throwaway Neo4j container is the intended target:
+    docker run --rm -p 7687:7687 -e NEO4J_AUTH=neo4j/benchmark neo4j:5
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def make_graph(folder, n_entities, n_relationships, n_chunks, chunks_per_relationship, rng):
+    """
+    Dense synthetic graph: each entity has a home region of chunks and relationships connect
+    nearby entities, so the same (entity, chunk) pair shows up across many relationships.
+    """
+    pd.DataFrame({"id": ["doc-0"], "title": ["synthetic"]}).to_parquet(f"{folder}/create_final_documents.parquet")
+    pd.DataFrame({
+        "id": [f"chunk-{i}" for i in range(n_chunks)],
+        "text": [f"chunk text {i}" for i in range(n_chunks)],
+        "n_tokens": 300,
+        "document_ids": [["doc-0"]] * n_chunks,
+    }).to_parquet(f"{folder}/create_final_text_units.parquet")
+    pd.DataFrame({
+        "id": [f"entity-{i}" for i in range(n_entities)],
+        "name": [f"ENTITY {i}" for i in range(n_entities)],
+        "type": "character",
+        "description": [f"description {i}" for i in range(n_entities)],
+    }).to_parquet(f"{folder}/create_final_entities.parquet")
+
+    sources = rng.integers(0, n_entities, n_relationships)
+    targets = (sources + rng.integers(1, 20, n_relationships)) % n_entities
+    homes = sources * n_chunks // n_entities
+    text_unit_ids = [
+        [f"chunk-{(home + offset) % n_chunks}" for offset in rng.choice(8, chunks_per_relationship, replace=False)]
+        for home in homes
+    ]
+    pd.DataFrame({
+        "id": [f"rel-{i}" for i in range(n_relationships)],
+        "source": [f"ENTITY {i}" for i in sources],
+        "target": [f"ENTITY {i}" for i in targets],
+        "weight": 1.0,
+        "rank": 1,
+        "human_readable_id": [str(i) for i in range(n_relationships)],
+        "description": "related",
+        "text_unit_ids": text_unit_ids,
+    }).to_parquet(f"{folder}/create_final_relationships.parquet")
+
+
+def run_write(driver, database, statement):
+    """Run a batched delete until it stops deleting anything."""
+    with driver.session(database=database) as session:
+        while session.run(statement).single()[0] > 0:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--relationships", type=int, default=50000)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunks-per-relationship", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--uri", default="")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="neo4j")
+    parser.add_argument("--wipe", action="store_true", help="confirm the target database may be emptied")
+    args = parser.parse_args()
+
+    if args.uri and not args.wipe:
+        parser.error(f"--uri empties database {args.database!r}; pass --wipe to confirm")
+
+    # The importer reads its connection settings from the environment at import time
+    os.environ.update({
+        "NEO4J_URI": args.uri or "bolt://localhost:7687",
+        "NEO4J_USERNAME": args.user,
+        "NEO4J_PASSWORD": args.password,
+        "NEO4J_DATABASE": args.database,
+    })
+    sys.path.insert(0, SRC_DIR)
+    import graphrag_import_neo4j_cypher as importer  # noqa: E402
+    from neo4j import GraphDatabase  # noqa: E402
+
+    folder = tempfile.mkdtemp(prefix="neo4j-bench-")
+    try:
+        make_graph(folder, args.entities, args.relationships, args.chunks, args.chunks_per_relationship, np.random.default_rng(0))
+        importer.GRAPHRAG_FOLDER = folder
+
+        relationships_df = importer.load_relationships()
+        legacy_merges = 2 * int(relationships_df["text_unit_ids"].map(len).sum())
+        mentions = len(importer.load_mentions())
+        print(f"relationships: {len(relationships_df)}")
+        print(f"MENTIONED_IN merges, legacy: {legacy_merges}")
+        print(f"MENTIONED_IN merges, dedup:  {mentions} ({legacy_merges / max(mentions, 1):.1f}x fewer)")
+        if not args.uri:
+            return
+
+        driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password), max_connection_pool_size=args.workers + 1)
+        try:
+            run_write(driver, args.database, "MATCH (n) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*)")
+            importer.create_constraints(driver)
+            importer.run_import(
+                driver, importer.BASE_TABLES, workers=args.workers, batch_size=args.batch_size,
+                checkpoint_path=os.path.join(folder, "base.json"),
+            )
+
+            print(f"{'mode':<8}{'seconds':>10}{'RELATED':>10}{'MENTIONED_IN':>14}")
+            for mode, tables in (("legacy", importer.LEGACY_RELATIONSHIP_TABLES), ("dedup", importer.RELATIONSHIP_TABLES)):
+                run_write(driver, args.database, "MATCH ()-[r:RELATED|MENTIONED_IN]->() WITH r LIMIT 10000 DELETE r RETURN count(*)")
+                start = time.perf_counter()
+                importer.run_import(
+                    driver, tables, workers=args.workers, batch_size=args.batch_size,
+                    checkpoint_path=os.path.join(folder, f"{mode}.json"),
+                )
+                seconds = time.perf_counter() - start
+                with driver.session(database=args.database) as session:
+                    related = session.run("MATCH ()-[r:RELATED]->() RETURN count(r)").single()[0]
+                    mentioned = session.run("MATCH ()-[r:MENTIONED_IN]->() RETURN count(r)").single()[0]
+                print(f"{mode:<8}{seconds:>10.2f}{related:>10}{mentioned:>14}")
+        finally:
+            driver.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
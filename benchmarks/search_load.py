@@ -0,0 +1,318 @@
+"""
+Load test /search/global and /search/local end to end against synthetic artifacts and the fake
+Ollama server, with no GPU or network.
+
+Usage (from the repository root):
+    python benchmarks/search_load.py --entities 5000 --concurrency 1,4,16 --requests 50
+    python benchmarks/search_load.py --workers 4 --json results.json
+    python benchmarks/search_load.py --url http://localhost:8000 --scenarios local
+
+Unless --url is given, this writes synthetic artifacts (synthetic_artifacts.py) or uses the
+ones in --inputs, starts fake_ollama.py and the API in a temporary working directory with a
+settings.yml pointing at both, and waits for /status. Each scenario then sends --requests
+requests at each concurrency level, cycling through distinct queries, after one warmup
+request. The answer and map caches are off unless --caches is given, so repeated queries
+still reach the (fake) LLM. Reported per scenario: p50/p95/p99 latency, throughput, errors
+and the peak proportional set size (PSS) of the API process and its workers, sampled from
+/proc (Linux only, and only for a server this script started). PSS splits each shared page
+among the processes that map it, so memory-mapped artifacts count once however many workers
+read them, where summed RSS would count them once per worker.
+
+A search counts as an error unless it answers 200 with a real answer: the canned no-data
+answer is an error, and so is a global search whose map phase came back without a single
+scored key point. When the fake server's JSON points never reach the reduce step as key
+points, the map responses aren't being parsed; the script then says so and exits with 1.
+
+The app counts prompt tokens with tiktoken's cl100k_base. For a fully offline run, point
+TIKTOKEN_CACHE_DIR at a directory that already holds it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+import yaml
+from graphrag.query.structured_search.global_search.reduce_system_prompt import NO_DATA_ANSWER
+
+from synthetic_artifacts import generate
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, "app")
+BENCHMARKS_DIR = os.path.join(ROOT_DIR, "benchmarks")
+
+QUERIES = [
+    "מי הם החברים הקרובים של הארי פוטר?",
+    "מה הקשר בין דמבלדור לוולדמורט?",
+    "אילו שיעורים לומדים בהוגוורטס?",
+    "מה תפקידו של סנייפ בסיפור?",
+    "איך נבחר הארי לקבוצת הקווידיץ'?",
+    "מה ידוע על משפחת ויזלי?",
+    "מהם אוצרות המוות?",
+    "מי שומר על אבן החכמים?",
+    "מה קרה בטורניר הקוסמים המשולש?",
+    "איך מתוארת סמטת דיאגון?",
+    "מה היחסים בין הרמיוני לרון?",
+    "מי הם אוכלי המוות?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url}: server exited with code {process.returncode} before it was ready")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} was not up after {timeout:.0f}s")
+
+
+def process_tree_pss(pid: int) -> int:
+    """Proportional set size in bytes of `pid` and all its descendants, or 0 where /proc isn't available."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as file:
+                for line in file:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as file:
+                    pending.extend(int(child) for child in file.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class MemorySampler:
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = process_tree_pss(self.pid) if self.pid else 0
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, process_tree_pss(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def map_key_points(body) -> int:
+    return sum(batch.get("key_points", 0) for batch in body.get("map_batches") or [])
+
+
+def answered(search_type, body) -> bool:
+    """Whether a 200 response holds an answer rather than a failure the API returned as one."""
+    if body.get("response", "").strip() == NO_DATA_ANSWER:
+        return False
+    return search_type != "global" or map_key_points(body) > 0
+
+
+async def run_scenario(url, search_type, concurrency, n_requests, timeout):
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        # Warmup, so the first timed request doesn't pay for connection setup and lazy loads
+        await client.get(f"/search/{search_type}", params={"query": QUERIES[-1]})
+
+        latencies = []
+        errors = 0
+        unanswered = 0
+        key_points = 0
+        queue = iter(range(n_requests))
+
+        async def user():
+            nonlocal errors, unanswered, key_points
+            for i in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"/search/{search_type}", params={"query": QUERIES[i % len(QUERIES)]})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    body = response.json()
+                    key_points += map_key_points(body)
+                    if not answered(search_type, body):
+                        unanswered += 1
+                        ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "search_type": search_type,
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "unanswered": unanswered,
+        "key_points": key_points,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def write_settings(workdir, inputs, llm_url, args):
+    with open(os.path.join(APP_DIR, "settings.yml"), "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    config.update({
+        "LLM_MODEL_API_BASE": f"{llm_url}/v1",
+        "EMBEDDING_MODEL_API_BASE": f"{llm_url}/v1",
+        "OLLAMA_EMBEDDING_API_BASE": llm_url,
+        "INPUT_DIR": inputs,
+        "SHARED_ARTIFACTS_DIR": os.path.join(workdir, "shared"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "cache", "query_embeddings.sqlite"),
+        "MAP_CACHE_PATH": os.path.join(workdir, "cache", "map_responses.sqlite"),
+        "MAP_CACHE_ENABLED": args.caches,
+        "ANSWER_CACHE_ENABLED": args.caches,
+        "INDEX_WATCH_INTERVAL": 0,
+        "API_WORKERS": args.workers,
+    })
+    with open(os.path.join(workdir, "settings.yml"), "w", encoding="utf-8") as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+
+
+def start_servers(workdir, args, processes):
+    inputs = args.inputs
+    if not inputs:
+        inputs = os.path.join(workdir, "inputs")
+        counts = generate(inputs, args.entities, args.relationships, args.text_units, dim=args.dim)
+        print("artifacts: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+
+    llm_port = free_port()
+    processes.append(subprocess.Popen([
+        sys.executable, os.path.join(BENCHMARKS_DIR, "fake_ollama.py"),
+        "--port", str(llm_port),
+        "--first-token-latency", str(args.first_token_latency),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--parallel", str(args.llm_parallel),
+        "--dim", str(args.dim),
+    ]))
+    llm_url = f"http://127.0.0.1:{llm_port}"
+    wait_until_up(llm_url, processes[-1], 30)
+
+    write_settings(workdir, os.path.abspath(inputs), llm_url, args)
+    api_port = free_port()
+    env = dict(os.environ)
+    env.setdefault("GRAPHRAG_API_KEY", "benchmark")
+    processes.append(subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api_ollama:app",
+            "--app-dir", APP_DIR,
+            "--port", str(api_port),
+            "--workers", str(args.workers),
+            "--log-level", "warning",
+        ],
+        cwd=workdir,
+        env=env,
+    ))
+    api_url = f"http://127.0.0.1:{api_port}"
+    start = time.perf_counter()
+    wait_until_up(f"{api_url}/status", processes[-1], args.startup_timeout)
+    print(f"api ready in {time.perf_counter() - start:.1f}s with {args.workers} worker(s)")
+    return api_url, processes[-1].pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="benchmark an already running API instead of starting one")
+    parser.add_argument("--inputs", default="", help="artifact folder to serve instead of synthetic artifacts")
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--relationships", type=int, default=8000)
+    parser.add_argument("--text-units", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--caches", action="store_true", help="keep the answer and map caches on")
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-parallel", type=int, default=8)
+    parser.add_argument("--scenarios", default="global,local")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=40, help="timed requests per scenario and concurrency level")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per request, in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--json", default="", help="also write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="search-bench-")
+    processes = []
+    results = []
+    exit_code = 0
+    try:
+        url, pid = (args.url.rstrip("/"), None) if args.url else start_servers(workdir, args, processes)
+        print(f"{'search':<8}{'conc':>6}{'reqs':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>8}{'peak MB':>9}")
+        for search_type in args.scenarios.split(","):
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                with MemorySampler(pid) as memory:
+                    result = asyncio.run(run_scenario(url, search_type, concurrency, args.requests, args.timeout))
+                result["peak_pss_mb"] = memory.peak / 2**20 if pid else None
+                results.append(result)
+                peak = f"{result['peak_pss_mb']:>9.0f}" if pid else f"{'-':>9}"
+                print(
+                    f"{search_type:<8}{concurrency:>6}{args.requests:>6}{result['errors']:>8}"
+                    f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                    f"{result['throughput_rps']:>8.2f}{peak}"
+                )
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as file:
+                json.dump({"args": vars(args), "results": results}, file, indent=2)
+        unparsed = [r for r in results if r["search_type"] == "global" and r["key_points"] == 0]
+        if unparsed and not args.url:
+            # The fake server always answers map prompts with scored points, so none arriving is a bug
+            print(
+                "error: no global search got a key point back from the map phase, so the fake LLM's "
+                "JSON points are not being parsed; the numbers above measure a broken path",
+                file=sys.stderr,
+            )
+            exit_code = 1
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Write a synthetic set of GraphRAG artifacts that the app can load, at any scale.
+
+Usage (from the repository root):
+    python benchmarks/synthetic_artifacts.py --output /tmp/synthetic --entities 20000
+
+The tables have the columns the app reads (see TABLE_COLUMNS in app/artifact_store.py). The
+community hierarchy has `--levels` levels, each with `--communities-per-level` times as many
+communities as the one above, and every entity belongs to one community per level. Entity
+embeddings are random unit vectors. Texts are short Hebrew-looking filler with an entity name
+in them, so prompts have realistic sizes without any real content.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+WORDS = ["הארי", "קוסם", "טירה", "שרביט", "ספר", "לחש", "שיעור", "מכתב", "יער", "אבן", "גלימה", "דרקון"]
+
+
+def filler(rng, n_words, prefix=""):
+    words = rng.choice(WORDS, n_words)
+    return (prefix + " " if prefix else "") + " ".join(words)
+
+
+def generate(
+    folder,
+    n_entities=2000,
+    n_relationships=8000,
+    n_text_units=1000,
+    levels=3,
+    communities_per_level=8,
+    dim=768,
+    seed=0,
+):
+    """Write the artifact parquet files into `folder` and return their row counts."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    entity_ids = [f"entity-{i}" for i in range(n_entities)]
+    names = [f"ישות {i}" for i in range(n_entities)]
+    text_unit_ids = [f"unit-{i}" for i in range(n_text_units)]
+
+    # Each entity appears in a few neighbouring text units
+    home_units = np.arange(n_entities) * n_text_units // max(n_entities, 1)
+    entity_units = [
+        [text_unit_ids[(home + offset) % n_text_units] for offset in range(3)]
+        for home in home_units
+    ]
+
+    sources = rng.integers(0, n_entities, n_relationships)
+    targets = (sources + rng.integers(1, 50, n_relationships)) % n_entities
+    degrees = np.bincount(np.concatenate([sources, targets]), minlength=n_entities)
+
+    # Community c at level l covers a contiguous range of entities; its children split that range
+    nodes = []
+    reports = []
+    community_id = 0
+    for level in range(levels):
+        n_communities = communities_per_level ** (level + 1)
+        for c in range(n_communities):
+            members = range(c * n_entities // n_communities, (c + 1) * n_entities // n_communities)
+            if len(members) == 0:
+                continue
+            reports.append({
+                "id": f"report-{community_id + c}",
+                "community": str(community_id + c),
+                "level": level,
+                "title": filler(rng, 3, f"קהילה {community_id + c}"),
+                "summary": filler(rng, 60, names[members[0]]),
+                "full_content": filler(rng, 400, names[members[0]]),
+                "rank": float(rng.integers(1, 11)),
+                "rank_explanation": filler(rng, 15),
+            })
+            nodes.extend(
+                {
+                    "id": entity_ids[i],
+                    "title": names[i],
+                    "level": level,
+                    "degree": int(degrees[i]),
+                    "community": str(community_id + c),
+                }
+                for i in members
+            )
+        community_id += n_communities
+
+    vectors = rng.standard_normal((n_entities, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    pd.DataFrame({
+        "id": ["doc-0"],
+        "title": ["synthetic.txt"],
+        "text_unit_ids": [text_unit_ids],
+        "raw_content": ["synthetic"],
+    }).to_parquet(f"{folder}/create_final_documents.parquet")
+    pd.DataFrame({
+        "id": entity_ids,
+        "name": names,
+        "type": "דמויות",
+        "description": [filler(rng, 40, name) for name in names],
+        "human_readable_id": np.arange(n_entities),
+        "description_embedding": list(vectors),
+        "text_unit_ids": entity_units,
+    }).to_parquet(f"{folder}/create_final_entities.parquet")
+    pd.DataFrame(nodes).to_parquet(f"{folder}/create_final_nodes.parquet")
+    pd.DataFrame(reports).to_parquet(f"{folder}/create_final_community_reports.parquet")
+
+    relationship_ids = [f"rel-{i}" for i in range(n_relationships)]
+    pd.DataFrame({
+        "id": relationship_ids,
+        "human_readable_id": [str(i) for i in range(n_relationships)],
+        "source": [names[i] for i in sources],
+        "target": [names[i] for i in targets],
+        "description": [filler(rng, 25, names[i]) for i in sources],
+        "weight": rng.integers(1, 20, n_relationships).astype(float),
+        "rank": degrees[sources] + degrees[targets],
+        "text_unit_ids": [entity_units[i][:2] for i in sources],
+    }).to_parquet(f"{folder}/create_final_relationships.parquet")
+
+    unit_entities = [[] for _ in range(n_text_units)]
+    for i, units in enumerate(entity_units):
+        for unit in units:
+            unit_entities[int(unit.split("-")[1])].append(entity_ids[i])
+    unit_relationships = [[] for _ in range(n_text_units)]
+    for i, source in enumerate(sources):
+        for unit in entity_units[source][:2]:
+            unit_relationships[int(unit.split("-")[1])].append(relationship_ids[i])
+    pd.DataFrame({
+        "id": text_unit_ids,
+        "text": [filler(rng, 250) for _ in range(n_text_units)],
+        "n_tokens": 300,
+        "document_ids": [["doc-0"]] * n_text_units,
+        "entity_ids": unit_entities,
+        "relationship_ids": unit_relationships,
+    }).to_parquet(f"{folder}/create_final_text_units.parquet")
+
+    return {
+        "entities": n_entities,
+        "nodes": len(nodes),
+        "community_reports": len(reports),
+        "relationships": n_relationships,
+        "text_units": n_text_units,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--relationships", type=int, default=8000)
+    parser.add_argument("--text-units", type=int, default=1000)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--communities-per-level", type=int, default=8)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate(
+        args.output, args.entities, args.relationships, args.text_units,
+        args.levels, args.communities_per_level, args.dim, args.seed,
+    )
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
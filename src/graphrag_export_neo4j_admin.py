@@ -0,0 +1,230 @@
+import os
+import argparse
+import csv
+import math
+import time
+from typing import Dict, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from graphrag_neo4j_common import ENTITY_TYPE_MAP, GRAPHRAG_FOLDER
+
+# Rows read from parquet per record batch; only one batch per table is in memory at a time
+EXPORT_BATCH_SIZE = int(os.getenv("NEO4J_EXPORT_BATCH_SIZE", "10000"))
+
+
+def header_type(arrow_type: Optional[pa.DataType]) -> str:
+    """neo4j-admin header type for a parquet column, so properties keep the types the Cypher import gives them."""
+    if arrow_type is None:
+        return ""
+    if pa.types.is_integer(arrow_type):
+        return ":long"
+    if pa.types.is_floating(arrow_type):
+        return ":double"
+    if pa.types.is_boolean(arrow_type):
+        return ":boolean"
+    return ""
+
+
+def csv_value(value):
+    # neo4j-admin reads an empty field as a missing property, but rejects "nan" in a :double column
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+class CsvStream:
+    """
+    One neo4j-admin CSV file: the header line, then rows as they are written. With
+    `unique=True`, rows whose key (first column, or start/end pair for relationships) was
+    already written are dropped and counted as duplicates.
+    """
+
+    def __init__(self, path: str, header: List[str], key_columns: int = 1, unique: bool = True):
+        self.path = path
+        self.key_columns = key_columns
+        self.unique = unique
+        self.rows = 0
+        self.duplicates = 0
+        self._seen = set()
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write(self, row: List) -> bool:
+        if self.unique:
+            key = tuple(row[:self.key_columns])
+            if key in self._seen:
+                self.duplicates += 1
+                return False
+            self._seen.add(key)
+        self._writer.writerow([csv_value(value) for value in row])
+        self.rows += 1
+        return True
+
+    def close(self):
+        self._file.close()
+        self._seen.clear()
+
+
+def table_path(folder: str, name: str) -> str:
+    return os.path.join(folder, f"{name}.parquet")
+
+
+def iter_rows(folder: str, name: str, columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """Stream the requested columns of a parquet artifact row by row; columns it lacks come back as None."""
+    parquet_file = pq.ParquetFile(table_path(folder, name))
+    available = [column for column in columns if column in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=available):
+        for row in batch.to_pylist():
+            yield {column: row.get(column) for column in columns}
+
+
+def property_header(folder: str, name: str, columns: List[str]) -> List[str]:
+    schema = pq.read_schema(table_path(folder, name))
+    return [f"{column}{header_type(schema.field(column).type if column in schema.names else None)}" for column in columns]
+
+
+def export(folder: str, out_dir: str, batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, Dict[str, int]]:
+    """
+    Write the GraphRAG artifacts in `folder` as neo4j-admin import CSVs in `out_dir`.
+
+    Produces the same labels, relationship types and properties as the Cypher import in
+    `graphrag_import_neo4j_cypher.py`, with entity types mapped to Hebrew and unmapped entities
+    dropped. Node files are unique on their id and relationship files on (start, end) or on the
+    relationship id, so the offline importer never sees duplicates. Relationships whose
+    endpoints aren't exported are dropped rather than left dangling. Tables whose parquet file
+    is missing are skipped.
+
+    Rows are streamed in record batches; what grows with the input is only the id sets
+    needed for deduplication and endpoint resolution.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    streams: Dict[str, CsvStream] = {}
+
+    def stream(file_name: str, header: List[str], key_columns: int = 1) -> CsvStream:
+        streams[file_name] = CsvStream(os.path.join(out_dir, file_name), header, key_columns)
+        return streams[file_name]
+
+    def exists(name: str) -> bool:
+        if os.path.exists(table_path(folder, name)):
+            return True
+        print(f"Skipping {name}: no parquet file in {folder}")
+        return False
+
+    document_ids, chunk_ids = set(), set()
+    entity_ids_by_name: Dict[str, str] = {}
+    relationship_endpoints: Dict[str, tuple] = {}
+
+    try:
+        if exists("create_final_documents"):
+            documents = stream("documents.csv", ["id:ID(Document)", "title", ":LABEL"])
+            for row in iter_rows(folder, "create_final_documents", ["id", "title"], batch_size):
+                if documents.write([row["id"], row["title"], "__Document__"]):
+                    document_ids.add(row["id"])
+
+        if exists("create_final_text_units"):
+            columns = ["id", "text", "n_tokens"]
+            header = property_header(folder, "create_final_text_units", columns)
+            chunks = stream("chunks.csv", ["id:ID(Chunk)"] + header[1:] + [":LABEL"])
+            document_chunks = stream("document_contains_chunk.csv", [":START_ID(Document)", ":END_ID(Chunk)", ":TYPE"], key_columns=2)
+            for row in iter_rows(folder, "create_final_text_units", columns + ["document_ids"], batch_size):
+                if chunks.write([row["id"], row["text"], row["n_tokens"], "__Chunk__"]):
+                    chunk_ids.add(row["id"])
+                for document_id in row["document_ids"] or []:
+                    if document_id in document_ids:
+                        document_chunks.write([document_id, row["id"], "CONTAINS"])
+
+        if exists("create_final_entities"):
+            entities = stream("entities.csv", ["id:ID(Entity)", "name", "type", "description", ":LABEL"])
+            for row in iter_rows(folder, "create_final_entities", ["id", "name", "type", "description"], batch_size):
+                entity_type = ENTITY_TYPE_MAP.get(row["type"])
+                # __Entity__.name is unique in the graph as well
+                if entity_type is None or row["name"] in entity_ids_by_name:
+                    continue
+                if entities.write([row["id"], row["name"], entity_type, row["description"], "__Entity__"]):
+                    entity_ids_by_name[row["name"]] = row["id"]
+
+        if exists("create_final_relationships"):
+            columns = ["id", "rank", "weight", "human_readable_id", "description"]
+            header = property_header(folder, "create_final_relationships", columns)
+            related = stream("related.csv", ["id"] + [":START_ID(Entity)", ":END_ID(Entity)"] + header[1:] + [":TYPE"])
+            mentions = stream("mentioned_in.csv", [":START_ID(Entity)", ":END_ID(Chunk)", ":TYPE"], key_columns=2)
+            for row in iter_rows(folder, "create_final_relationships", columns + ["source", "target", "text_unit_ids"], batch_size):
+                source_id = entity_ids_by_name.get(row["source"])
+                target_id = entity_ids_by_name.get(row["target"])
+                if source_id is None or target_id is None:
+                    continue
+                # id leads the row so the stream dedups on it; neo4j-admin doesn't care about column order
+                if not related.write([row["id"], source_id, target_id] + [row[column] for column in columns[1:]] + ["RELATED"]):
+                    continue
+                relationship_endpoints[row["id"]] = (source_id, target_id)
+                for chunk_id in row["text_unit_ids"] or []:
+                    if chunk_id in chunk_ids:
+                        mentions.write([source_id, chunk_id, "MENTIONED_IN"])
+                        mentions.write([target_id, chunk_id, "MENTIONED_IN"])
+
+        if exists("create_final_communities"):
+            columns = ["id", "level", "title"]
+            header = property_header(folder, "create_final_communities", columns)
+            communities = stream("communities.csv", ["community:ID(Community)"] + header[1:] + [":LABEL"])
+            community_chunks = stream("community_contains_chunk.csv", [":START_ID(Community)", ":END_ID(Chunk)", ":TYPE"], key_columns=2)
+            community_entities = stream("community_related_to.csv", [":START_ID(Community)", ":END_ID(Entity)", ":TYPE"], key_columns=2)
+            for row in iter_rows(folder, "create_final_communities", columns + ["text_unit_ids", "relationship_ids"], batch_size):
+                if row["id"] is None or row["title"] is None:
+                    continue
+                if not communities.write([row["id"], row["level"], row["title"], "__Community__"]):
+                    continue
+                for chunk_id in row["text_unit_ids"] or []:
+                    if chunk_id in chunk_ids:
+                        community_chunks.write([row["id"], chunk_id, "CONTAINS"])
+                for relationship_id in row["relationship_ids"] or []:
+                    for entity_id in relationship_endpoints.get(relationship_id, ()):
+                        community_entities.write([row["id"], entity_id, "RELATED_TO"])
+
+        if exists("create_final_community_reports"):
+            columns = ["title", "community", "level", "summary", "explanation", "rank", "rank_explanation", "full_content"]
+            header = property_header(folder, "create_final_community_reports", columns)
+            covariates = stream("covariates.csv", ["title:ID(Covariate)"] + header[1:] + [":LABEL"])
+            for row in iter_rows(folder, "create_final_community_reports", columns, batch_size):
+                covariates.write([row[column] for column in columns] + ["__Covariate__"])
+    finally:
+        for csv_stream in streams.values():
+            csv_stream.close()
+
+    return {
+        file_name: {"rows": csv_stream.rows, "duplicates": csv_stream.duplicates}
+        for file_name, csv_stream in streams.items()
+    }
+
+
+def import_command(out_dir: str, files: List[str], database: str = "neo4j") -> str:
+    # Node files carry a :LABEL column and relationship files a :TYPE column, so no per-file labels are needed
+    node_files = [f for f in files if f in ("documents.csv", "chunks.csv", "entities.csv", "communities.csv", "covariates.csv")]
+    relationship_files = [f for f in files if f not in node_files]
+    args = [f"--nodes={os.path.join(out_dir, f)}" for f in node_files]
+    args += [f"--relationships={os.path.join(out_dir, f)}" for f in relationship_files]
+    # Chunk texts and reports span several lines
+    args += ["--multiline-fields=true", database]
+    return "neo4j-admin database import full " + " ".join(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export GraphRAG output as neo4j-admin import CSVs")
+    parser.add_argument("--input", default=GRAPHRAG_FOLDER, help="Folder with the GraphRAG parquet artifacts")
+    parser.add_argument("--output", default=os.path.join(GRAPHRAG_FOLDER, "neo4j_import"), help="Folder to write the CSV files to")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows per parquet record batch")
+    parser.add_argument("--database", default=os.getenv("NEO4J_DATABASE") or "neo4j", help="Database name for the printed import command")
+    args = parser.parse_args()
+
+    start_s = time.time()
+    stats = export(args.input, args.output, batch_size=args.batch_size)
+    for file_name, file_stats in stats.items():
+        print(f"{file_name}: {file_stats['rows']} rows ({file_stats['duplicates']} duplicates dropped)")
+    print(f"Exported in {time.time() - start_s:.1f} s. Load with (database stopped, or a new database):")
+    print(import_command(args.output, list(stats), args.database))
+
+
+if __name__ == "__main__":
+    main()
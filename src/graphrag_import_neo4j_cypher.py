@@ -1,68 +1,272 @@
 import os
-from dotenv import load_dotenv
+import sys
+import argparse
+import json
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dotenv import load_dotenv
 import pandas as pd
+import pyarrow.parquet as pq
 from neo4j import GraphDatabase
 
-# Get the directory of the current script
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Get the root directory (one level up from src)
-root_dir = os.path.dirname(current_dir)
+from graphrag_neo4j_common import ENTITY_TYPE_MAP, GRAPHRAG_FOLDER, ROOT_DIR
 
 # Load environment variables from the root directory
-load_dotenv(os.path.join(root_dir, ".env"))
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
 
 # Neo4j connection details
-GRAPHRAG_FOLDER = os.path.join(
-    root_dir, "rag", "output", "20240906-214626", "artifacts"
-)
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE")
 
-# Print connection details for debugging (don't print the actual password)
-print(f"NEO4J_URI: {NEO4J_URI}")
-print(f"NEO4J_USER: {NEO4J_USERNAME}")
-print(f"NEO4J_PASSWORD: {'*' * len(NEO4J_PASSWORD) if NEO4J_PASSWORD else 'Not set'}")
-print(f"NEO4J_DATABASE: {NEO4J_DATABASE}")
+# Import engine settings
+IMPORT_WORKERS = int(os.getenv("NEO4J_IMPORT_WORKERS", "4"))
+IMPORT_BATCH_SIZE = int(os.getenv("NEO4J_IMPORT_BATCH_SIZE", "1000"))
+# How long execute_write keeps retrying a batch on transient errors (deadlocks, leader switches)
+IMPORT_MAX_RETRY_TIME = float(os.getenv("NEO4J_IMPORT_MAX_RETRY_TIME", "60"))
+CHECKPOINT_PATH = os.getenv(
+    "NEO4J_IMPORT_CHECKPOINT", os.path.join(GRAPHRAG_FOLDER, "neo4j_import_checkpoint.json")
+)
+
 
-# Create a Neo4j driver
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+def check_connection(driver):
+    # Print connection details for debugging (don't print the actual password)
+    print(f"NEO4J_URI: {NEO4J_URI}")
+    print(f"NEO4J_USER: {NEO4J_USERNAME}")
+    print(f"NEO4J_PASSWORD: {'*' * len(NEO4J_PASSWORD) if NEO4J_PASSWORD else 'Not set'}")
+    print(f"NEO4J_DATABASE: {NEO4J_DATABASE}")
 
-try:
-    with driver.session() as session:
-        result = session.run("RETURN 1 AS num")
-        print(f"Connection test result: {result.single()['num']}")
-except Exception as e:
-    print(f"Connection error: {e}")
-finally:
-    driver.close()
+    try:
+        with driver.session() as session:
+            result = session.run("RETURN 1 AS num")
+            print(f"Connection test result: {result.single()['num']}")
+    except Exception as e:
+        print(f"Connection error: {e}")
 
 
-def batched_import(driver, statement, df, batch_size=1000):
+@dataclass
+class ImportTable:
     """
-    Import a dataframe into Neo4j using a batched approach.
-
-    Parameters: statement is the Cypher query to execute, df is the dataframe to import, and batch_size is the number of rows to import in each batch.
+    One import stream: how to load its rows, the Cypher statement that imports a row, and the
+    streams it needs first. `load` returns either a DataFrame or an iterator of DataFrames
+    (see `stream_artifact`). `artifacts` lists the parquet files the rows are derived from
+    (defaults to `name`), so the checkpoint notices when any of them changes.
     """
-    total = len(df)
-    start_s = time.time()
 
+    name: str
+    statement: str
+    load: Callable[[], Union[pd.DataFrame, Iterable[pd.DataFrame]]]
+    depends_on: List[str] = field(default_factory=list)
+    artifacts: List[str] = field(default_factory=list)
+
+
+def _projection(parquet_file, columns):
+    if columns is None:
+        return None
+    return [column for column in columns if column in parquet_file.schema_arrow.names]
+
+
+def read_artifact(name, columns=None):
+    """Read a parquet artifact, limited to `columns` (those the file has) when given."""
+    parquet_file = pq.ParquetFile(f"{GRAPHRAG_FOLDER}/{name}.parquet")
+    return parquet_file.read(columns=_projection(parquet_file, columns)).to_pandas()
+
+
+def stream_artifact(name, columns=None, batch_size=IMPORT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Read a parquet artifact as DataFrames of at most `batch_size` rows, so only one batch is in memory."""
+    parquet_file = pq.ParquetFile(f"{GRAPHRAG_FOLDER}/{name}.parquet")
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=_projection(parquet_file, columns)):
+        yield batch.to_pandas()
+
+
+def row_batches(frames, batch_size) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Re-chunk a DataFrame or a stream of them into `(offset, frame)` batches of exactly `batch_size` rows."""
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    buffer: List[pd.DataFrame] = []
+    buffered = 0
+    offset = 0
+    for frame in frames:
+        buffer.append(frame)
+        buffered += len(frame)
+        while buffered >= batch_size:
+            combined = pd.concat(buffer, ignore_index=True) if len(buffer) > 1 else buffer[0]
+            yield offset, combined.iloc[:batch_size]
+            buffer = [combined.iloc[batch_size:]]
+            buffered -= batch_size
+            offset += batch_size
+    if buffered:
+        yield offset, pd.concat(buffer, ignore_index=True)
+
+
+def artifact_signature(names):
+    signature = []
+    for name in names:
+        stat = os.stat(f"{GRAPHRAG_FOLDER}/{name}.parquet")
+        signature.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ";".join(signature)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return {}
+
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interrupted import never leaves a truncated checkpoint behind
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
+
+
+def _write_batch(tx, statement, rows):
+    return tx.run("UNWIND $rows AS value " + statement, rows=rows).consume().counters
+
+
+def import_batch(driver, statement, rows):
+    """Run one batch in a managed write transaction; the driver retries it on transient errors."""
     with driver.session(database=NEO4J_DATABASE) as session:
-        for start in range(0, total, batch_size):
-            batch = df.iloc[start : min(start + batch_size, total)]
-            try:
-                result = session.run(
-                    "UNWIND $rows AS value " + statement, rows=batch.to_dict("records")
-                )
-                print(result.consume().counters)
-            except Exception as e:
-                print(f"Error in batch import: {e}")
+        return session.execute_write(_write_batch, statement, rows)
+
+
+def run_import(driver, tables, workers=IMPORT_WORKERS, batch_size=IMPORT_BATCH_SIZE, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Import `tables` with up to `workers` batches in flight at once.
+
+    A table starts once every table in its `depends_on` has completed (dependencies outside
+    `tables` are taken as imported by an earlier run), so independent tables
+    (and all batches within a table) run concurrently. Rows are pulled from each table's
+    loader only as workers free up, so streamed tables never sit in memory whole. Each
+    finished batch is recorded in the checkpoint file; rerunning skips recorded batches, and a
+    table's progress is discarded if its parquet file or the batch size changed. If any batch
+    of a table fails, tables that depend on it are not started and the import raises after the
+    in-flight work finishes.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint.get("folder") != GRAPHRAG_FOLDER or checkpoint.get("batch_size") != batch_size:
+        checkpoint = {"folder": GRAPHRAG_FOLDER, "batch_size": batch_size, "tables": {}}
+
+    by_name = {table.name: table for table in tables}
+    progress: Dict[str, Dict] = {}
+    for table in tables:
+        signature = artifact_signature(table.artifacts or [table.name])
+        state = checkpoint["tables"].get(table.name)
+        if not state or state.get("signature") != signature:
+            state = {"signature": signature, "done": [], "complete": False}
+            checkpoint["tables"][table.name] = state
+        progress[table.name] = state
+    save_checkpoint(checkpoint_path, checkpoint)
 
-    print(f"{total} rows in {time.time() - start_s} s.")
-    return total
+    # Enough queued work to keep every worker busy while the main thread prepares the next batch
+    max_in_flight = max(workers, 1) * 2
+    stats = {}
+    failed = {}
+    pending_batches = {}
+    started = set()
+    active: Dict[str, Tuple[Iterator[Tuple[int, pd.DataFrame]], set]] = {}
+    in_flight = {}
+
+    def start_table(table):
+        started.add(table.name)
+        state = progress[table.name]
+        if state["complete"]:
+            print(f"{table.name}: already imported, skipping")
+            stats[table.name] = {"rows": 0, "skipped_batches": len(state["done"]), "seconds": 0.0}
+            return
+        done = set(state["done"])
+        print(f"{table.name}: importing ({len(done)} batches already done)")
+        stats[table.name] = {"rows": 0, "skipped_batches": len(done), "start": time.time()}
+        pending_batches[table.name] = 0
+        active[table.name] = (row_batches(table.load(), batch_size), done)
+
+    def next_batch(name) -> Optional[Tuple[int, pd.DataFrame]]:
+        batches, done = active[name]
+        for start, frame in batches:
+            if start not in done:
+                return start, frame
+        del active[name]
+        if pending_batches[name] == 0:
+            finish_table(name)
+        return None
+
+    def fill():
+        while len(in_flight) < max_in_flight and active:
+            for name in list(active):
+                if len(in_flight) >= max_in_flight:
+                    break
+                batch = next_batch(name)
+                if batch is None:
+                    continue
+                start, frame = batch
+                rows = frame.to_dict("records")
+                future = executor.submit(import_batch, driver, by_name[name].statement, rows)
+                in_flight[future] = (name, start, len(rows))
+                pending_batches[name] += 1
+
+    def finish_table(name):
+        table_stats = stats[name]
+        table_stats["seconds"] = time.time() - table_stats.pop("start")
+        rate = table_stats["rows"] / table_stats["seconds"] if table_stats["seconds"] else 0.0
+        table_stats["rows_per_second"] = rate
+        if name in failed:
+            print(f"{name}: {failed[name]} batches failed, imported {table_stats['rows']} rows")
+            return
+        progress[name]["complete"] = True
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"{name}: {table_stats['rows']} rows in {table_stats['seconds']:.1f} s ({rate:.0f} rows/s)")
+
+    def complete(name):
+        return name not in progress or progress[name]["complete"]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for table in tables:
+                if table.name in started or any(dep in failed for dep in table.depends_on):
+                    continue
+                if all(complete(dep) for dep in table.depends_on):
+                    start_table(table)
+            fill()
+            if not in_flight:
+                if active:
+                    continue
+                # Finishing the last batches may have unblocked dependent tables
+                if any(
+                    table.name not in started
+                    and not any(dep in failed for dep in table.depends_on)
+                    and all(complete(dep) for dep in table.depends_on)
+                    for table in tables
+                ):
+                    continue
+                break
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, start, row_count = in_flight.pop(future)
+                try:
+                    future.result()
+                    progress[name]["done"].append(start)
+                    stats[name]["rows"] += row_count
+                except Exception as e:
+                    print(f"Error in {name} batch at row {start}: {e}")
+                    failed[name] = failed.get(name, 0) + 1
+                pending_batches[name] -= 1
+                if pending_batches[name] == 0 and name not in active:
+                    finish_table(name)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    blocked = [name for name in by_name if name not in started]
+    if failed or blocked:
+        raise RuntimeError(f"Import incomplete: failed batches {failed}, not started {blocked}. Rerun to resume.")
+    return stats
 
 
 def create_constraints(driver):
@@ -83,67 +287,127 @@ def create_constraints(driver):
                 session.run(statement.strip())
 
 
-def main():
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+DOCUMENT_COLUMNS = ["id", "title"]
+CHUNK_COLUMNS = ["id", "text", "n_tokens", "document_ids"]
+ENTITY_COLUMNS = ["id", "name", "type", "description"]
+RELATIONSHIP_COLUMNS = ["id", "source", "target", "rank", "weight", "human_readable_id", "description", "text_unit_ids"]
+COMMUNITY_COLUMNS = ["id", "level", "title", "text_unit_ids", "relationship_ids"]
+COVARIATE_COLUMNS = ["title", "community", "level", "summary", "explanation", "rank", "rank_explanation", "full_content"]
 
-    try:
-        # Create constraints
-        create_constraints(driver)
 
-        # Import documents
-        documents_df = pd.read_parquet(
-            f"{GRAPHRAG_FOLDER}/create_final_documents.parquet"
-        )
-        document_statement = """
+def map_entity_types(entities_df):
+    # Handling Hebrew UTF-8 text encoding and entity types
+    entities_df["type"] = entities_df["type"].map(ENTITY_TYPE_MAP)
+    return entities_df.dropna(subset=["type"])
+
+
+def load_entities():
+    return map_entity_types(read_artifact("create_final_entities", ENTITY_COLUMNS))
+
+
+def stream_entities():
+    for entities_df in stream_artifact("create_final_entities", ENTITY_COLUMNS):
+        yield map_entity_types(entities_df)
+
+
+def load_relationships():
+    return read_artifact("create_final_relationships", RELATIONSHIP_COLUMNS).dropna(subset=["source", "target"])
+
+
+def stream_relationships():
+    for relationships_df in stream_artifact("create_final_relationships", RELATIONSHIP_COLUMNS):
+        yield relationships_df.dropna(subset=["source", "target"])
+
+
+def entity_ids_by_name():
+    return load_entities().drop_duplicates(subset=["name"]).set_index("name")["id"]
+
+
+def resolve_endpoints(relationships_df, name_to_id):
+    """
+    Add `source_id`/`target_id` resolved from entity names, so the import can look endpoints up
+    through the unique `id` constraint. Rows whose endpoints aren't imported as entities are
+    dropped, as the name MATCH would have skipped them.
+    """
+    relationships_df["source_id"] = relationships_df["source"].map(name_to_id)
+    relationships_df["target_id"] = relationships_df["target"].map(name_to_id)
+    return relationships_df.dropna(subset=["source_id", "target_id"])
+
+
+def stream_resolved_relationships():
+    name_to_id = entity_ids_by_name()
+    for relationships_df in stream_relationships():
+        yield resolve_endpoints(relationships_df, name_to_id)
+
+
+def load_mentions():
+    """
+    Distinct (entity_id, chunk_id) pairs for MENTIONED_IN, taken from both endpoints of every
+    relationship. Sorted by entity so each entity's edges land in as few batches as possible
+    and concurrent batches take node locks in a consistent order.
+    """
+    relationships_df = resolve_endpoints(
+        read_artifact("create_final_relationships", ["source", "target", "text_unit_ids"]).dropna(subset=["source", "target"]),
+        entity_ids_by_name(),
+    )
+    mentions_df = pd.concat([
+        relationships_df[["source_id", "text_unit_ids"]].rename(columns={"source_id": "entity_id"}),
+        relationships_df[["target_id", "text_unit_ids"]].rename(columns={"target_id": "entity_id"}),
+    ])
+    mentions_df = mentions_df.explode("text_unit_ids").rename(columns={"text_unit_ids": "chunk_id"})
+    mentions_df = mentions_df.dropna(subset=["chunk_id"]).drop_duplicates()
+    return mentions_df.sort_values(["entity_id", "chunk_id"]).reset_index(drop=True)
+
+
+def stream_communities():
+    for communities_df in stream_artifact("create_final_communities", COMMUNITY_COLUMNS):
+        yield communities_df.dropna(subset=["id", "title"])
+
+
+def load_covariates():
+    return read_artifact("create_final_community_reports", COVARIATE_COLUMNS).drop_duplicates(subset=["title"])
+
+
+BASE_TABLES = [
+    ImportTable(
+        name="create_final_documents",
+        statement="""
         MERGE (d:__Document__ {id: value.id})
         SET d.title = value.title
-        """
-        batched_import(driver, document_statement, documents_df)
-
-        # Import chunks
-        chunks_df = pd.read_parquet(
-            f"{GRAPHRAG_FOLDER}/create_final_text_units.parquet"
-        )
-        chunk_statement = """
+        """,
+        load=lambda: stream_artifact("create_final_documents", DOCUMENT_COLUMNS),
+    ),
+    ImportTable(
+        name="create_final_text_units",
+        statement="""
         MERGE (c:__Chunk__ {id: value.id})
         SET c.text = value.text, c.n_tokens = value.n_tokens
         WITH c, value
         UNWIND value.document_ids AS doc_id
         MERGE (d:__Document__ {id: doc_id})
         MERGE (d)-[:CONTAINS]->(c)
-        """
-        batched_import(driver, chunk_statement, chunks_df)
-
-        # Import entities (Handling Hebrew UTF-8 text encoding and entity types)
-        entities_df = pd.read_parquet(
-                f"{GRAPHRAG_FOLDER}/create_final_entities.parquet"
-        )
-        entities_df["type"] = entities_df["type"].map(
-                {
-                        "character"     : "דמויות",
-                        "magical_object": "חפצים קסומים",
-                        "place"         : "מקומות",
-                        "event"         : "אירועים",
-                        "institution"   : "מוסדות",
-                }
-        )
-        entities_df = entities_df.dropna(subset=["type"])
-        
-        entity_statement = """
+        """,
+        load=lambda: stream_artifact("create_final_text_units", CHUNK_COLUMNS),
+        depends_on=["create_final_documents"],
+    ),
+    ImportTable(
+        name="create_final_entities",
+        statement="""
         MERGE (e:__Entity__ {id: value.id})
         SET e.name = value.name,
             e.type = value.type,
             e.description = value.description
-        """
-        batched_import(driver, entity_statement, entities_df)
-        
-        # Import relationships (Ensuring Hebrew names and relationships are handled)
-        relationships_df = pd.read_parquet(
-                f"{GRAPHRAG_FOLDER}/create_final_relationships.parquet"
-        )
-        relationships_df = relationships_df.dropna(subset=["source", "target"])
-        
-        relationship_statement = """
+        """,
+        load=stream_entities,
+        depends_on=["create_final_text_units"],
+    ),
+]
+
+# Original statement: looks endpoints up by name and merges MENTIONED_IN once per relationship and chunk
+LEGACY_RELATIONSHIP_TABLES = [
+    ImportTable(
+        name="create_final_relationships",
+        statement="""
         MATCH (source:__Entity__ {name: value.source})
         MATCH (target:__Entity__ {name: value.target})
         MERGE (source)-[r:RELATED {id: value.id}]->(target)
@@ -154,16 +418,44 @@ def main():
         MERGE (c:__Chunk__ {id: chunk_id})
         MERGE (source)-[:MENTIONED_IN]->(c)
         MERGE (target)-[:MENTIONED_IN]->(c)
-        """
-        batched_import(driver, relationship_statement, relationships_df)
-        
-        # Import communities
-        communities_df = pd.read_parquet(
-                f"{GRAPHRAG_FOLDER}/create_final_communities.parquet"
-        )
-        communities_df = communities_df.dropna(subset=["id", "title"])
-        
-        community_statement = """
+        """,
+        load=stream_relationships,
+        depends_on=["create_final_entities"],
+    ),
+]
+
+# Relationships resolved to entity ids, with MENTIONED_IN written as its own deduplicated stream
+RELATIONSHIP_TABLES = [
+    ImportTable(
+        name="create_final_relationships",
+        statement="""
+        MATCH (source:__Entity__ {id: value.source_id})
+        MATCH (target:__Entity__ {id: value.target_id})
+        MERGE (source)-[r:RELATED {id: value.id}]->(target)
+        SET r.rank = value.rank, r.weight = value.weight,
+            r.human_readable_id = value.human_readable_id, r.description = value.description
+        """,
+        load=stream_resolved_relationships,
+        depends_on=["create_final_entities"],
+        artifacts=["create_final_relationships", "create_final_entities"],
+    ),
+    ImportTable(
+        name="entity_mentions",
+        statement="""
+        MATCH (e:__Entity__ {id: value.entity_id})
+        MATCH (c:__Chunk__ {id: value.chunk_id})
+        MERGE (e)-[:MENTIONED_IN]->(c)
+        """,
+        load=load_mentions,
+        depends_on=["create_final_entities"],
+        artifacts=["create_final_relationships", "create_final_entities"],
+    ),
+]
+
+COMMUNITY_TABLES = [
+    ImportTable(
+        name="create_final_communities",
+        statement="""
         MERGE (c:__Community__ {community: value.id})
         SET c.level = value.level, c.title = value.title
         WITH c, value
@@ -176,16 +468,14 @@ def main():
         WITH c, startNode(r) AS start, endNode(r) AS end
         MERGE (c)-[:RELATED_TO]->(start)
         MERGE (c)-[:RELATED_TO]->(end)
-        """
-        batched_import(driver, community_statement, communities_df)
-
-        # Import covariates
-        covariates_df = pd.read_parquet(
-            f"{GRAPHRAG_FOLDER}/create_final_community_reports.parquet"
-        )
-        covariates_df.drop_duplicates(subset=["title"], inplace=True)
-        
-        covariate_statement = """
+        """,
+        load=stream_communities,
+        depends_on=["create_final_relationships"],
+    ),
+    # Community reports don't reference any other node, so they import alongside everything else
+    ImportTable(
+        name="create_final_community_reports",
+        statement="""
         MERGE (c:__Covariate__ {title: value.title})
         SET c.community = value.community,
             c.level = value.level,
@@ -194,11 +484,54 @@ def main():
             c.rank = value.rank,
             c.rank_explanation = value.rank_explanation,
             c.full_content = value.full_content
-        """
-        batched_import(driver, covariate_statement, covariates_df)
+        """,
+        load=load_covariates,
+    ),
+]
+
+
+def import_tables(relationship_mode="dedup"):
+    relationship_tables = LEGACY_RELATIONSHIP_TABLES if relationship_mode == "legacy" else RELATIONSHIP_TABLES
+    return BASE_TABLES + relationship_tables + COMMUNITY_TABLES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import GraphRAG output into Neo4j")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="Batches imported concurrently")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per write transaction")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Progress file used to resume an interrupted import")
+    parser.add_argument(
+        "--relationship-mode", choices=["dedup", "legacy"], default="dedup",
+        help="dedup resolves endpoints by id and writes MENTIONED_IN as a separate deduplicated stream",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and import everything again")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    driver = GraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
+        max_connection_pool_size=max(args.workers, 1) + 1,
+        max_transaction_retry_time=IMPORT_MAX_RETRY_TIME,
+    )
+
+    try:
+        check_connection(driver)
+
+        # Create constraints
+        create_constraints(driver)
+
+        start_s = time.time()
+        stats = run_import(driver, import_tables(args.relationship_mode), workers=args.workers, batch_size=args.batch_size, checkpoint_path=args.checkpoint)
+        total = sum(table_stats["rows"] for table_stats in stats.values())
+        print(f"Imported {total} rows in {time.time() - start_s:.1f} s.")
 
     except Exception as e:
-        print(f"Error during import: {e}")
+        # Exit non-zero so scripts can tell a failed or incomplete import from a finished one
+        print(f"Error during import: {e}", file=sys.stderr)
+        sys.exit(1)
 
     finally:
         driver.close()
@@ -0,0 +1,21 @@
+"""
+Settings and mappings shared by the Neo4j Cypher importer and the neo4j-admin CSV exporter.
+Kept free of the neo4j driver and dotenv, so the exporter runs without either.
+"""
+import os
+
+# Root directory of the repository (one level up from src)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRAPHRAG_FOLDER = os.path.join(
+    ROOT_DIR, "rag", "output", "20240906-214626", "artifacts"
+)
+
+# Entity types as they are labelled in the graph (Hebrew); rows of any other type are not imported
+ENTITY_TYPE_MAP = {
+        "character"     : "דמויות",
+        "magical_object": "חפצים קסומים",
+        "place"         : "מקומות",
+        "event"         : "אירועים",
+        "institution"   : "מוסדות",
+}
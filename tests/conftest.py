@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts in src/ and the modules in app/ import their siblings by bare name, as they do when run from there
+for folder in ("src", "app"):
+    path = os.path.join(ROOT_DIR, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
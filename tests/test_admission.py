@@ -0,0 +1,134 @@
+import asyncio
+from contextlib import nullcontext
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+from resilience import DeadlineExceeded, deadline
+
+
+async def hold_slot(controller, search_type, started, release, served=None, name=None):
+    with controller.admit(search_type) if search_type else nullcontext():
+        async with controller.slot():
+            if served is not None:
+                served.append(name)
+            started.set()
+            await release.wait()
+
+
+async def queue_call(controller, search_type, served, name):
+    release = asyncio.Event()
+    release.set()
+    task = asyncio.create_task(hold_slot(controller, search_type, asyncio.Event(), release, served, name))
+    # Let it reach the queue before the next one, so FIFO order within a priority is defined
+    await asyncio.sleep(0)
+    return task
+
+
+def test_waiting_calls_are_served_by_priority_then_arrival():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(controller, "global", started, release))
+        await started.wait()
+
+        served = []
+        tasks = [
+            await queue_call(controller, "global", served, "global 1"),
+            await queue_call(controller, None, served, "other"),
+            await queue_call(controller, "local", served, "local 1"),
+            await queue_call(controller, "global", served, "global 2"),
+            await queue_call(controller, "local", served, "local 2"),
+        ]
+        assert controller.stats()["waiting"] == {"local": 2, "global": 2, "other": 1}
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        assert served == ["local 1", "local 2", "global 1", "global 2", "other"]
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_check_refuses_when_the_queue_ahead_is_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued={"local": 2, "global": 3})
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(controller, "global", started, release))
+        await started.wait()
+        tasks = [await queue_call(controller, "global", [], "global") for _ in range(3)]
+
+        # Queued global calls are behind a new local search, so they don't count against it
+        controller.check("local")
+        with pytest.raises(Overloaded) as overloaded:
+            controller.check("global")
+        assert overloaded.value.queued == 3
+        # Three calls through one slot at the seeded 5s per call
+        assert overloaded.value.retry_after == 15
+
+        tasks += [await queue_call(controller, "local", [], "local") for _ in range(2)]
+        with pytest.raises(Overloaded):
+            controller.check("local")
+        assert controller.rejected == {"global": 1, "local": 1}
+
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        controller.check("global")
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(controller, "global", started, release))
+        await started.wait()
+
+        served = []
+        cancelled = await queue_call(controller, "local", served, "cancelled")
+        waiting = await queue_call(controller, "global", served, "waiting")
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, waiting)
+        assert cancelled.cancelled()
+        assert served == ["waiting"]
+        assert controller.in_flight == 0
+        assert controller.stats()["waiting"] == {"local": 0, "global": 0, "other": 0}
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_as_it_is_handed_the_slot_passes_it_on():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1)
+        served = []
+        async with controller.slot():
+            first = await queue_call(controller, "local", served, "first")
+            second = await queue_call(controller, "local", served, "second")
+        # Leaving the block handed the slot to first, which is cancelled before it gets to run
+        first.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        assert first.cancelled()
+        assert served == ["second"]
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_queued_call_gives_up_at_the_deadline():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold_slot(controller, "global", started, release))
+        await started.wait()
+        with deadline(0.05), pytest.raises(DeadlineExceeded):
+            with controller.admit("local"):
+                async with controller.slot():
+                    pass
+        assert controller.stats()["waiting"]["local"] == 0
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+from resilience import BackendError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeEmbedder:
+    """Embeds a query as its word counts over a fixed vocabulary."""
+
+    VOCABULARY = ["harry", "hermione", "ron", "who", "is", "wand"]
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def aembed(self, text):
+        self.calls += 1
+        if self.fail:
+            raise BackendError("http://ollama.test", ConnectionError("refused"))
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(word)) for word in self.VOCABULARY]
+
+
+class Versions:
+    def __init__(self):
+        self.version = "v1"
+
+    def __call__(self):
+        return self.version
+
+
+def answer(text):
+    return {"response": text, "context_data": {}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def versions():
+    return Versions()
+
+
+def make_cache(versions, **kwargs):
+    return AnswerCache(FakeEmbedder(), versions, community_level=2, **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_normalized_and_similar_queries_hit(clock, versions):
+    cache = make_cache(versions)
+    run(cache.store("local", "Who is Harry?", answer("a wizard"), "v1"))
+
+    exact = run(cache.lookup("local", "  who IS   harry? "))
+    assert exact["response"] == "a wizard"
+    assert exact["cache"]["match"] == "exact" and exact["cache"]["index_version"] == "v1"
+    semantic = run(cache.lookup("local", "who is harry"))
+    assert semantic["cache"]["match"] == "semantic"
+    assert run(cache.lookup("global", "Who is Harry?")) is None
+    assert run(cache.lookup("local", "who is hermione?")) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_serving_a_new_index_version_drops_the_cache(clock, versions):
+    cache = make_cache(versions)
+    run(cache.store("local", "Who is Harry?", answer("a wizard"), "v1"))
+    assert run(cache.lookup("local", "Who is Harry?")) is not None
+
+    versions.version = "v2"
+    assert run(cache.lookup("local", "Who is Harry?")) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+    # An answer that started on v1 and finished after the reload is not kept
+    run(cache.store("local", "Who is Harry?", answer("stale"), "v1"))
+    assert run(cache.lookup("local", "Who is Harry?")) is None
+    run(cache.store("local", "Who is Harry?", answer("fresh"), "v2"))
+    assert run(cache.lookup("local", "Who is Harry?"))["response"] == "fresh"
+
+
+def test_entries_expire_after_the_ttl(clock, versions):
+    cache = make_cache(versions, ttl=60)
+    run(cache.store("local", "Who is Harry?", answer("a wizard"), "v1"))
+    clock.now += 60
+    assert run(cache.lookup("local", "Who is Harry?"))["cache"]["age"] == 60
+    clock.now += 1
+    assert run(cache.lookup("local", "Who is Harry?")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock, versions):
+    cache = make_cache(versions, max_entries=2, similarity_threshold=1.1)
+    run(cache.store("local", "harry", answer("1"), "v1"))
+    run(cache.store("local", "hermione", answer("2"), "v1"))
+    assert run(cache.lookup("local", "harry")) is not None
+    run(cache.store("local", "ron", answer("3"), "v1"))
+
+    assert run(cache.lookup("local", "hermione")) is None
+    assert run(cache.lookup("local", "harry"))["response"] == "1"
+    assert run(cache.lookup("local", "ron"))["response"] == "3"
+
+
+def test_failed_answers_and_embeddings(clock, versions):
+    cache = make_cache(versions)
+    run(cache.store("global", "Who is Harry?", answer(""), "v1"))
+    assert cache.stats()["entries"] == 0
+
+    # Without the embedder the answer is still kept for exact matches
+    cache.embedder.fail = True
+    run(cache.store("global", "Who is Harry?", answer("a wizard"), "v1"))
+    assert run(cache.lookup("global", "who is harry?"))["cache"]["match"] == "exact"
+    assert run(cache.lookup("global", "who is ron?")) is None
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from embedding_cache import CachedEmbedding, normalize_query
+
+
+class FakeEmbedding:
+    def __init__(self, model="nomic-embed-text"):
+        self.model = model
+        self.calls = []
+
+    def embed(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 0.5]
+
+    async def aembed(self, text):
+        return self.embed(text)
+
+
+def test_normalize_query_folds_case_spacing_and_mark_order():
+    # Shin with dagesh and shin dot, typed in the two mark orders
+    typed = ["\u05e9\u05bc\u05c1\u05dc\u05d5\u05dd", "\u05e9\u05c1\u05bc\u05dc\u05d5\u05dd"]
+    assert typed[0] != typed[1]
+    assert normalize_query(typed[0]) == normalize_query(typed[1])
+    assert normalize_query("  Who is\tHARRY? ") == "who is harry?"
+
+
+def test_normalized_equal_query_skips_the_backend():
+    backend = FakeEmbedding()
+    cache = CachedEmbedding(backend)
+    vector = cache.embed("Who is Harry?")
+    assert asyncio.run(cache.aembed("  who IS harry? ")) == vector
+    assert backend.calls == ["Who is Harry?"]
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_vectors_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "cache" / "embeddings.sqlite")
+    first = CachedEmbedding(FakeEmbedding(), db_path=db_path)
+    vector = first.embed("Who is Harry?")
+    first.close()
+
+    backend = FakeEmbedding()
+    restarted = CachedEmbedding(backend, db_path=db_path)
+    assert restarted.embed("who is harry?") == pytest.approx(vector)
+    assert backend.calls == []
+    assert restarted.stats()["disk_hits"] == 1
+
+    # Another model's vectors are not shared
+    other = CachedEmbedding(FakeEmbedding(model="other-model"), db_path=db_path)
+    other.embed("Who is Harry?")
+    assert other.embedder.calls == ["Who is Harry?"]
+
+
+def test_failed_embeddings_are_not_cached():
+    backend = FakeEmbedding()
+    backend.embed = lambda text: backend.calls.append(text) or []
+    cache = CachedEmbedding(backend)
+    assert cache.embed("Who is Harry?") == []
+    cache.embed("Who is Harry?")
+    assert len(backend.calls) == 2
@@ -0,0 +1,71 @@
+import lancedb
+import pytest
+from graphrag.model import Entity
+from graphrag.vector_stores.lancedb import LanceDBVectorStore
+
+from entity_embeddings import lease_collection, prune_collections, sync_entity_semantic_embeddings
+
+BASE = "entity_description_embeddings"
+
+
+def make_entities(vectors):
+    return [
+        Entity(id=f"e{i}", short_id=str(i), title=f"entity {i}", description=f"description {i}", description_embedding=vector)
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def sync(db_uri, collection_name, entities, previous=None):
+    store = LanceDBVectorStore(collection_name=collection_name)
+    store.connect(db_uri=db_uri)
+    return sync_entity_semantic_embeddings(entities, store, db_uri, previous_collection=previous)
+
+
+def vectors(db_uri, collection_name):
+    rows = lancedb.connect(db_uri).open_table(collection_name).to_arrow().to_pylist()
+    return {row["id"]: pytest.approx(row["vector"]) for row in rows}
+
+
+@pytest.fixture
+def db_uri(tmp_path):
+    return str(tmp_path / "lancedb")
+
+
+VECTORS = [[1.0, 0.0], [0.0, 1.0], [0.5, 0.5], [0.2, 0.8], [0.9, 0.1]]
+
+
+def test_unchanged_entities_reuse_the_collection(db_uri):
+    assert sync(db_uri, f"{BASE}_v1", make_entities(VECTORS))["mode"] == "rebuilt"
+    assert sync(db_uri, f"{BASE}_v1", make_entities(VECTORS))["mode"] == "unchanged"
+
+
+def test_new_version_copies_the_previous_collection_without_writing_it(db_uri):
+    sync(db_uri, f"{BASE}_v1", make_entities(VECTORS))
+    changed = VECTORS[:-1] + [[0.1, 0.9]]
+    stats = sync(db_uri, f"{BASE}_v2", make_entities(changed), previous=f"{BASE}_v1")
+    assert (stats["mode"], stats["changed"]) == ("incremental", 1)
+    assert vectors(db_uri, f"{BASE}_v1")["e4"] == [0.9, 0.1]
+    assert vectors(db_uri, f"{BASE}_v2")["e4"] == [0.1, 0.9]
+    assert len(vectors(db_uri, f"{BASE}_v2")) == 5
+
+
+def test_mostly_changed_entities_rebuild_the_new_collection(db_uri):
+    sync(db_uri, f"{BASE}_v1", make_entities(VECTORS))
+    stats = sync(db_uri, f"{BASE}_v2", make_entities([[y, x] for x, y in VECTORS]), previous=f"{BASE}_v1")
+    assert stats["mode"] == "rebuilt"
+    assert vectors(db_uri, f"{BASE}_v1")["e0"] == [1.0, 0.0]
+
+
+def test_prune_skips_kept_and_leased_collections(db_uri):
+    for version in ("v1", "v2", "v3"):
+        sync(db_uri, f"{BASE}_{version}", make_entities(VECTORS))
+    sync(db_uri, "other_collection", make_entities(VECTORS))
+    lease = lease_collection(db_uri, f"{BASE}_v2")
+
+    assert prune_collections(db_uri, BASE, keep={f"{BASE}_v3"}) == [f"{BASE}_v1"]
+    assert sorted(lancedb.connect(db_uri).table_names()) == [f"{BASE}_v2", f"{BASE}_v3", "other_collection"]
+
+    lease.close()
+    assert prune_collections(db_uri, BASE, keep={f"{BASE}_v3"}) == [f"{BASE}_v2"]
+    # A later collection of the same name starts from a clean manifest
+    assert sync(db_uri, f"{BASE}_v2", make_entities(VECTORS))["mode"] == "rebuilt"
@@ -0,0 +1,79 @@
+import pytest
+from graphrag.model import Entity
+from graphrag.vector_stores import VectorStoreDocument, VectorStoreSearchResult
+
+from entity_names import EntityNameIndex, NameMatchedVectorStore, normalize_name
+
+TITLES = {
+    "harry": "הארי",
+    "harry-potter": "הארי פוטר",
+    "ron": "רון ויזלי",
+    "ginny": "ג'יני",
+    "snape": "סוורוס סנייפ",
+    "father": "אב",
+    "events": "אירועים",
+}
+
+
+@pytest.fixture
+def index():
+    return EntityNameIndex([Entity(id=entity_id, short_id=entity_id, title=title) for entity_id, title in TITLES.items()])
+
+
+class EmbeddingStore:
+    def __init__(self, ids):
+        self.ids = ids
+        self.queries = []
+
+    def similarity_search_by_text(self, text, text_embedder, k=10, **kwargs):
+        self.queries.append(text)
+        return [VectorStoreSearchResult(document=VectorStoreDocument(id=entity_id, text=None, vector=None), score=0.5) for entity_id in self.ids[:k]]
+
+
+def result_ids(results):
+    return [result.document.id for result in results]
+
+
+def test_normalize_name_drops_niqqud_geresh_and_final_forms():
+    assert normalize_name("ג׳ינִי") == normalize_name("ג'יני") == normalize_name("גיני")
+    assert normalize_name("רוֹן  ויזלי") == "רונ ויזלי"
+
+
+def test_matches_names_after_prefix_letters(index):
+    assert index.match("מה אמר סנייפ ולהארי?") == ["harry"]
+    assert index.match("מה אמר סוורוס סנייפ ולהארי?") == ["snape", "harry"]
+    assert index.match("מי זו ג׳יני?") == ["ginny"]
+
+
+def test_longest_overlapping_match_wins(index):
+    assert index.match("מי הוא הארי פוטר") == ["harry-potter"]
+
+
+def test_short_title_does_not_match_inside_a_prefixed_word(index):
+    # כאב (pain) is not כ + אב (father)
+    assert index.match("למה יש להארי כאב בצלקת?") == ["harry"]
+    assert index.match("מי האב של הארי?") == ["harry"]
+    assert index.match("מי אב המשפחה?") == ["father"]
+
+
+def test_merge_keeps_the_embedding_matches_for_common_word_titles(index):
+    store = EmbeddingStore(["battle", "events", "tournament"])
+    matched = NameMatchedVectorStore(store, index)
+    assert matched.mode == "merge"
+    results = matched.similarity_search_by_text("מהם האירועים המרכזיים בספר?", None, k=3)
+    assert result_ids(results) == ["events", "battle", "tournament"]
+    assert matched.paths == {"merged": 1}
+
+
+def test_bypass_skips_the_embedding_lookup(index):
+    store = EmbeddingStore(["battle"])
+    matched = NameMatchedVectorStore(store, index, mode="bypass")
+    assert result_ids(matched.similarity_search_by_text("מי זה רון ויזלי", None)) == ["ron"]
+    assert result_ids(matched.similarity_search_by_text("מה קרה בטורניר?", None)) == ["battle"]
+    assert store.queries == ["מה קרה בטורניר?"]
+    assert matched.paths == {"names": 1, "embedding": 1}
+
+
+def test_unknown_mode_is_rejected(index):
+    with pytest.raises(ValueError):
+        NameMatchedVectorStore(EmbeddingStore([]), index, mode="always")
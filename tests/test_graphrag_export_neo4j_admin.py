@@ -0,0 +1,130 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from graphrag_export_neo4j_admin import export, import_command
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = list(csv.reader(file))
+    return rows[0], rows[1:]
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    folder = tmp_path / "artifacts"
+    folder.mkdir()
+    pd.DataFrame({
+        "id": ["doc-1"],
+        "title": ["book.txt"],
+    }).to_parquet(folder / "create_final_documents.parquet")
+    pd.DataFrame({
+        "id": ["chunk-1", "chunk-2"],
+        "text": ["הארי פוטר\nוהרמיוני", "רון"],
+        "n_tokens": [12, 3],
+        "document_ids": [["doc-1"], ["doc-1", "doc-missing"]],
+    }).to_parquet(folder / "create_final_text_units.parquet")
+    pd.DataFrame({
+        "id": ["e-harry", "e-harry", "e-harry-2", "e-wand", "e-hogwarts", "e-misc"],
+        "name": ["HARRY POTTER", "HARRY POTTER", "HARRY POTTER", "ELDER WAND", "HOGWARTS", "SOMETHING"],
+        "type": ["character", "character", "character", "magical_object", "place", "concept"],
+        "description": ["הילד שנשאר בחיים", "dup", "dup by name", "שרביט", "בית ספר", "not exported"],
+    }).to_parquet(folder / "create_final_entities.parquet")
+    # Written with pyarrow directly: pandas would store the NaN weights as nulls
+    pq.write_table(pa.Table.from_pydict({
+        "id": ["r-1", "r-1", "r-2", "r-3"],
+        "source": ["HARRY POTTER", "HARRY POTTER", "HARRY POTTER", "SOMETHING"],
+        "target": ["ELDER WAND", "ELDER WAND", "NOBODY", "HOGWARTS"],
+        "rank": [3, 3, 1, 2],
+        "weight": [float("nan"), float("nan"), 1.0, 2.0],
+        "human_readable_id": ["0", "0", "1", "2"],
+        "description": ["משתמש בשרביט", "dup", "dangling", "unmapped source"],
+        "text_unit_ids": [["chunk-1", "chunk-missing"], ["chunk-1"], ["chunk-1"], ["chunk-2"]],
+    }), folder / "create_final_relationships.parquet")
+    return folder
+
+
+@pytest.fixture
+def exported(artifacts, tmp_path):
+    out_dir = tmp_path / "import"
+    stats = export(str(artifacts), str(out_dir), batch_size=2)
+    return out_dir, stats
+
+
+def test_node_and_relationship_headers(exported):
+    out_dir, stats = exported
+    assert set(stats) == {
+        "documents.csv", "chunks.csv", "document_contains_chunk.csv",
+        "entities.csv", "related.csv", "mentioned_in.csv",
+    }
+    assert read_csv(out_dir / "documents.csv")[0] == ["id:ID(Document)", "title", ":LABEL"]
+    assert read_csv(out_dir / "chunks.csv")[0] == ["id:ID(Chunk)", "text", "n_tokens:long", ":LABEL"]
+    assert read_csv(out_dir / "entities.csv")[0] == ["id:ID(Entity)", "name", "type", "description", ":LABEL"]
+    assert read_csv(out_dir / "related.csv")[0] == [
+        "id", ":START_ID(Entity)", ":END_ID(Entity)", "rank:long", "weight:double",
+        "human_readable_id", "description", ":TYPE",
+    ]
+    assert read_csv(out_dir / "mentioned_in.csv")[0] == [":START_ID(Entity)", ":END_ID(Chunk)", ":TYPE"]
+    assert {row[-1] for row in read_csv(out_dir / "related.csv")[1]} == {"RELATED"}
+    assert {row[-1] for row in read_csv(out_dir / "mentioned_in.csv")[1]} == {"MENTIONED_IN"}
+    assert {row[-1] for row in read_csv(out_dir / "entities.csv")[1]} == {"__Entity__"}
+
+
+def test_entities_are_deduplicated_and_mapped_to_hebrew_labels(exported):
+    out_dir, stats = exported
+    _, rows = read_csv(out_dir / "entities.csv")
+    assert [(row[0], row[1], row[2]) for row in rows] == [
+        ("e-harry", "HARRY POTTER", "דמויות"),
+        ("e-wand", "ELDER WAND", "חפצים קסומים"),
+        ("e-hogwarts", "HOGWARTS", "מקומות"),
+    ]
+    assert stats["entities.csv"]["rows"] == 3
+
+
+def test_relationships_with_missing_endpoints_are_dropped(exported):
+    out_dir, stats = exported
+    _, rows = read_csv(out_dir / "related.csv")
+    assert [row[:3] for row in rows] == [["r-1", "e-harry", "e-wand"]]
+    assert stats["related.csv"] == {"rows": 1, "duplicates": 1}
+    _, mentions = read_csv(out_dir / "mentioned_in.csv")
+    assert sorted(mentions) == [["e-harry", "chunk-1", "MENTIONED_IN"], ["e-wand", "chunk-1", "MENTIONED_IN"]]
+    _, contains = read_csv(out_dir / "document_contains_chunk.csv")
+    assert sorted(contains) == [["doc-1", "chunk-1", "CONTAINS"], ["doc-1", "chunk-2", "CONTAINS"]]
+
+
+def test_missing_doubles_are_written_as_empty_fields(exported):
+    out_dir, _ = exported
+    header, rows = read_csv(out_dir / "related.csv")
+    assert rows[0][header.index("weight:double")] == ""
+    assert rows[0][header.index("rank:long")] == "3"
+
+
+def test_multiline_text_round_trips(exported):
+    out_dir, _ = exported
+    _, rows = read_csv(out_dir / "chunks.csv")
+    assert rows[0][1] == "הארי פוטר\nוהרמיוני"
+
+
+def test_import_command_lists_node_and_relationship_files(exported):
+    out_dir, stats = exported
+    command = import_command(str(out_dir), list(stats), "graph")
+    assert f"--nodes={out_dir / 'entities.csv'}" in command
+    assert f"--relationships={out_dir / 'related.csv'}" in command
+    assert command.endswith("--multiline-fields=true graph")
+
+
+def test_exporter_does_not_need_the_neo4j_driver():
+    # In a fresh interpreter, since another test may have loaded them
+    src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, graphrag_export_neo4j_admin; print(sorted({'neo4j', 'dotenv'} & set(sys.modules)))"],
+        cwd=src_dir, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert loaded == "[]"
@@ -0,0 +1,105 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+import graphrag_import_neo4j_cypher as cypher_import
+from graphrag_import_neo4j_cypher import ImportTable, read_artifact, run_import
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute_write(self, fn, statement, rows):
+        ids = [row["id"] for row in rows]
+        with self.driver.lock:
+            self.driver.writes.append((statement, ids))
+        if any(row_id in self.driver.fail_ids for row_id in ids):
+            raise RuntimeError("Neo.TransientError.Transaction.DeadlockDetected")
+
+
+class FakeDriver:
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.writes = []
+        self.lock = threading.Lock()
+
+    def session(self, database=None):
+        return FakeSession(self)
+
+    def written(self, statement):
+        return [ids for written, ids in self.writes if written == statement]
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    folder = tmp_path / "artifacts"
+    folder.mkdir()
+    for name, count in [("create_final_documents", 3), ("create_final_text_units", 4), ("create_final_entities", 2)]:
+        pd.DataFrame({"id": [f"{name}-{i}" for i in range(count)]}).to_parquet(folder / f"{name}.parquet")
+    monkeypatch.setattr(cypher_import, "GRAPHRAG_FOLDER", str(folder))
+    return folder
+
+
+def make_tables():
+    return [
+        ImportTable("create_final_entities", "entities", lambda: read_artifact("create_final_entities"), depends_on=["create_final_text_units"]),
+        ImportTable("create_final_text_units", "text_units", lambda: read_artifact("create_final_text_units"), depends_on=["create_final_documents"]),
+        ImportTable("create_final_documents", "documents", lambda: read_artifact("create_final_documents")),
+    ]
+
+
+def test_dependent_tables_wait_for_their_dependencies(artifacts, tmp_path):
+    driver = FakeDriver()
+    stats = run_import(driver, make_tables(), workers=4, batch_size=2, checkpoint_path=str(tmp_path / "checkpoint.json"))
+    order = [statement for statement, _ in driver.writes]
+    assert order == ["documents", "documents", "text_units", "text_units", "entities"]
+    assert {name: table["rows"] for name, table in stats.items()} == {
+        "create_final_documents": 3,
+        "create_final_text_units": 4,
+        "create_final_entities": 2,
+    }
+
+
+def test_failed_import_resumes_from_the_checkpoint(artifacts, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    driver = FakeDriver(fail_ids={"create_final_text_units-3"})
+    with pytest.raises(RuntimeError, match="not started \\['create_final_entities'\\]"):
+        run_import(driver, make_tables(), workers=4, batch_size=2, checkpoint_path=checkpoint_path)
+    assert driver.written("entities") == []
+    with open(checkpoint_path, encoding="utf-8") as file:
+        tables = json.load(file)["tables"]
+    assert tables["create_final_documents"]["complete"]
+    assert (tables["create_final_text_units"]["done"], tables["create_final_text_units"]["complete"]) == ([0], False)
+
+    resumed = FakeDriver()
+    stats = run_import(resumed, make_tables(), workers=4, batch_size=2, checkpoint_path=checkpoint_path)
+    assert resumed.writes == [
+        ("text_units", ["create_final_text_units-2", "create_final_text_units-3"]),
+        ("entities", ["create_final_entities-0", "create_final_entities-1"]),
+    ]
+    assert stats["create_final_documents"]["skipped_batches"] == 2
+    assert stats["create_final_text_units"]["skipped_batches"] == 1
+
+    # Everything is recorded as imported now, so a third run writes nothing
+    rerun = FakeDriver()
+    run_import(rerun, make_tables(), workers=4, batch_size=2, checkpoint_path=checkpoint_path)
+    assert rerun.writes == []
+
+
+def test_changed_artifact_is_imported_again(artifacts, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    run_import(FakeDriver(), make_tables(), workers=4, batch_size=2, checkpoint_path=checkpoint_path)
+    pd.DataFrame({"id": ["create_final_entities-new"]}).to_parquet(artifacts / "create_final_entities.parquet")
+
+    driver = FakeDriver()
+    run_import(driver, make_tables(), workers=4, batch_size=2, checkpoint_path=checkpoint_path)
+    assert driver.writes == [("entities", ["create_final_entities-new"])]
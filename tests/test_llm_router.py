@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+import ollama_wrapper
+from ollama_wrapper import LLMRouter, OllamaPool
+from resilience import BackendError, CircuitOpen
+
+HOSTS = ["http://ollama-a.test", "http://ollama-b.test", "http://ollama-c.test"]
+
+
+def make_router(handler, hosts=HOSTS):
+    pools = []
+    for host in hosts:
+        pool = OllamaPool(host)
+        pool.client = httpx.AsyncClient(base_url=host, transport=httpx.MockTransport(handler))
+        pools.append(pool)
+    return LLMRouter(pools)
+
+
+@pytest.fixture(autouse=True)
+def no_health_checks(monkeypatch):
+    monkeypatch.setattr(ollama_wrapper, "HEALTH_CHECK_INTERVAL", 0)
+
+
+def reply(request):
+    return httpx.Response(200, json={"host": request.url.host})
+
+
+def test_requests_go_to_the_backend_with_fewest_outstanding():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handler(request):
+            await gate.wait()
+            return reply(request)
+
+        router = make_router(handler)
+        router.backends[0].outstanding = 1
+        calls = [asyncio.create_task(router.post("/api/chat", {})) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert [backend.outstanding for backend in router.backends] == [1, 1, 1]
+        gate.set()
+        hosts = sorted(response["host"] for response in await asyncio.gather(*calls))
+        assert hosts == ["ollama-b.test", "ollama-c.test"]
+
+    asyncio.run(scenario())
+
+
+def test_open_backend_is_skipped():
+    async def scenario():
+        router = make_router(reply, HOSTS[:2])
+        router.backends[0].pool.breaker.trip()
+        hosts = [(await router.post("/api/chat", {}))["host"] for _ in range(3)]
+        assert hosts == ["ollama-b.test"] * 3
+        assert router.backends[0].requests == 0
+        assert router.stats()["http://ollama-a.test"]["breaker"] == "open"
+
+    asyncio.run(scenario())
+
+
+def test_failed_request_moves_to_another_backend():
+    async def scenario():
+        def handler(request):
+            if request.url.host == "ollama-a.test":
+                return httpx.Response(503)
+            return reply(request)
+
+        router = make_router(handler, HOSTS[:2])
+        response = await router.post("/api/chat", {}, max_retries=1)
+        assert response["host"] == "ollama-b.test"
+        assert router.backends[0].errors == 1
+        assert router.backends[0].pool.breaker.consecutive_failures == 1
+
+        with pytest.raises(BackendError):
+            await make_router(lambda request: httpx.Response(503), HOSTS[:1]).post("/api/chat", {})
+
+    asyncio.run(scenario())
+
+
+def test_all_backends_open_fails_fast():
+    async def scenario():
+        requests = []
+        router = make_router(lambda request: requests.append(request) or reply(request), HOSTS[:2])
+        for backend in router.backends:
+            backend.pool.breaker.trip()
+        with pytest.raises(CircuitOpen) as error:
+            await router.post("/api/chat", {}, max_retries=5)
+        assert requests == []
+        assert error.value.retry_after > 0
+
+    asyncio.run(scenario())
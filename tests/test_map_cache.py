@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+import pytest
+
+from map_cache import MapResponseCache
+
+from .test_map_scheduler import FakeLLM, make_search
+
+
+@pytest.fixture
+def reports_path(tmp_path):
+    path = tmp_path / "create_final_community_reports.parquet"
+    path.write_bytes(b"reports v1")
+    return path
+
+
+@pytest.fixture
+def map_cache(tmp_path, reports_path):
+    cache = MapResponseCache(str(tmp_path / "cache" / "map.sqlite"), str(reports_path))
+    yield cache
+    cache.close()
+
+
+def test_repeated_map_prompt_is_served_from_the_cache(map_cache):
+    llm = FakeLLM()
+    search = make_search(llm, [1, 2], map_concurrency=1, target_points=0, map_cache=map_cache)
+    first = asyncio.run(search.asearch("מה קרה?"))
+    assert llm.map_calls == 2
+    assert map_cache.stats()["entries"] == 2
+
+    second = asyncio.run(search.asearch("  מה   קרה? "))
+    assert llm.map_calls == 2
+    assert map_cache.hits == 2
+    assert [batch["cached"] for batch in second.map_batches] == [True, True]
+    assert [r.response for r in second.map_responses] == [r.response for r in first.map_responses]
+    assert "point 0 from report 1" in llm.reduce_prompts[1]
+
+
+def test_failed_map_calls_are_not_cached(map_cache):
+    llm = FakeLLM()
+
+    async def unparseable(messages, **kwargs):
+        return {"choices": [{"message": {"content": "not json", "role": "assistant"}}]}
+
+    llm.agenerate = unparseable
+    search = make_search(llm, [1], map_cache=map_cache)
+    asyncio.run(search.asearch("מה קרה?"))
+    assert map_cache.stats()["entries"] == 0
+
+
+def test_rewritten_reports_invalidate_the_cache(map_cache, reports_path):
+    llm = FakeLLM()
+    search = make_search(llm, [1], map_cache=map_cache)
+    asyncio.run(search.asearch("מה קרה?"))
+    assert map_cache.stats()["entries"] == 1
+
+    reports_path.write_bytes(b"reports v2, reindexed")
+    asyncio.run(search.asearch("מה קרה?"))
+    assert llm.map_calls == 2
+    assert map_cache.invalidations == 1
+    assert map_cache.hits == 0
+
+
+def test_entries_from_older_reports_are_dropped_at_startup(tmp_path, reports_path):
+    db_path = str(tmp_path / "map.sqlite")
+    cache = MapResponseCache(db_path, str(reports_path))
+    cache.put("key", [{"answer": "הארי", "score": 80}])
+    cache.close()
+
+    stat = os.stat(reports_path)
+    os.utime(reports_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    cache = MapResponseCache(db_path, str(reports_path))
+    assert cache.get("key") is None
+    assert cache.invalidations == 1
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, reports_path):
+    cache = MapResponseCache(str(tmp_path / "map.sqlite"), str(reports_path), max_entries=2)
+    cache.put("a", [{"answer": "a", "score": 50}])
+    cache.put("b", [{"answer": "b", "score": 50}])
+    assert cache.get("a") is not None
+    cache.put("c", [{"answer": "c", "score": 50}])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.close()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import re
+
+from map_scheduler import ScheduledGlobalSearch
+
+
+class WordEncoder:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FakeLLM:
+    """Answers map prompts with scored points, in the OpenAI shape ChatOllama.agenerate returns."""
+
+    model = "fake-model"
+
+    def __init__(self, points_per_batch=2, score=80):
+        self.points_per_batch = points_per_batch
+        self.score = score
+        self.map_calls = 0
+        self.reduce_prompts = []
+
+    async def agenerate(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        if '"points"' in prompt:
+            self.map_calls += 1
+            batch = re.search(r"report \d+", prompt).group()
+            points = [{"description": f"point {i} from {batch}", "score": self.score} for i in range(self.points_per_batch)]
+            content = json.dumps({"points": points})
+        else:
+            self.reduce_prompts.append(prompt)
+            content = "final answer"
+        return {"choices": [{"message": {"content": content, "role": "assistant"}}]}
+
+
+class FakeContextBuilder:
+    def __init__(self, ranks):
+        self.chunks = [f"id|title|rank\n{i}|report {i}|{rank}" for i, rank in enumerate(ranks)]
+
+    def build_context(self, conversation_history=None, **kwargs):
+        return self.chunks, {}
+
+
+def make_search(llm, ranks, **kwargs):
+    return ScheduledGlobalSearch(
+        llm=llm,
+        context_builder=FakeContextBuilder(ranks),
+        token_encoder=WordEncoder(),
+        max_data_tokens=12_000,
+        map_llm_params={"max_tokens": 1000, "temperature": 0.0},
+        reduce_llm_params={"max_tokens": 2000, "temperature": 0.0},
+        json_mode=False,
+        context_builder_params={"community_rank_name": "rank", "column_delimiter": "|"},
+        **kwargs,
+    )
+
+
+def test_parse_search_response_unwraps_the_chat_message():
+    search = make_search(FakeLLM(), [1])
+    content = json.dumps({"points": [{"description": "הארי", "score": "70"}]})
+    wrapped = {"choices": [{"message": {"content": content, "role": "assistant"}}]}
+    assert search.parse_search_response(wrapped) == [{"answer": "הארי", "score": 70}]
+    assert search.parse_search_response(content) == [{"answer": "הארי", "score": 70}]
+
+
+def test_map_points_reach_the_reduce_step():
+    llm = FakeLLM()
+    search = make_search(llm, [1, 2, 3], map_concurrency=3, target_points=0)
+    result = asyncio.run(search.asearch("מה קרה?"))
+    assert llm.map_calls == 3
+    assert [batch["rating"] for batch in result.map_batches] == [80, 80, 80]
+    assert [batch["key_points"] for batch in result.map_batches] == [2, 2, 2]
+    assert "point 0 from report 2" in llm.reduce_prompts[0]
+    assert result.response["choices"][0]["message"]["content"] == "final answer"
+    assert not result.stopped_early
+
+
+def test_enough_points_stop_the_map_phase_early():
+    llm = FakeLLM(points_per_batch=2)
+    search = make_search(llm, [1, 5, 3, 2], map_concurrency=1, target_points=4)
+    result = asyncio.run(search.asearch("מה קרה?"))
+    # Highest ranked batches go first, and two of them already hold four points
+    assert llm.map_calls == 2
+    assert [batch["status"] for batch in result.map_batches] == ["skipped", "done", "done", "skipped"]
+    assert result.stopped_early
+    assert search.map_stats()["early_stops"] == 1
+    assert "point 1 from report 1" in llm.reduce_prompts[0]
+
+
+def test_low_scoring_points_do_not_stop_the_map_phase():
+    llm = FakeLLM(points_per_batch=2, score=10)
+    search = make_search(llm, [1, 2, 3], map_concurrency=1, target_points=2)
+    result = asyncio.run(search.asearch("מה קרה?"))
+    assert llm.map_calls == 3
+    assert not result.stopped_early
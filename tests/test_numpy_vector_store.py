@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from graphrag.model import Entity
+
+from numpy_vector_store import NumpyVectorStore
+
+
+def make_entities(vectors):
+    return [
+        Entity(id=f"e{i}", short_id=str(i), title=f"entity {i}", description=f"description {i}", description_embedding=vector)
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def make_store(sidecar_dir):
+    store = NumpyVectorStore(collection_name="entity_description_embeddings")
+    store.connect(db_uri=str(sidecar_dir), mmap=True)
+    return store
+
+
+def sidecars(sidecar_dir):
+    return sorted(path.name for path in sidecar_dir.iterdir())
+
+
+@pytest.fixture
+def sidecar_dir(tmp_path):
+    return tmp_path / "vectors"
+
+
+def test_search_returns_the_closest_entities():
+    store = NumpyVectorStore(collection_name="entities")
+    store.load_entities(make_entities([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]))
+    results = store.similarity_search_by_vector([1.0, 0.1], k=2)
+    assert [result.document.id for result in results] == ["e0", "e2"]
+    store.filter_by_id(["e1"])
+    assert [result.document.id for result in store.similarity_search_by_vector([1.0, 0.1], k=2)] == ["e1"]
+
+
+def test_unchanged_entities_reuse_the_sidecar(sidecar_dir):
+    entities = make_entities([[1.0, 0.0], [0.0, 1.0]])
+    assert make_store(sidecar_dir).load_entities(entities) == "built"
+    store = make_store(sidecar_dir)
+    assert store.load_entities(entities) == "sidecar"
+    assert isinstance(store.matrix, np.memmap)
+    assert len(sidecars(sidecar_dir)) == 2
+
+
+def test_rebuild_leaves_the_mapped_matrix_of_the_old_index_intact(sidecar_dir):
+    old = make_store(sidecar_dir)
+    old.load_entities(make_entities([[1.0, 0.0], [0.0, 1.0]]))
+    old_files = sidecars(sidecar_dir)
+
+    # A reload with changed entities, while the old index is still serving
+    new = make_store(sidecar_dir)
+    assert new.load_entities(make_entities([[0.0, 1.0], [1.0, 0.0], [0.6, 0.8]])) == "built"
+
+    assert not set(old_files) & set(sidecars(sidecar_dir))
+    assert len(sidecars(sidecar_dir)) == 2
+    np.testing.assert_allclose(old.matrix, [[1.0, 0.0], [0.0, 1.0]])
+    assert old.similarity_search_by_vector([1.0, 0.0], k=1)[0].document.id == "e0"
+    assert new.similarity_search_by_vector([1.0, 0.0], k=1)[0].document.id == "e1"
+    assert not any(name.endswith(".tmp") for name in sidecars(sidecar_dir))
@@ -0,0 +1,61 @@
+import time
+
+import httpx
+import pytest
+
+import ollama_wrapper
+from ollama_wrapper import OllamaEmbedding
+from resilience import BackendError, CircuitOpen, DeadlineExceeded, deadline
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    monkeypatch.setattr(ollama_wrapper, "_pools", {})
+    requests = []
+
+    def use(handler):
+        def record(request):
+            requests.append(request)
+            return handler(request)
+
+        embedding = OllamaEmbedding("http://ollama.test:11434", "embed-model")
+        embedding._client = httpx.Client(base_url="http://ollama.test:11434", transport=httpx.MockTransport(record))
+        return embedding, requests
+
+    return use
+
+
+def test_embed_returns_the_vector(embedder):
+    embedding, requests = embedder(lambda request: httpx.Response(200, json={"embeddings": [[0.5, 0.25]]}))
+    assert embedding.embed("הארי") == [0.5, 0.25]
+    assert len(requests) == 1
+    assert requests[0].url.path == "/api/embed"
+
+
+def test_embed_fails_after_one_attempt_without_sleeping(embedder):
+    embedding, requests = embedder(lambda request: httpx.Response(503))
+    start = time.monotonic()
+    with pytest.raises(BackendError):
+        embedding.embed("הארי")
+    assert time.monotonic() - start < 1
+    assert len(requests) == 1
+    assert embedding.pool.breaker.consecutive_failures == 1
+
+
+def test_embed_is_refused_while_the_breaker_is_open(embedder):
+    embedding, requests = embedder(lambda request: httpx.Response(503))
+    for _ in range(embedding.pool.breaker.failures):
+        with pytest.raises(BackendError):
+            embedding.embed("הארי")
+    with pytest.raises(CircuitOpen):
+        embedding.embed("הארי")
+    assert len(requests) == embedding.pool.breaker.failures
+
+
+def test_embed_respects_the_deadline(embedder):
+    embedding, requests = embedder(lambda request: httpx.Response(200, json={"embeddings": [[0.5]]}))
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            embedding.embed("הארי")
+    assert requests == []
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import (
+    BackendError,
+    CircuitBreaker,
+    DeadlineExceeded,
+    deadline,
+    record_llm_failure,
+    remaining,
+    request_timeout,
+    sleep_before_retry,
+    surface_llm_failures,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+    assert breaker.trips == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failures=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert breaker.probing
+    assert not breaker.available()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+    assert breaker.retry_after() == 0
+
+
+def test_failed_probe_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker(failures=3, reset_seconds=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    # One failure is enough while probing, and the wait starts over
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+    assert breaker.trips == 2
+
+
+def test_nested_deadlines_take_the_earliest(clock):
+    assert remaining() is None
+    with deadline(10):
+        assert remaining() == 10
+        with deadline(5):
+            assert remaining() == 5
+        with deadline(20), deadline(None), deadline(0):
+            assert remaining() == 10
+        assert remaining() == 10
+    assert remaining() is None
+
+
+def test_request_timeout_is_cut_short_by_the_deadline(clock):
+    assert request_timeout(300) == 300
+    with deadline(5):
+        assert request_timeout(300) == 5
+        assert request_timeout(2) == 2
+        clock.now += 4
+        assert request_timeout(300) == 1
+        clock.now += 1
+        with pytest.raises(DeadlineExceeded):
+            request_timeout(300)
+
+
+def test_deadline_reaches_tasks_started_inside_it(clock):
+    async def scenario():
+        with deadline(5):
+            task = asyncio.create_task(asyncio.sleep(0, result="done"))
+            inherited = asyncio.create_task(_remaining())
+        return await task, await inherited
+
+    async def _remaining():
+        return remaining()
+
+    assert asyncio.run(scenario()) == ("done", 5)
+
+
+def test_retry_sleep_that_would_overrun_the_deadline_gives_up(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 3.0)
+    with deadline(2), pytest.raises(DeadlineExceeded):
+        asyncio.run(sleep_before_retry(1))
+
+
+def test_recorded_failure_is_raised_when_the_block_exits():
+    error = BackendError("http://ollama.test", ConnectionError("refused"))
+    with pytest.raises(BackendError) as raised:
+        with surface_llm_failures():
+            record_llm_failure(error)
+            record_llm_failure(DeadlineExceeded())
+            # graphrag carried on with an empty answer; the block still finishes first
+            finished = True
+    assert raised.value is error
+    assert finished
+
+
+def test_failures_recorded_in_spawned_tasks_surface():
+    async def scenario():
+        with surface_llm_failures():
+            await asyncio.gather(asyncio.to_thread(lambda: None), _fail())
+
+    async def _fail():
+        record_llm_failure(DeadlineExceeded())
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+
+def test_nothing_recorded_raises_nothing():
+    with surface_llm_failures():
+        pass
+    # Outside any block there is nowhere to record to, and nothing is raised later
+    record_llm_failure(DeadlineExceeded())
+    with surface_llm_failures():
+        pass
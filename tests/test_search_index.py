@@ -0,0 +1,131 @@
+import asyncio
+import importlib
+import os
+
+import lancedb
+import pandas as pd
+import pytest
+from graphrag.model import Entity
+from graphrag.vector_stores.lancedb import LanceDBVectorStore
+
+from artifact_store import artifact_fingerprint
+from entity_embeddings import sync_entity_semantic_embeddings
+
+from .conftest import ROOT_DIR
+
+
+class FakeTokenEncoder:
+    def load(self, path):
+        pass
+
+    def save(self, path):
+        pass
+
+
+class FakeStore:
+    def __init__(self, input_dir, community_level, claim_extraction_enabled=False, shared_dir=None):
+        self.input_dir = input_dir
+        self.fingerprint = artifact_fingerprint(input_dir)
+
+    def release_tables(self):
+        pass
+
+
+class FakeLocalSearch:
+    def __init__(self, store, entity_collection):
+        self.store = store
+        self.entity_collection = entity_collection
+
+
+def write_artifacts(input_dir, vectors):
+    pd.DataFrame({"id": [f"e{i}" for i in range(len(vectors))], "vector": vectors}).to_parquet(
+        os.path.join(input_dir, "create_final_entities.parquet")
+    )
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # global_search and local_search read settings.yml from the working directory on import
+    monkeypatch.chdir(os.path.join(ROOT_DIR, "app"))
+    monkeypatch.setenv("GRAPHRAG_API_KEY", "test")
+    search_index = importlib.import_module("search_index")
+    input_dir = str(tmp_path / "inputs")
+    db_uri = os.path.join(input_dir, "lancedb")
+    os.makedirs(input_dir)
+    write_artifacts(input_dir, [[1.0, 0.0], [0.0, 1.0]])
+    builds = []
+
+    def setup_local_search(store, text_embedder, token_encoder, entity_collection, previous_entity_collection):
+        if store.fingerprint in fail_versions:
+            raise RuntimeError("broken artifacts")
+        vectors = pd.read_parquet(os.path.join(store.input_dir, "create_final_entities.parquet"))["vector"]
+        entities = [
+            Entity(id=f"e{i}", short_id=str(i), title=f"e{i}", description=f"e{i}", description_embedding=list(vector))
+            for i, vector in enumerate(vectors)
+        ]
+        vectorstore = LanceDBVectorStore(collection_name=entity_collection)
+        vectorstore.connect(db_uri=db_uri)
+        builds.append(sync_entity_semantic_embeddings(entities, vectorstore, db_uri, previous_collection=previous_entity_collection))
+        return FakeLocalSearch(store, entity_collection)
+
+    fail_versions = set()
+    monkeypatch.setattr(search_index, "ArtifactStore", FakeStore)
+    monkeypatch.setattr(search_index, "setup_global_search", lambda store, token_encoder, map_cache: object())
+    monkeypatch.setattr(search_index, "setup_local_search", setup_local_search)
+    monkeypatch.setattr(search_index, "DRAIN_POLL_INTERVAL", 0.01)
+    index_manager = search_index.SearchIndexManager(
+        input_dir=input_dir,
+        community_level=2,
+        claim_extraction_enabled=False,
+        text_embedder=None,
+        token_encoder=FakeTokenEncoder(),
+        entity_db_uri=db_uri,
+    )
+    index_manager.builds = builds
+    index_manager.fail_versions = fail_versions
+    return index_manager
+
+
+def collections(manager):
+    return sorted(lancedb.connect(manager.entity_db_uri).table_names())
+
+
+def test_reload_without_changes_keeps_the_index(manager):
+    index = manager.current
+    assert asyncio.run(manager.reload()) == {"reloaded": False, "version": index.version}
+    assert manager.current is index
+
+
+def test_reload_swaps_collections_only_after_the_old_index_drains(manager):
+    old = manager.current
+    assert collections(manager) == [old.entity_collection]
+
+    async def scenario():
+        async with manager.acquire() as pinned:
+            write_artifacts(manager.input_dir, [[1.0, 0.0], [0.6, 0.8]])
+            result = await manager.reload()
+            assert result["previous_version"] == old.version
+            # The running query keeps its index and collection, untouched by the new build
+            assert pinned is old and manager.current is not old
+            assert manager.builds[-1]["mode"] == "incremental"
+            assert collections(manager) == sorted([old.entity_collection, manager.current.entity_collection])
+            rows = lancedb.connect(manager.entity_db_uri).open_table(old.entity_collection).to_arrow().to_pylist()
+            assert {row["id"]: row["vector"] for row in rows}["e1"] == [0.0, 1.0]
+            await asyncio.sleep(0.05)
+            assert old.entity_collection in collections(manager)
+        await asyncio.gather(*manager._drain_tasks)
+
+    asyncio.run(scenario())
+    assert collections(manager) == [manager.current.entity_collection]
+    assert old.entity_lease is None
+
+
+def test_failed_reload_keeps_serving_the_current_index(manager):
+    old = manager.current
+    write_artifacts(manager.input_dir, [[0.0, 1.0]])
+    manager.fail_versions.add(artifact_fingerprint(manager.input_dir))
+    with pytest.raises(RuntimeError):
+        asyncio.run(manager.reload())
+    assert manager.current is old
+    assert manager.last_reload_error == "broken artifacts"
+    assert manager.status()["reloads"] == 0
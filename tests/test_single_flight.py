@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class SlowCall:
+    def __init__(self, result="answer", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_identical_calls_run_once():
+    async def scenario():
+        flight = SingleFlight()
+        call = SlowCall()
+        other = SlowCall(result="other answer")
+        waiters = [asyncio.create_task(flight.do("local:who is harry", call)) for _ in range(3)]
+        waiters.append(asyncio.create_task(flight.do("global:who is harry", other)))
+        await asyncio.sleep(0)
+        call.release.set()
+        other.release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert (call.calls, other.calls) == (1, 1)
+        assert results == [("answer", False), ("answer", True), ("answer", True), ("other answer", False)]
+        assert flight.stats()["started"] == 2 and flight.stats()["coalesced"] == 2
+        assert flight.stats()["in_flight"] == 0
+
+        # Once the shared call finished, the next one runs again
+        call.release = asyncio.Event()
+        call.release.set()
+        assert await flight.do("local:who is harry", call) == ("answer", False)
+        assert call.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        call = SlowCall(error=RuntimeError("ollama down"))
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        call.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert [str(result) for result in results] == ["ollama down", "ollama down"]
+        assert call.calls == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_shared_call_running():
+    async def scenario():
+        flight = SingleFlight()
+        call = SlowCall()
+        leaving = asyncio.create_task(flight.do("key", call))
+        staying = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+
+        leaving.cancel()
+        await asyncio.sleep(0)
+        assert leaving.cancelled()
+        assert not call.cancelled
+
+        call.release.set()
+        assert await staying == ("answer", True)
+        assert flight.stats()["cancelled"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_call_is_cancelled_once_nobody_waits_for_it():
+    async def scenario():
+        flight = SingleFlight()
+        call = SlowCall()
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert call.cancelled
+        assert flight.stats()["cancelled"] == 1
+        assert flight.stats()["in_flight"] == 0
+        with pytest.raises(asyncio.CancelledError):
+            await waiters[0]
+
+    asyncio.run(scenario())